@@ -0,0 +1,210 @@
+"""
+Airbnb Home Value Prediction - Batch Scoring
+Scores a partitioned listing dataset (written by write_synthetic_dataset or
+any directory of part-* parquet files / .npy column directories) with a
+process pool, one partition per task.
+
+Each worker loads the model bundle once. Every finished partition is
+written to its own output file and recorded in a checkpoint manifest, so
+a crashed or interrupted run picks up where it stopped when re-run with
+the same arguments.
+
+Output layout (one directory):
+    _manifest.json         model version, input path, finished partitions
+    part-00000.parquet     partition, row, [listing_id,] predicted_price,
+                           [price_lower, price_upper,]
+                           top_feature_1..k / top_value_1..k
+
+Usage:
+    python airbnb_ml_system.py --save-bundle model_bundle
+    python airbnb_ml_batch.py --bundle model_bundle --input listings --output scores --workers 4
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from airbnb_ml_bundle import read_manifest
+from airbnb_ml_system import (
+    ModelRuntime,
+    list_dataset_partitions,
+    read_dataset_partition,
+    predict_home_values,
+    thread_budget,
+)
+
+MANIFEST_NAME = '_manifest.json'
+
+# ============================================================================
+# 1. WORKER-SIDE SCORING
+# ============================================================================
+
+def _partition_name(partition):
+    """part-00000 for both part-00000.parquet and a part-00000/ .npy directory."""
+    return os.path.basename(partition.rstrip(os.sep)).removesuffix('.parquet')
+
+# Each worker process loads the bundle once and keeps the runtime here
+_batch_runtime = None
+
+def _init_batch_worker(bundle_path, nthread):
+    """Process-pool initializer: load the model bundle once per worker."""
+    global _batch_runtime
+    _batch_runtime = ModelRuntime.from_bundle(bundle_path)
+    _batch_runtime.regressor.set_params(n_jobs=nthread)
+    _batch_runtime.booster.set_param({'nthread': nthread})
+
+def score_partition(task, runtime=None):
+    """
+    Score one input partition and write its output file atomically.
+    task is (partition path, output path, top_k, explain).
+    Returns (partition name, rows, seconds).
+    """
+    partition, output_dir, top_k, explain = task
+    runtime = runtime or _batch_runtime
+    start = time.perf_counter()
+    name = _partition_name(partition)
+
+    listings = read_dataset_partition(partition)
+    results = predict_home_values(runtime, listings, top_k=top_k, explain=explain)
+    columns = {'partition': name, 'row': np.arange(len(listings), dtype=np.int64)}
+    if 'listing_id' in listings:
+        columns['listing_id'] = listings['listing_id'].to_numpy()
+    columns['predicted_price'] = results['predicted_price']
+    if results['price_lower'] is not None:
+        columns['price_lower'] = results['price_lower']
+        columns['price_upper'] = results['price_upper']
+    if explain:
+        for i in range(results['top_feature_names'].shape[1]):
+            columns[f'top_feature_{i + 1}'] = results['top_feature_names'][:, i].astype(str)
+            columns[f'top_value_{i + 1}'] = results['top_feature_values'][:, i].astype(np.float32)
+
+    # Write under a temporary name so a crash never leaves a half-written part
+    target = os.path.join(output_dir, f"{name}.parquet")
+    staging = target + f'.{os.getpid()}.tmp'
+    pd.DataFrame(columns).to_parquet(staging, index=False)
+    os.replace(staging, target)
+    return name, len(listings), time.perf_counter() - start
+
+# ============================================================================
+# 2. CHECKPOINT MANIFEST
+# ============================================================================
+
+def read_checkpoint(output_dir):
+    """The output manifest, or None when no run has started there."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _write_checkpoint(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+# ============================================================================
+# 3. JOB
+# ============================================================================
+
+def run_batch_scoring(bundle_path, input_path, output_path, n_workers=None, top_k=5,
+                      explain=True, max_partitions=None):
+    """
+    Score every partition under input_path into output_path, skipping the
+    ones a previous run already finished. A run against a different model
+    version or input is refused rather than mixed into the same output.
+    max_partitions stops after that many new partitions (useful to split
+    a job across sessions). Returns a summary dict.
+    """
+    model_version = read_manifest(bundle_path)['model_version']
+    partitions = list_dataset_partitions(input_path)
+    os.makedirs(output_path, exist_ok=True)
+
+    manifest = read_checkpoint(output_path) or {
+        'model_version': model_version, 'input_path': os.path.abspath(input_path),
+        'top_k': top_k, 'explain': explain, 'partitions': {},
+    }
+    if manifest['model_version'] != model_version:
+        raise ValueError(f"{output_path} holds scores from model {manifest['model_version']}, "
+                         f"not {model_version}; use a new output directory")
+    if manifest['input_path'] != os.path.abspath(input_path):
+        raise ValueError(f"{output_path} was started on {manifest['input_path']}")
+    # Every partition in one output must share the same column schema
+    if (manifest['top_k'], manifest['explain']) != (top_k, explain):
+        raise ValueError(f"{output_path} was started with top_k={manifest['top_k']}, "
+                         f"explain={manifest['explain']}; use the same options or a new "
+                         f"output directory")
+
+    done = manifest['partitions']
+    # A partition counts as finished only if its output file is still there
+    pending = [partition for partition in partitions
+               if not (_partition_name(partition) in done and os.path.exists(
+                   os.path.join(output_path, done[_partition_name(partition)]['output'])))]
+    skipped = len(partitions) - len(pending)
+    if max_partitions is not None:
+        pending = pending[:max_partitions]
+    tasks = [(partition, output_path, top_k, explain) for partition in pending]
+    print(f"\n📦 Batch scoring {len(partitions)} partitions with model {model_version}: "
+          f"{skipped} already done, {len(pending)} to score")
+
+    def record(result):
+        name, rows, seconds = result
+        done[name] = {'rows': rows, 'seconds': round(seconds, 3),
+                      'output': f"{name}.parquet"}
+        _write_checkpoint(output_path, manifest)
+
+    start = time.perf_counter()
+    rows_scored = 0
+    outer, inner = thread_budget(len(tasks), n_workers)
+    if outer == 1:
+        runtime = ModelRuntime.from_bundle(bundle_path)
+        for task in tasks:
+            result = score_partition(task, runtime)
+            record(result)
+            rows_scored += result[1]
+    else:
+        with ProcessPoolExecutor(max_workers=outer, initializer=_init_batch_worker,
+                                 initargs=(bundle_path, inner)) as pool:
+            # Checkpoint each partition as soon as it lands, in any order
+            for future in as_completed([pool.submit(score_partition, task) for task in tasks]):
+                result = future.result()
+                record(result)
+                rows_scored += result[1]
+    elapsed = time.perf_counter() - start
+    _write_checkpoint(output_path, manifest)
+
+    complete = all(_partition_name(partition) in done for partition in partitions)
+    print(f"✅ Scored {rows_scored:,} rows in {len(tasks)} partitions in {elapsed:.2f}s "
+          f"({rows_scored / max(elapsed, 1e-9):,.0f} rows/sec, {outer} worker(s))"
+          f"{'' if complete else ' - run again to finish'}")
+    return {
+        'partitions_scored': len(tasks),
+        'partitions_skipped': skipped,
+        'rows_scored': rows_scored,
+        'seconds': elapsed,
+        'rows_per_sec': rows_scored / max(elapsed, 1e-9),
+        'workers': outer,
+        'complete': complete,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded, resumable batch scoring")
+    parser.add_argument('--bundle', required=True, help="Model bundle directory")
+    parser.add_argument('--input', required=True, help="Partitioned listing dataset")
+    parser.add_argument('--output', required=True, help="Output directory (resumed if present)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--top-k', type=int, default=5, help="Top features per listing")
+    parser.add_argument('--no-explain', action='store_true', help="Write predictions only")
+    parser.add_argument('--max-partitions', type=int, default=None,
+                        help="Stop after this many new partitions")
+    args = parser.parse_args()
+    run_batch_scoring(args.bundle, args.input, args.output, args.workers, args.top_k,
+                      not args.no_explain, args.max_partitions)
+
+if __name__ == "__main__":
+    main()
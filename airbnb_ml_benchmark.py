@@ -0,0 +1,1264 @@
+"""
+Airbnb Home Value Prediction - Benchmarks
+Measures the serving and training paths of airbnb_ml_system.py.
+
+Usage:
+    python airbnb_ml_benchmark.py batch --rows 1000
+    python airbnb_ml_benchmark.py suite --sizes 1000 100000 --history benchmark_history.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+from airbnb_ml_system import (
+    generate_synthetic_data,
+    train_model,
+    predict_home_value,
+    predict_home_values,
+    ModelRuntime,
+    write_synthetic_dataset,
+    iter_dataset_chunks,
+    train_model_out_of_core,
+    create_feature_pipeline,
+    XGB_PARAMS,
+    tune_hyperparameters,
+    explain_predictions,
+    global_feature_importance,
+    generate_recommendations,
+    recommend_batch,
+    estimate_intervention_impacts,
+    INTERVENTIONS,
+    build_model,
+    generate_synthetic_shard,
+    generate_price,
+    refresh_model,
+)
+from airbnb_ml_batch import run_batch_scoring
+from airbnb_ml_bundle import save_model_bundle, read_manifest, load_drift_monitor
+from airbnb_ml_cache import PredictionCache, canonical_listing_key
+from airbnb_ml_feature_store import ListingFeatureStore, predict_by_listing_id
+from airbnb_ml_geo import GeoDistanceStage, brute_force_distances, generate_synthetic_geography
+from airbnb_ml_intervals import interval_coverage
+from airbnb_ml_monitor import DriftMonitor
+from airbnb_ml_multimodel import MultiModelRuntime, hash_buckets
+from airbnb_ml_kernels import CompiledPreprocessor, CompiledForest
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _train_demo_model(n_samples=2000, compact=False, native_categorical=False):
+    """Train the demo pipeline on synthetic data and return (model, X_test)."""
+    X_train, X_test, y_train, y_test = _split_demo_data(n_samples, compact)
+    model = train_model(X_train, y_train, X_test, y_test, compact=compact,
+                        native_categorical=native_categorical)
+    return model, X_test
+
+def _split_demo_data(n_samples=2000, compact=False):
+    """Synthetic data split the way main() splits it."""
+    df = generate_synthetic_data(n_samples=n_samples, compact=compact)
+    return train_test_split(df.drop('price', axis=1), df['price'],
+                            test_size=0.2, random_state=42)
+
+def _sample_rows(X, n_rows):
+    """Tile the test set up to n_rows listings."""
+    reps = int(np.ceil(n_rows / len(X)))
+    return X.iloc[np.tile(np.arange(len(X)), reps)[:n_rows]].reset_index(drop=True)
+
+def _time_call(fn, repeat=3):
+    """Best-of-repeat wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def bench_batch(n_rows=1000, loop_rows=200):
+    """Compare the per-row predict_home_value loop with predict_home_values."""
+    print("\n📊 Batch Prediction Benchmark")
+    model, X_test = _train_demo_model()
+    batch = _sample_rows(X_test, n_rows)
+    records = batch.head(loop_rows).to_dict('records')
+
+    runtime = ModelRuntime(model)
+
+    loop_time = _time_call(lambda: [predict_home_value(model, r) for r in records], repeat=1)
+    runtime_time = _time_call(lambda: [predict_home_value(runtime, r) for r in records], repeat=1)
+    batch_time = _time_call(lambda: predict_home_values(runtime, batch))
+
+    loop_rate = len(records) / loop_time
+    runtime_rate = len(records) / runtime_time
+    batch_rate = n_rows / batch_time
+    print(f"   Per-row loop:  {loop_rate:>12,.0f} rows/sec ({len(records)} rows)")
+    print(f"   Runtime loop:  {runtime_rate:>12,.0f} rows/sec ({len(records)} rows)")
+    print(f"   Batch API:     {batch_rate:>12,.0f} rows/sec ({n_rows} rows)")
+    print(f"   Speedup:       {batch_rate / loop_rate:>12.1f}x")
+    return {'loop_rows_per_sec': loop_rate, 'runtime_rows_per_sec': runtime_rate,
+            'batch_rows_per_sec': batch_rate}
+
+PIPELINE_VARIANTS = [
+    ('default', {}),
+    ('compact', {'compact': True}),
+    ('compact + native categorical', {'compact': True, 'native_categorical': True}),
+]
+
+def bench_preprocess(batch_sizes=(1, 64, 4096)):
+    """
+    Check the compiled preprocessor and ModelRuntime against the Pipeline
+    bit for bit for every pipeline variant, then compare latency per batch
+    size. Raises AssertionError on any mismatch.
+    """
+    print("\n📊 Compiled Preprocessor Benchmark")
+    for label, options in PIPELINE_VARIANTS[1:]:
+        variant, X_variant = _train_demo_model(**options)
+        runtime = ModelRuntime(variant)
+        expected = variant.named_steps['preprocessor'].transform(X_variant)
+        np.testing.assert_array_equal(runtime.transform(X_variant), expected)
+        np.testing.assert_array_equal(runtime.predict(expected), variant.predict(X_variant))
+        print(f"   ✅ {label}: identical features and predictions")
+
+    model, X_test = _train_demo_model()
+    preprocessor = model.named_steps['preprocessor']
+    compiled = CompiledPreprocessor.from_sklearn(preprocessor)
+
+    results = {}
+    print(f"   {'Batch':>6} {'sklearn':>12} {'compiled':>12} {'speedup':>9}")
+    for size in batch_sizes:
+        batch = _sample_rows(X_test, size)
+        expected = preprocessor.transform(batch)
+        inputs = batch.iloc[0].to_dict() if size == 1 else {
+            name: batch[name].to_numpy() for name in batch.columns
+        }
+        actual = compiled.transform(inputs)
+        assert np.array_equal(actual, expected), \
+            f"compiled preprocessor diverges from sklearn at batch size {size}"
+
+        repeat = max(3, 2000 // size)
+        sklearn_time = _time_call(lambda: preprocessor.transform(batch), repeat) * 1000
+        compiled_time = _time_call(lambda: compiled.transform(inputs), repeat) * 1000
+        print(f"   {size:>6} {sklearn_time:>10.3f}ms {compiled_time:>10.3f}ms "
+              f"{sklearn_time / compiled_time:>8.1f}x")
+        results[size] = {'sklearn_ms': sklearn_time, 'compiled_ms': compiled_time}
+
+    print("   ✅ Parity with preprocessor.transform at every batch size")
+    return results
+
+def bench_trees(batch_sizes=(1, 64, 4096, 65536)):
+    """
+    Check the flattened NumPy forest against XGBRegressor.predict and
+    GradientBoostingRegressor.predict, then compare throughput.
+    """
+    from sklearn.ensemble import GradientBoostingRegressor
+
+    print("\n📊 Compiled Tree Ensemble Benchmark")
+    model, X_test = _train_demo_model()
+    regressor = model.named_steps['regressor']
+    X = model.named_steps['preprocessor'].transform(_sample_rows(X_test, max(batch_sizes)))
+
+    forest = CompiledForest.from_xgboost(regressor)
+    expected = regressor.predict(X)
+    assert np.allclose(forest.predict(X), expected, rtol=1e-5, atol=1e-3), \
+        "compiled forest diverges from XGBRegressor.predict"
+
+    # Same check for the scikit-learn model used by airbnb_ml_demo_simple.py
+    gbr = GradientBoostingRegressor(n_estimators=100, max_depth=6, learning_rate=0.1,
+                                    random_state=42).fit(X[:2000], expected[:2000])
+    assert np.allclose(CompiledForest.from_sklearn_gbr(gbr).predict(X), gbr.predict(X),
+                       rtol=1e-9, atol=1e-9), \
+        "compiled forest diverges from GradientBoostingRegressor.predict"
+    print(f"   ✅ Parity with XGBoost and scikit-learn ({forest.n_trees} trees, "
+          f"depth {forest.max_depth})")
+
+    results = {}
+    print(f"   {'Batch':>6} {'xgboost':>14} {'compiled':>14}")
+    for size in batch_sizes:
+        batch = X[:size]
+        repeat = max(3, 2000 // size)
+        library_rate = size / _time_call(lambda: regressor.predict(batch), repeat)
+        compiled_rate = size / _time_call(lambda: forest.predict(batch), repeat)
+        print(f"   {size:>6} {library_rate:>9,.0f} r/s {compiled_rate:>9,.0f} r/s")
+        results[size] = {'xgboost_rows_per_sec': library_rate,
+                         'compiled_rows_per_sec': compiled_rate}
+    return results
+
+def bench_generate(n_samples=2_000_000, chunk_size=100_000, worker_counts=(1, 2, 4),
+                   fmt='npy'):
+    """Throughput of the sharded synthetic data writer per worker count."""
+    print("\n📊 Sharded Data Generation Benchmark")
+    print(f"   {n_samples:,} listings, {chunk_size:,} per shard, format={fmt}")
+    results = {}
+    for n_workers in worker_counts:
+        path = tempfile.mkdtemp(prefix='airbnb_bench_')
+        try:
+            elapsed = _time_call(
+                lambda: write_synthetic_dataset(path, n_samples, chunk_size,
+                                                fmt=fmt, n_workers=n_workers),
+                repeat=1
+            )
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+        rate = n_samples / elapsed
+        print(f"   {n_workers} worker(s): {rate:>12,.0f} rows/sec ({elapsed:.1f}s)")
+        results[n_workers] = rate
+    print(f"   (machine has {os.cpu_count()} CPU(s))")
+    return results
+
+def _train_and_report_rss(path, mode, n_estimators, results):
+    """Child process: train one way and report (seconds, peak RSS in MB)."""
+    import pandas as pd
+    from sklearn.pipeline import Pipeline
+    from xgboost import XGBRegressor
+
+    start = time.perf_counter()
+    if mode == 'out-of-core':
+        train_model_out_of_core(path, n_estimators=n_estimators)
+    else:
+        df = pd.concat(iter_dataset_chunks(path), ignore_index=True)
+        Pipeline(steps=[
+            ('preprocessor', create_feature_pipeline()),
+            ('regressor', XGBRegressor(n_estimators=n_estimators, tree_method='hist',
+                                       **XGB_PARAMS)),
+        ]).fit(df.drop(columns=['price']), df['price'])
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in kilobytes on Linux
+    results.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+def bench_out_of_core(sizes=(250_000, 1_000_000, 2_000_000), chunk_size=100_000,
+                      n_estimators=50):
+    """Peak RSS of in-memory vs out-of-core training against dataset size."""
+    print("\n📊 Out-of-Core Training Benchmark")
+    print(f"   {'Rows':>10} {'mode':>12} {'time':>8} {'peak RSS':>10}")
+    ctx = multiprocessing.get_context('spawn')
+    report = []
+    for n_samples in sizes:
+        path = tempfile.mkdtemp(prefix='airbnb_bench_')
+        try:
+            write_synthetic_dataset(path, n_samples, chunk_size, fmt='npy', n_workers=1)
+            for mode in ('in-memory', 'out-of-core'):
+                results = ctx.Queue()
+                worker = ctx.Process(target=_train_and_report_rss,
+                                     args=(path, mode, n_estimators, results))
+                worker.start()
+                elapsed, rss_mb = results.get()
+                worker.join()
+                print(f"   {n_samples:>10,} {mode:>12} {elapsed:>7.1f}s {rss_mb:>8.0f}MB")
+                report.append({'rows': n_samples, 'mode': mode,
+                               'seconds': elapsed, 'peak_rss_mb': rss_mb})
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    return report
+
+def bench_tune(n_samples=2000, n_configs=27):
+    """
+    Wall-clock of the original single cross_val_score call (booster and
+    fold workers both on n_jobs=-1) against a full successive-halving search.
+    """
+    from sklearn.model_selection import cross_val_score
+    from sklearn.pipeline import Pipeline
+    from xgboost import XGBRegressor
+
+    print("\n📊 Hyperparameter Search Benchmark")
+    df = generate_synthetic_data(n_samples=n_samples)
+    X, y = df.drop('price', axis=1), df['price']
+    baseline = Pipeline(steps=[
+        ('preprocessor', create_feature_pipeline()),
+        ('regressor', XGBRegressor(n_estimators=100, n_jobs=-1, **XGB_PARAMS)),
+    ])
+
+    cv_time = _time_call(lambda: cross_val_score(baseline, X, y, cv=5, scoring='r2',
+                                                 n_jobs=-1), repeat=1)
+    search = {}
+    tune_time = _time_call(lambda: search.update(tune_hyperparameters(X, y, n_configs=n_configs)),
+                           repeat=1)
+    n_fits = len(search['history'])
+    print(f"   Single CV call (1 config):      {cv_time:>6.2f}s")
+    print(f"   Halving search ({n_configs} configs):  {tune_time:>6.2f}s "
+          f"({n_fits} config-rung evaluations)")
+    print(f"   Per configuration:              {tune_time / n_configs:>6.2f}s")
+    print(f"   (machine has {os.cpu_count()} CPU(s))")
+    return {'cv_seconds': cv_time, 'tune_seconds': tune_time,
+            'best_score': search['best_score']}
+
+def bench_categorical(n_samples=20_000, batch_sizes=(1, 64, 4096)):
+    """Training time and inference latency: one-hot vs native categorical."""
+    print("\n📊 Native Categorical Benchmark")
+    X_train, X_test, y_train, y_test = _split_demo_data(n_samples)
+    results = {}
+    for label, native in [('one-hot', False), ('native', True)]:
+        fit_time = _time_call(
+            lambda: results.__setitem__(label, train_model(X_train, y_train, X_test, y_test,
+                                                           native_categorical=native)),
+            repeat=1
+        )
+        model = results[label]
+        runtime = ModelRuntime(model)
+        latencies = {}
+        for size in batch_sizes:
+            batch = _sample_rows(X_test, size)
+            repeat = max(3, 2000 // size)
+            latencies[size] = _time_call(lambda: predict_home_values(runtime, batch, explain=False),
+                                         repeat) * 1000
+        results[label] = {'fit_seconds': fit_time, 'test_r2': model.score(X_test, y_test),
+                          'latency_ms': latencies,
+                          'n_features': len(runtime.feature_names)}
+
+    print(f"   {'Pipeline':<9} {'features':>8} {'fit+CV':>8} {'R²':>7} " +
+          " ".join(f"{f'{size} rows':>11}" for size in batch_sizes))
+    for label, row in results.items():
+        print(f"   {label:<9} {row['n_features']:>8} {row['fit_seconds']:>7.2f}s "
+              f"{row['test_r2']:>7.4f} " +
+              " ".join(f"{row['latency_ms'][size]:>9.3f}ms" for size in batch_sizes))
+    return results
+
+def bench_explain(batch_sizes=(1, 64, 4096)):
+    """
+    Check native booster contributions against shap.TreeExplainer and
+    compare explain latency per batch size. Raises AssertionError on mismatch.
+    """
+    print("\n📊 Explanation Benchmark")
+    model, X_test = _train_demo_model()
+    native = ModelRuntime(model)
+    reference = ModelRuntime(model, explain_method='shap')
+
+    X = native.transform(X_test)
+    np.testing.assert_allclose(native.explain(X), reference.explain(X), rtol=1e-5, atol=1e-4)
+    record = X_test.iloc[0].to_dict()
+    assert ([name for name, _ in predict_home_value(native, record)['top_features']] ==
+            [name for name, _ in predict_home_value(reference, record)['top_features']])
+    print("   ✅ Native contributions match shap.TreeExplainer")
+
+    print(f"   {'Batch':>6} {'shap':>11} {'native':>11} {'speedup':>8}")
+    results = {}
+    for size in batch_sizes:
+        X = native.transform(_sample_rows(X_test, size))
+        repeat = max(3, 2000 // size)
+        shap_ms = _time_call(lambda: reference.explain(X), repeat) * 1000
+        native_ms = _time_call(lambda: native.explain(X), repeat) * 1000
+        results[size] = {'shap_ms': shap_ms, 'native_ms': native_ms}
+        print(f"   {size:>6} {shap_ms:>9.3f}ms {native_ms:>9.3f}ms {shap_ms / native_ms:>7.1f}x")
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import shap'], check=True)
+    results['shap_import_s'] = time.perf_counter() - start
+    print(f"   shap import (skipped by native mode): {results['shap_import_s'] * 1000:.0f}ms")
+    return results
+
+def bench_global_explain(n_rows=50_000, target_error=0.01, n_jobs=None):
+    """
+    Exact chunked mean |SHAP| vs the stratified-sample estimate.
+    Checks the chunked ranking against explain_predictions on a small input
+    first; raises AssertionError on mismatch.
+    """
+    print("\n📊 Global Explanation Benchmark")
+    model, X_test = _train_demo_model()
+    runtime = ModelRuntime(model)
+
+    _, reference = explain_predictions(runtime, X_test.head(200))
+    chunked = global_feature_importance(runtime, X_test.head(200), chunk_size=64, n_jobs=n_jobs)
+    assert list(chunked['feature_importance']['feature']) == list(reference['feature'])
+    print("   ✅ Chunked ranking matches the exact computation")
+
+    X = generate_synthetic_data(n_samples=n_rows).drop('price', axis=1)
+    directory = tempfile.mkdtemp(prefix='airbnb_shap_')
+    try:
+        start = time.perf_counter()
+        exact = global_feature_importance(runtime, X, n_jobs=n_jobs,
+                                          values_path=os.path.join(directory, 'exact.npy'))
+        exact_time = time.perf_counter() - start
+        start = time.perf_counter()
+        sampled = global_feature_importance(runtime, X, target_error=target_error, n_jobs=n_jobs)
+        sampled_time = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    truth = exact['feature_importance'].set_index('feature')['importance']
+    estimate = sampled['feature_importance'].set_index('feature')
+    max_error = (estimate['importance'] - truth[estimate.index]).abs().max() / truth.max()
+    print(f"\n   {'Mode':<9} {'rows':>9} {'time':>9}")
+    print(f"   {'exact':<9} {exact['n_explained']:>9,} {exact_time:>8.2f}s")
+    print(f"   {'sampled':<9} {sampled['n_explained']:>9,} {sampled_time:>8.2f}s")
+    print(f"   Max sampled error: {max_error:.2%} of top importance "
+          f"(target standard error {target_error:.0%})")
+    return {'exact_seconds': exact_time, 'sampled_seconds': sampled_time,
+            'sampled_rows': sampled['n_explained'], 'max_relative_error': max_error}
+
+def bench_recommend(n_rows=10_000_000, loop_rows=20_000):
+    """Per-dict generate_recommendations loop vs the vectorized rule engine."""
+    print("\n📊 Recommendations Benchmark")
+    records = generate_synthetic_data(n_samples=loop_rows).to_dict('records')
+    exploded = recommend_batch(records)
+    expected = [(i, rec['action']) for i, record in enumerate(records)
+                for rec in generate_recommendations(record, None)]
+    assert list(zip(exploded['row'], exploded['action'])) == expected
+    print("   ✅ Batch output matches the per-listing wrapper")
+
+    # Columnar batch at full scale, without building a DataFrame first
+    rng = np.random.default_rng(0)
+    columns = {
+        'has_wifi': rng.integers(0, 2, n_rows, dtype=np.int8),
+        'has_parking': rng.integers(0, 2, n_rows, dtype=np.int8),
+        'has_pool': rng.integers(0, 2, n_rows, dtype=np.int8),
+        'host_response_rate': rng.uniform(70, 100, n_rows).astype(np.float32),
+        'review_scores_rating': rng.uniform(3.5, 5, n_rows).astype(np.float32),
+    }
+    loop_time = _time_call(lambda: [generate_recommendations(r, None) for r in records], repeat=1)
+    batch_time = _time_call(lambda: recommend_batch(columns), repeat=1)
+    loop_rate = loop_rows / loop_time
+    batch_rate = n_rows / batch_time
+    print(f"   Per-dict loop: {loop_rate:>14,.0f} listings/sec ({loop_rows:,} listings)")
+    print(f"   Rule engine:   {batch_rate:>14,.0f} listings/sec ({n_rows:,} listings, "
+          f"{batch_time:.2f}s)")
+    return {'loop_rows_per_sec': loop_rate, 'batch_rows_per_sec': batch_rate,
+            'batch_seconds': batch_time}
+
+def bench_what_if(n_rows=200_000):
+    """
+    Stacked counterfactual batch through the Pipeline vs the what-if engine
+    (changed rows and touched trees only). Raises AssertionError on mismatch.
+    """
+    print("\n📊 What-If Impact Benchmark")
+    model, _ = _train_demo_model()
+    runtime = ModelRuntime(model)
+    X = generate_synthetic_data(n_samples=n_rows).drop('price', axis=1)
+
+    def stacked():
+        variants = []
+        for intervention in INTERVENTIONS:
+            variant = X.copy()
+            for name, change in intervention['changes'].items():
+                variant[name] = change(variant[name].to_numpy()) if callable(change) else change
+            variants.append(variant)
+        predictions = model.predict(pd.concat([X] + variants, ignore_index=True))
+        return (predictions[n_rows:].reshape(len(INTERVENTIONS), n_rows)
+                - predictions[:n_rows]).T
+
+    start = time.perf_counter()
+    reference = stacked()
+    stacked_time = time.perf_counter() - start
+    start = time.perf_counter()
+    impacts = estimate_intervention_impacts(runtime, X)
+    engine_time = time.perf_counter() - start
+    np.testing.assert_allclose(impacts.to_numpy(), reference, atol=1e-2)
+    print("   ✅ Engine deltas match the stacked Pipeline predictions")
+
+    trees = [len(runtime.forest.trees_using(np.concatenate(
+        [runtime.compiled.feature_columns(name) for name in intervention['changes']])))
+        for intervention in INTERVENTIONS]
+    print(f"   {'Intervention':<34} {'trees':>6} {'mean Δ':>9}")
+    for (action, mean), n_trees in zip(impacts.mean().items(), trees):
+        print(f"   {action:<34} {n_trees:>3}/{runtime.forest.n_trees:<3} {mean:>+8.2f}")
+    print(f"   Stacked Pipeline: {stacked_time:>7.2f}s   What-if engine: {engine_time:>7.2f}s "
+          f"({n_rows:,} listings x {len(INTERVENTIONS)} interventions)")
+    return {'stacked_seconds': stacked_time, 'engine_seconds': engine_time,
+            'mean_impacts': impacts.mean().to_dict()}
+
+# Child-process scripts timing import -> first prediction for each load path
+_COLD_START_SCRIPTS = {
+    'bundle (mmap)': '''
+import time; start = time.perf_counter()
+from airbnb_ml_bundle import load_model_bundle
+model = load_model_bundle({path!r})
+model.predict({record!r})
+print(time.perf_counter() - start)
+''',
+    'pickled Pipeline': '''
+import time; start = time.perf_counter()
+import pandas as pd
+from airbnb_ml_bundle import load_model_pipeline
+model = load_model_pipeline({path!r})
+model.predict(pd.DataFrame([{record!r}]))
+print(time.perf_counter() - start)
+''',
+    'ModelRuntime.from_bundle': '''
+import time; start = time.perf_counter()
+from airbnb_ml_system import ModelRuntime, predict_home_value
+predict_home_value(ModelRuntime.from_bundle({path!r}), {record!r})
+print(time.perf_counter() - start)
+''',
+}
+
+def bench_cold_start(repeat=3):
+    """Fresh-process time from import to first prediction per load path."""
+    print("\n📊 Cold Start Benchmark")
+    model, X_test = _train_demo_model()
+    record = {k: (v.item() if hasattr(v, 'item') else v)
+              for k, v in X_test.iloc[0].to_dict().items()}
+    path = tempfile.mkdtemp(prefix='airbnb_bundle_')
+    results = {}
+    try:
+        save_model_bundle(ModelRuntime(model), path)
+        here = os.path.dirname(os.path.abspath(__file__))
+        for label, script in _COLD_START_SCRIPTS.items():
+            code = script.format(path=path, record=record)
+            internal, total = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                output = subprocess.run([sys.executable, '-c', code], cwd=here, check=True,
+                                        capture_output=True, text=True).stdout
+                total.append(time.perf_counter() - start)
+                internal.append(float(output.strip().splitlines()[-1]))
+            results[label] = {'import_to_prediction_s': min(internal),
+                              'process_wall_s': min(total)}
+            print(f"   {label:<26} import→prediction {min(internal) * 1000:>7.0f}ms   "
+                  f"process wall {min(total) * 1000:>7.0f}ms")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return results
+
+def bench_cache(n_requests=2000, n_listings=200, ttl=300.0):
+    """
+    Repeat-quote workload (Zipf-distributed listings) through predict_home_value
+    uncached, with the in-memory cache and with the shared SQLite cache.
+    """
+    print("\n📊 Prediction Cache Benchmark")
+    model, X_test = _train_demo_model()
+    runtime = ModelRuntime(model)
+    listings = _sample_rows(X_test, n_listings).to_dict('records')
+    rng = np.random.default_rng(0)
+    picks = np.minimum(rng.zipf(1.3, n_requests), n_listings) - 1
+    requests = [listings[i] for i in picks]
+
+    # Key invariants: int/float and field order do not matter, the model version does
+    listing = listings[0]
+    reordered = dict(reversed(list(dict(listing, bedrooms=float(listing['bedrooms'])).items())))
+    assert canonical_listing_key(listing, 'v1') == canonical_listing_key(reordered, 'v1')
+    assert canonical_listing_key(listing, 'v1') != canonical_listing_key(listing, 'v2')
+
+    directory = tempfile.mkdtemp(prefix='airbnb_cache_')
+    results = {}
+    try:
+        caches = {
+            'uncached': None,
+            'memory LRU': PredictionCache(max_size=n_listings, ttl=ttl),
+            'SQLite LRU': PredictionCache(max_size=n_listings, ttl=ttl,
+                                          path=os.path.join(directory, 'cache.db')),
+        }
+        for label, cache in caches.items():
+            elapsed = _time_call(
+                lambda: [predict_home_value(runtime, r, cache=cache) for r in requests], repeat=1
+            )
+            results[label] = {'requests_per_sec': n_requests / elapsed,
+                              'hit_rate': cache.hit_rate if cache else 0.0,
+                              'stats': dict(cache.stats) if cache else {}}
+            print(f"   {label:<11} {n_requests / elapsed:>10,.0f} req/sec   "
+                  f"hit rate {results[label]['hit_rate']:>6.1%}")
+
+        # Hits are private copies, identical across backends, stamped when served
+        served = []
+        for cache in [caches['memory LRU'], caches['SQLite LRU']]:
+            first = predict_home_value(runtime, listing, cache=cache)
+            first['top_features'].clear()
+            time.sleep(0.001)
+            again = predict_home_value(runtime, listing, cache=cache)
+            assert again['top_features'] and again['timestamp'] != first['timestamp']
+            served.append(json.dumps(dict(again, timestamp=None)))
+        assert served[0] == served[1]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def bench_refresh(n_rows=50_000, change_fraction=0.05, extra_rounds=20):
+    """
+    Day-over-day update: warm-start refresh on new + changed rows vs a
+    full retrain on the whole updated dataset, scored on a day-1 holdout.
+    """
+    print("\n📊 Incremental Refresh Benchmark")
+    rng = np.random.default_rng(7)
+
+    def market_shift(df):
+        # Day 1: beach listings re-price 15% up
+        df['price'] = np.where(df['location_type'] == 'beach', df['price'] * 1.15, df['price'])
+        return df
+
+    day0 = generate_synthetic_shard(0, n_rows)
+    base = build_model().fit(day0.drop('price', axis=1), day0['price'])
+
+    n_changed = int(n_rows * change_fraction)
+    changed_idx = rng.choice(n_rows, n_changed, replace=False)
+    changed = day0.iloc[changed_idx].copy()
+    changed['review_scores_rating'] = np.minimum(changed['review_scores_rating'] + 0.3, 5.0)
+    changed['number_of_reviews'] += rng.integers(1, 20, n_changed)
+    changed['price'] = generate_price(changed, rng)
+    changed = market_shift(changed)
+    new = market_shift(generate_synthetic_shard(1, n_changed))
+    delta = pd.concat([changed, new])
+    holdout = market_shift(generate_synthetic_shard(2, 10_000))
+    X_holdout, y_holdout = holdout.drop('price', axis=1), holdout['price']
+
+    day1 = pd.concat([day0.drop(index=day0.index[changed_idx]), delta], ignore_index=True)
+    directory = tempfile.mkdtemp(prefix='airbnb_bundle_')
+    try:
+        saved = save_model_bundle(ModelRuntime(base), directory,
+                                  training_data=day0.drop('price', axis=1))
+        report = refresh_model(directory, delta.drop('price', axis=1), delta['price'],
+                               X_holdout, y_holdout, extra_rounds=extra_rounds)
+        if not report['rolled_back']:
+            # The refreshed bundle keeps serving with --monitor
+            refreshed = read_manifest(directory)
+            assert refreshed['training_fingerprint'] == saved['training_fingerprint']
+            assert load_drift_monitor(directory) is not None
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    start = time.perf_counter()
+    full = build_model().fit(day1.drop('price', axis=1), day1['price'])
+    full_seconds = time.perf_counter() - start
+    full_r2 = full.score(X_holdout, y_holdout)
+
+    print(f"\n   {'Model':<22} {'rows':>8} {'trees':>6} {'time':>8} {'holdout R²':>11}")
+    print(f"   {'previous (day 0)':<22} {n_rows:>8,} {100:>6} {'-':>8} "
+          f"{report['previous_r2']:>11.4f}")
+    print(f"   {'warm-start refresh':<22} {len(delta):>8,} {report['n_trees']:>6} "
+          f"{report['refresh_seconds']:>7.2f}s {report['refreshed_r2']:>11.4f}")
+    print(f"   {'full retrain':<22} {len(day1):>8,} {100:>6} {full_seconds:>7.2f}s "
+          f"{full_r2:>11.4f}")
+    print(f"   Refresh took {report['refresh_seconds'] / full_seconds:.0%} of the full retrain time")
+    return {'previous_r2': report['previous_r2'], 'refreshed_r2': report['refreshed_r2'],
+            'full_r2': full_r2, 'refresh_seconds': report['refresh_seconds'],
+            'full_seconds': full_seconds, 'rolled_back': report['rolled_back']}
+
+def bench_feature_store(n_listings=1_000_000, batch_sizes=(1, 64, 4096), n_updates=1000):
+    """
+    Scoring stored listings by ID (mmap gather + NumPy forest) vs scoring
+    the same listings from raw records with predict_home_values, plus
+    in-place attribute updates.
+    """
+    print("\n📊 Listing Feature Store Benchmark")
+    model, X_test = _train_demo_model()
+    runtime = ModelRuntime(model)
+    listings = _sample_rows(X_test, n_listings)
+    listing_ids = np.arange(n_listings, dtype=np.int64) * 7 + 1000
+    rng = np.random.default_rng(0)
+
+    directory = tempfile.mkdtemp(prefix='airbnb_features_')
+    results = {}
+    try:
+        start = time.perf_counter()
+        # Headroom for new listings, so upserts append without regrowing the files
+        store = ListingFeatureStore.create(directory, runtime, listing_ids, listings,
+                                           capacity=n_listings + n_listings // 8)
+        build_seconds = time.perf_counter() - start
+        size_mb = store.features.nbytes / 1e6
+        print(f"   Built store for {n_listings:,} listings in {build_seconds:.2f}s ({size_mb:.0f}MB)")
+
+        # Parity: the stored rows score like the raw listings
+        sample = rng.choice(n_listings, 256, replace=False)
+        np.testing.assert_allclose(
+            predict_by_listing_id(runtime, store, listing_ids[sample]),
+            runtime.predict(runtime.transform(listings.iloc[sample])), rtol=1e-5)
+
+        reader = ListingFeatureStore(directory)
+        print(f"\n   {'Batch':>6} {'by listing ID':>14} {'raw records':>12} {'speedup':>8}")
+        for batch_size in batch_sizes:
+            picks = rng.choice(n_listings, batch_size, replace=False)
+            ids, records = listing_ids[picks], listings.iloc[picks].to_dict('records')
+            by_id = _time_call(lambda: predict_by_listing_id(runtime, reader, ids), repeat=20)
+            raw = _time_call(lambda: predict_home_values(runtime, records, explain=False),
+                             repeat=5)
+            results[batch_size] = {'by_id_ms': by_id * 1000, 'raw_ms': raw * 1000}
+            print(f"   {batch_size:>6} {by_id * 1000:>12.3f}ms {raw * 1000:>10.3f}ms "
+                  f"{raw / by_id:>7.1f}x")
+
+        # In-place updates: a quarter of them are brand-new listings
+        picks = rng.choice(n_listings, n_updates, replace=False)
+        changed = listings.iloc[picks].copy()
+        changed['number_of_reviews'] += 10
+        ids = listing_ids[picks].copy()
+        ids[:n_updates // 4] = -np.arange(1, n_updates // 4 + 1)
+        start = time.perf_counter()
+        report = store.upsert(runtime, ids, changed)
+        update_seconds = time.perf_counter() - start
+        np.testing.assert_array_equal(store.get(ids), runtime.transform(changed).astype(np.float32))
+        print(f"\n   Upserted {report['updated']:,} changed + {report['inserted']:,} new listings "
+              f"in {update_seconds * 1000:.1f}ms")
+        results['build_seconds'] = build_seconds
+        results['update_ms'] = update_seconds * 1000
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def bench_batch_scoring(n_rows=40_000, chunk_size=2_500, worker_counts=(1, 2, 4, 8)):
+    """
+    Sharded batch scoring throughput at several worker counts, plus a
+    resume check: a run stopped half way and restarted must score only the
+    remaining partitions and produce the same output as one clean run.
+    """
+    print(f"\n📊 Batch Scoring Benchmark ({n_rows:,} rows, {os.cpu_count()} CPU core(s))")
+    model, _ = _train_demo_model()
+    directory = tempfile.mkdtemp(prefix='airbnb_batch_')
+    bundle, listings = os.path.join(directory, 'bundle'), os.path.join(directory, 'listings')
+    results = {}
+    try:
+        save_model_bundle(ModelRuntime(model), bundle)
+        write_synthetic_dataset(listings, n_rows, chunk_size=chunk_size)
+        n_partitions = int(np.ceil(n_rows / chunk_size))
+
+        for n_workers in worker_counts:
+            with contextlib.redirect_stdout(io.StringIO()):
+                report = run_batch_scoring(bundle, listings, os.path.join(directory, f'w{n_workers}'),
+                                           n_workers=n_workers)
+            results[n_workers] = report['rows_per_sec']
+        print(f"\n   {'Workers':>7} {'rows/sec':>12} {'speedup':>8}")
+        for n_workers, rows_per_sec in results.items():
+            print(f"   {n_workers:>7} {rows_per_sec:>12,.0f} {rows_per_sec / results[worker_counts[0]]:>7.2f}x")
+
+        # Resume: stop after half the partitions, then re-run to finish
+        resumed = os.path.join(directory, 'resumed')
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = run_batch_scoring(bundle, listings, resumed, n_workers=1,
+                                      max_partitions=n_partitions // 2)
+            # A resume with a different output schema is refused, not mixed in
+            for options in [{'explain': False}, {'top_k': 3}]:
+                try:
+                    run_batch_scoring(bundle, listings, resumed, n_workers=1, **options)
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError(f"resume with {options} was not refused")
+            second = run_batch_scoring(bundle, listings, resumed, n_workers=1)
+        assert not first['complete'] and second['complete']
+        assert second['partitions_skipped'] == n_partitions // 2
+        assert second['partitions_scored'] == n_partitions - n_partitions // 2
+        clean = pd.read_parquet(os.path.join(directory, f'w{worker_counts[0]}'))
+        pd.testing.assert_frame_equal(pd.read_parquet(resumed), clean)
+        print(f"\n   Resume: {first['partitions_scored']} partitions, stop, then "
+              f"{second['partitions_scored']} more ({second['partitions_skipped']} skipped); "
+              f"output identical to a clean run")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def _observe_shard(task):
+    """Worker side of bench_drift: sketch one shard with an empty copy of the monitor."""
+    state, listings, predictions = task
+    monitor = DriftMonitor.from_dict(state)
+    monitor.reset()
+    monitor.observe_batch(listings, predictions)
+    return monitor.to_dict()
+
+def bench_drift(n_requests=20_000, n_rows=1_000_000, n_workers=4):
+    """
+    Drift monitor: per-request overhead on predict_home_value, memory as
+    traffic grows, merging sketches from worker processes, and detection
+    of a shifted listing mix (in-distribution traffic must stay stable).
+    """
+    print("\n📊 Drift Monitor Benchmark")
+    X_train, X_test, y_train, y_test = _split_demo_data()
+    runtime = ModelRuntime(train_model(X_train, y_train, X_test, y_test))
+    baseline = DriftMonitor.from_baseline(X_train, runtime.predict(runtime.transform(X_train)))
+    state = baseline.to_dict()
+
+    # Per-request overhead, alone and relative to a full predict_home_value
+    requests = _sample_rows(X_test, n_requests).to_dict('records')
+    prices = runtime.predict(runtime.transform(requests))
+    monitor = DriftMonitor.from_dict(state)
+    observe = _time_call(lambda: [monitor.observe(r, p) for r, p in zip(requests, prices)])
+    observe_us = observe / n_requests * 1e6
+    sample = requests[:500]
+    plain = _time_call(lambda: [predict_home_value(runtime, r) for r in sample])
+    monitored = _time_call(lambda: [predict_home_value(runtime, r, monitor=monitor)
+                                    for r in sample])
+    print(f"   observe(): {observe_us:.1f}µs/request; predict_home_value "
+          f"{plain / len(sample) * 1000:.3f}ms -> {monitored / len(sample) * 1000:.3f}ms "
+          f"with the monitor")
+
+    # Constant memory: the serialized state does not grow with traffic
+    traffic = generate_synthetic_shard(1, n_rows).drop(columns='price')
+    traffic_prices = runtime.predict(runtime.transform(traffic))
+    size_before = len(json.dumps(DriftMonitor.from_dict(state).to_dict()))
+    single = DriftMonitor.from_dict(state)
+    start = time.perf_counter()
+    single.observe_batch(traffic, traffic_prices)
+    batch_seconds = time.perf_counter() - start
+    size_after = len(json.dumps(single.to_dict()))
+    print(f"   observe_batch(): {n_rows / batch_seconds:,.0f} rows/sec; state "
+          f"{size_before / 1e3:.1f}KB empty -> {size_after / 1e3:.1f}KB after {n_rows:,} rows")
+
+    # Merge: per-process sketches of shards add up to one sketch of everything
+    bounds = np.linspace(0, n_rows, n_workers + 1).astype(int)
+    tasks = [(state, traffic.iloc[lo:hi], traffic_prices[lo:hi])
+             for lo, hi in zip(bounds[:-1], bounds[1:])]
+    merged = DriftMonitor.from_dict(state)
+    with multiprocessing.get_context('fork').Pool(n_workers) as pool:
+        for part in pool.map(_observe_shard, tasks):
+            merged.merge(DriftMonitor.from_dict(part))
+    assert merged.to_dict() == single.to_dict()
+    print(f"   Merged {n_workers} worker sketches: identical to a single-process sketch")
+
+    # Detection: fresh listings from the training distribution stay stable,
+    # a shifted mix is flagged
+    assert all(row['status'] == 'stable' for row in single.drift_report().values())
+    rng = np.random.default_rng(0)
+    shifted = traffic.iloc[:50_000].copy()
+    shifted['distance_to_metro'] = shifted['distance_to_metro'] * 2.5
+    shifted['location_type'] = np.where(rng.random(len(shifted)) < 0.5, 'beach',
+                                        shifted['location_type'])
+    drifted = DriftMonitor.from_dict(state)
+    drifted.observe_batch(shifted, runtime.predict(runtime.transform(shifted)))
+    drifted.print_report()
+    report = drifted.drift_report()
+    assert report['distance_to_metro']['status'] == 'drift'
+    assert report['location_type']['status'] != 'stable'
+    return {'observe_us': observe_us, 'batch_rows_per_sec': n_rows / batch_seconds,
+            'state_bytes': size_after,
+            'predict_overhead_us': (monitored - plain) / len(sample) * 1e6}
+
+def bench_intervals(n_test=50_000, n_requests=500, batch_rows=100_000):
+    """
+    Coverage of the conformal intervals train_model calibrates, overall and
+    per (location_type, property_type) bucket, on fresh listings, and the
+    latency they add to predict_home_value / predict_home_values.
+    """
+    print("\n📊 Prediction Interval Benchmark")
+    X_train, X_test, y_train, y_test = _split_demo_data()
+    runtime = ModelRuntime(train_model(X_train, y_train, X_test, y_test))
+    intervals = runtime.intervals
+    fresh = generate_synthetic_shard(3, n_test)
+    X_fresh, y_fresh = fresh.drop(columns='price'), fresh['price'].to_numpy()
+
+    results = predict_home_values(runtime, X_fresh, explain=False)
+    overall = interval_coverage(results['price_lower'], results['price_upper'], y_fresh)
+    print(f"   Target coverage {intervals.coverage:.0%}, calibrated on "
+          f"{intervals.n_calibration:,} out-of-fold residuals")
+    print(f"\n   {'Bucket':<28} {'listings':>9} {'coverage':>9} {'width':>9}")
+    buckets = fresh.groupby(list(intervals.bucket_columns)).indices
+    per_bucket = {}
+    for key, rows in sorted(buckets.items()):
+        row = interval_coverage(results['price_lower'][rows], results['price_upper'][rows],
+                                y_fresh[rows])
+        per_bucket[key] = row
+        print(f"   {' / '.join(key):<28} {len(rows):>9,} {row['coverage']:>8.1%} "
+              f"${row['mean_width']:>7.0f}")
+    print(f"   {'all':<28} {n_test:>9,} {overall['coverage']:>8.1%} ${overall['mean_width']:>7.0f}")
+
+    # Added latency: the interval step itself, per listing and per batch
+    requests = X_fresh.head(n_requests).to_dict('records')
+    batch = _sample_rows(X_fresh, batch_rows)
+    batch_predictions = runtime.predict(runtime.transform(batch))
+    single = _time_call(lambda: [intervals.half_width(r) for r in requests])
+    batched = _time_call(lambda: intervals.interval(batch, batch_predictions))
+    scoring = _time_call(lambda: predict_home_values(runtime, batch, explain=False))
+    single_us = single / n_requests * 1e6
+    print(f"\n   Added latency: {single_us:.2f}µs per single listing "
+          f"(one bucket lookup), {batched * 1000:.1f}ms per {batch_rows:,}-row "
+          f"batch ({scoring * 1000:.0f}ms for predict_home_values on it)")
+    assert overall['coverage'] >= intervals.coverage - 0.02
+    return {'coverage': overall['coverage'], 'mean_width': overall['mean_width'],
+            'per_bucket': per_bucket, 'single_added_us': single_us,
+            'batch_added_ms': batched * 1000}
+
+def bench_geo(n_listings=1_000_000, n_points=20_000, brute_rows=5_000, n_requests=10_000):
+    """
+    Geospatial distance stage: KD-tree batch queries over n_listings vs
+    brute-force pairwise haversine (timed on brute_rows and extrapolated),
+    and the cached single-listing path on a repeat-quote workload.
+    """
+    print(f"\n📊 Geospatial Feature Benchmark ({n_points:,} stations + {n_points:,} landmarks)")
+    stations, landmarks, listings = generate_synthetic_geography(
+        n_listings, n_stations=n_points, n_landmarks=n_points)
+
+    start = time.perf_counter()
+    geo = GeoDistanceStage(stations, landmarks)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    metro, nearby = geo.distances(listings['latitude'], listings['longitude'])
+    indexed_seconds = time.perf_counter() - start
+
+    subset = listings.head(brute_rows)
+    start = time.perf_counter()
+    brute_metro, brute_nearby = brute_force_distances(subset, stations, landmarks)
+    brute_seconds = time.perf_counter() - start
+    np.testing.assert_allclose(metro[:brute_rows], brute_metro, rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(nearby[:brute_rows], brute_nearby, rtol=1e-6, atol=1e-6)
+
+    brute_rate = brute_rows / brute_seconds
+    print(f"   Index build: {build_seconds * 1000:.0f}ms")
+    print(f"   KD-tree:     {n_listings / indexed_seconds:>12,.0f} listings/sec "
+          f"({n_listings:,} in {indexed_seconds:.1f}s)")
+    print(f"   Brute force: {brute_rate:>12,.0f} listings/sec "
+          f"(~{n_listings / brute_rate:.0f}s for {n_listings:,}), "
+          f"{n_listings / indexed_seconds / brute_rate:.0f}x slower, same distances")
+
+    # Online path: Zipf-distributed repeat quotes over 1,000 listings
+    rng = np.random.default_rng(0)
+    picks = np.minimum(rng.zipf(1.3, n_requests), 1000) - 1
+    requests = subset.iloc[picks].to_dict('records')
+    uncached = _time_call(lambda: [geo.distances(np.array([r['latitude']]),
+                                                 np.array([r['longitude']]))
+                                   for r in requests], repeat=1)
+    geo._lookup.cache_clear()
+    cached = _time_call(lambda: [geo.transform(r) for r in requests], repeat=1)
+    info = geo.cache_info()
+    print(f"   Single listing: {uncached / n_requests * 1e6:.0f}µs uncached, "
+          f"{cached / n_requests * 1e6:.1f}µs through the cache "
+          f"(hit rate {info.hits / (info.hits + info.misses):.0%})")
+    return {'build_ms': build_seconds * 1000, 'indexed_rows_per_sec': n_listings / indexed_seconds,
+            'brute_rows_per_sec': brute_rate, 'single_uncached_us': uncached / n_requests * 1e6,
+            'single_cached_us': cached / n_requests * 1e6}
+
+def bench_shadow(n_requests=500, batch_rows=4096, n_ids=200_000):
+    """
+    Shadow serving: an incumbent plus a shadow candidate that shares its
+    fitted preprocessor, scored by MultiModelRuntime (one transform, two
+    tree evaluations) vs two independent runtimes (two transforms), and
+    the stability and balance of the hash-based A/B split.
+    """
+    print("\n📊 Shadow / A-B Serving Benchmark")
+    X_train, X_test, y_train, y_test = _split_demo_data()
+    incumbent = train_model(X_train, y_train, X_test, y_test)
+    preprocessor = incumbent.named_steps['preprocessor']
+    candidate = XGBRegressor(n_estimators=200, max_depth=4, learning_rate=0.05,
+                             random_state=7).fit(preprocessor.transform(X_train), y_train)
+    candidate = Pipeline(steps=[('preprocessor', preprocessor), ('regressor', candidate)])
+    # Trained on other data: its own preprocessor statistics, its own group
+    X_other, _, y_other, _ = _split_demo_data(3000)
+    challenger = build_model().fit(X_other, y_other)
+
+    runtimes = {name: ModelRuntime(model) for name, model in
+                [('incumbent', incumbent), ('candidate', candidate), ('challenger', challenger)]}
+    shadowed = MultiModelRuntime(runtimes, arms={'incumbent': 1.0}, shadows=['candidate'])
+    print(f"   {len(shadowed.groups)} preprocessor groups for {len(runtimes)} models")
+    assert len(shadowed.groups) == 2
+
+    requests = X_test.head(n_requests).to_dict('records')
+    batch = _sample_rows(X_test, batch_rows)
+    ids = np.arange(batch_rows)
+    result = shadowed.predict(batch, ids)
+    np.testing.assert_allclose(result['predicted_price'], np.round(incumbent.predict(batch), 2),
+                               rtol=1e-5, atol=0.01)
+    np.testing.assert_allclose(result['shadow']['candidate'], candidate.predict(batch), rtol=1e-5)
+
+    def independent(records):
+        for name in ('incumbent', 'candidate'):
+            runtime = runtimes[name]
+            runtime.predict(runtime.transform(records))
+
+    incumbent_runtime = runtimes['incumbent']
+    candidate_runtime = runtimes['candidate']
+    X_single = incumbent_runtime.transform(requests[0]).copy()
+    X_batch = incumbent_runtime.transform(batch)
+    rows = {}
+    print(f"\n   {'Path':<34} {'single':>10} {f'{batch_rows}-row batch':>16}")
+    for label, single_fn, batch_fn in [
+        ('incumbent only', lambda r: incumbent_runtime.predict(incumbent_runtime.transform(r)),
+         lambda: incumbent_runtime.predict(incumbent_runtime.transform(batch))),
+        ('+ shadow, two runtimes', independent, lambda: independent(batch)),
+        ('+ shadow, MultiModelRuntime', lambda r: shadowed.predict(r, 17),
+         lambda: shadowed.predict(batch, ids)),
+        ('candidate trees alone', lambda r: candidate_runtime.predict(X_single),
+         lambda: candidate_runtime.predict(X_batch)),
+    ]:
+        single = _time_call(lambda: [single_fn(r) for r in requests]) / n_requests
+        batched = _time_call(batch_fn)
+        rows[label] = (single, batched)
+        print(f"   {label:<34} {single * 1e6:>8.0f}µs {batched * 1000:>14.1f}ms")
+    base, shared, trees = rows['incumbent only'], rows['+ shadow, MultiModelRuntime'], \
+        rows['candidate trees alone']
+    print(f"   Shadow adds {(shared[0] - base[0]) * 1e6:.0f}µs per request "
+          f"(candidate trees: {trees[0] * 1e6:.0f}µs), "
+          f"{(shared[1] - base[1]) * 1000:.1f}ms per batch (trees: {trees[1] * 1000:.1f}ms)")
+
+    # A/B split: stable per listing, across runtimes, and close to the weights
+    ab = MultiModelRuntime(runtimes, arms={'incumbent': 0.9, 'challenger': 0.1})
+    listing_ids = np.arange(1, n_ids + 1) * 7919
+    arms = ab.assign(listing_ids)
+    share = float(np.mean(arms == 1))
+    assert np.array_equal(arms, MultiModelRuntime(runtimes, arms={'incumbent': 0.9,
+                                                                  'challenger': 0.1}).assign(listing_ids))
+    assert abs(share - 0.1) < 0.005
+    string_share = float(np.mean(hash_buckets([f"listing-{i}" for i in range(n_ids // 10)]) >= 0.9))
+    assert abs(string_share - 0.1) < 0.01
+    split = ab.predict(batch, ids)
+    for i, name in enumerate(ab.arm_names):
+        rows_in_arm = np.flatnonzero(ab.assign(ids) == i)
+        np.testing.assert_allclose(split['predicted_price'][rows_in_arm],
+                                   np.round(runtimes[name].predict(
+                                       runtimes[name].transform(batch.iloc[rows_in_arm])), 2),
+                                   rtol=1e-5, atol=0.01)
+    print(f"   A/B split 90/10 over {n_ids:,} integer IDs: {share:.2%} to challenger "
+          f"({string_share:.2%} for string IDs), identical across runtimes")
+
+    stats = shadowed.stats()['candidate']
+    print(f"   Shadow deltas vs served: mean {stats['mean_delta']:+.2f}, "
+          f"mean |Δ| {stats['mean_abs_delta']:.2f}, max |Δ| {stats['max_abs_delta']:.2f} "
+          f"over {stats['compared']:,} predictions")
+    return {'single_us': {label: single * 1e6 for label, (single, _) in rows.items()},
+            'batch_ms': {label: batched * 1000 for label, (_, batched) in rows.items()},
+            'challenger_share': share, 'mean_abs_delta': stats['mean_abs_delta']}
+
+
+# ============================================================================
+# SUITE (recorded history + regression gate)
+# ============================================================================
+
+SUITE_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Stages that do not scale to the full grid run at most this many rows
+SUITE_MAX_ROWS = {'pipeline_fit': 1_000_000, 'cross_val_score': 100_000,
+                  'explain_predictions': 10_000}
+
+# Changes smaller than this are noise, whatever the relative change
+SUITE_NOISE_FLOOR_S = 0.005
+
+class _PeakRSS:
+    """Samples resident memory in a thread; .peak_mb is the growth over the start."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_mb = None
+
+    @staticmethod
+    def _rss_bytes():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            return None
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self._peak = max(self._peak, self._rss_bytes() or 0)
+
+    def __enter__(self):
+        self._start = self._rss_bytes()
+        self._peak = self._start or 0
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        if self._start is not None:
+            self._peak = max(self._peak, self._rss_bytes() or 0)
+            self.peak_mb = (self._peak - self._start) / 1e6
+
+def _measure(fn, calls=1):
+    """
+    Run fn `calls` times with its output silenced; returns (result of the
+    last call, metrics) with total wall time, p50/p99 per call and peak RSS growth.
+    """
+    latencies = []
+    with _PeakRSS() as memory, contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(calls):
+            start = time.perf_counter()
+            result = fn()
+            latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+    return result, {
+        'wall_s': float(np.sum(latencies)),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'peak_rss_mb': memory.peak_mb,
+    }
+
+def _stage_rows(stage, n_rows):
+    return min(n_rows, SUITE_MAX_ROWS.get(stage, n_rows))
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+def run_suite(sizes=SUITE_SIZES, n_calls=200):
+    """
+    Time every stage of the system at each dataset size.
+    Returns {"<stage>@<rows>": metrics}.
+    """
+    results = {}
+
+    def record(stage, rows, metrics):
+        key = f"{stage}@{rows}"
+        results[key] = dict(metrics, rows=rows)
+        print(f"   {key:<34} {metrics['wall_s']:>9.3f}s  p50 {metrics['p50_ms']:>9.2f}ms  "
+              f"p99 {metrics['p99_ms']:>9.2f}ms  peak {metrics['peak_rss_mb'] or 0:>8.1f}MB"
+              + (f"  artifact {metrics['artifact_mb']:.2f}MB" if 'artifact_mb' in metrics else ''))
+
+    for n_rows in sizes:
+        df, metrics = _measure(lambda: generate_synthetic_data(n_samples=n_rows))
+        record('generate_synthetic_data', n_rows, metrics)
+        X, y = df.drop('price', axis=1), df['price']
+        del df
+
+        fit_rows = _stage_rows('pipeline_fit', n_rows)
+        if f"pipeline_fit@{fit_rows}" not in results:
+            model, metrics = _measure(lambda: build_model().fit(X.head(fit_rows),
+                                                               y.head(fit_rows)))
+            directory = tempfile.mkdtemp(prefix='airbnb_bundle_')
+            try:
+                runtime = ModelRuntime(model)
+                save_model_bundle(runtime, directory)
+                metrics['artifact_mb'] = _directory_size(directory) / 1e6
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            record('pipeline_fit', fit_rows, metrics)
+
+        cv_rows = _stage_rows('cross_val_score', n_rows)
+        if f"cross_val_score@{cv_rows}" not in results:
+            _, metrics = _measure(lambda: cross_val_score(
+                build_model(), X.head(cv_rows), y.head(cv_rows), cv=5, scoring='r2'))
+            record('cross_val_score', cv_rows, metrics)
+
+        records = X.head(n_calls).to_dict('records')
+        calls = iter(range(n_calls))
+        _, metrics = _measure(lambda: predict_home_value(runtime, records[next(calls)]), n_calls)
+        record('predict_home_value', n_rows, metrics)
+
+        _, metrics = _measure(lambda: [predict_home_values(runtime, X.iloc[i:i + 100_000],
+                                                           explain=False)
+                                       for i in range(0, n_rows, 100_000)])
+        record('predict_home_values', n_rows, metrics)
+
+        explain_rows = _stage_rows('explain_predictions', n_rows)
+        if f"explain_predictions@{explain_rows}" not in results:
+            _, metrics = _measure(lambda: explain_predictions(runtime, X.head(explain_rows)))
+            record('explain_predictions', explain_rows, metrics)
+
+        calls = iter(range(n_calls))
+        _, metrics = _measure(lambda: generate_recommendations(records[next(calls)], None),
+                              n_calls)
+        record('generate_recommendations', n_rows, metrics)
+
+        _, metrics = _measure(lambda: recommend_batch(X))
+        record('recommend_batch', n_rows, metrics)
+        del X, y
+    return results
+
+def _environment():
+    import sklearn
+    import xgboost
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                                ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(),
+            'numpy': np.__version__, 'sklearn': sklearn.__version__,
+            'xgboost': xgboost.__version__, 'cpus': os.cpu_count(),
+            'machine': platform.machine()}
+
+def find_regressions(results, history, threshold=0.2):
+    """
+    Compare wall time and p99 with the latest clean run in history that
+    measured the same stage and size. Returns one message per regression.
+    """
+    regressions = []
+    clean_runs = [run for run in history if not run.get('regressions')]
+    for key, metrics in results.items():
+        baseline = next((run['results'][key] for run in reversed(clean_runs)
+                         if key in run['results']), None)
+        if baseline is None:
+            continue
+        for field, scale in (('wall_s', 1.0), ('p99_ms', 1e-3)):
+            old, new = baseline[field], metrics[field]
+            if new > old * (1 + threshold) and (new - old) * scale > SUITE_NOISE_FLOOR_S:
+                regressions.append(f"{key} {field}: {old:.4g} -> {new:.4g} "
+                                   f"(+{(new / old - 1):.0%})")
+    return regressions
+
+def bench_suite(sizes=SUITE_SIZES, history_path='benchmark_history.json', threshold=0.2):
+    """
+    Run the suite, append the run to the JSON history and compare it with
+    the previous clean run. Returns the run; run['regressions'] lists any
+    stage slower than the threshold allows.
+    """
+    print(f"\n📊 Benchmark Suite ({', '.join(f'{n:,}' for n in sizes)} rows)")
+    history = []
+    if os.path.exists(history_path):
+        with open(history_path) as f:
+            history = json.load(f)
+
+    results = run_suite(sizes)
+    run = {'timestamp': datetime.now().isoformat(), 'environment': _environment(),
+           'threshold': threshold, 'results': results,
+           'regressions': find_regressions(results, history, threshold)}
+    history.append(run)
+    with open(history_path, 'w') as f:
+        json.dump(history, f, indent=2)
+
+    print(f"\n   💾 Recorded run {len(history)} in {history_path}")
+    if run['regressions']:
+        print(f"   ❌ {len(run['regressions'])} regression(s) beyond {threshold:.0%}:")
+        for message in run['regressions']:
+            print(f"      {message}")
+    else:
+        print(f"   ✅ No regressions beyond {threshold:.0%}")
+    return run
+
+# Each entry maps a CLI name to a runner taking the parsed arguments
+BENCHMARKS = {
+    'batch': lambda args: bench_batch(n_rows=args.rows),
+    'preprocess': lambda args: bench_preprocess(),
+    'trees': lambda args: bench_trees(),
+    'generate': lambda args: bench_generate(),
+    'out-of-core': lambda args: bench_out_of_core(),
+    'tune': lambda args: bench_tune(),
+    'categorical': lambda args: bench_categorical(),
+    'cold-start': lambda args: bench_cold_start(),
+    'cache': lambda args: bench_cache(),
+    'explain': lambda args: bench_explain(),
+    'global-explain': lambda args: bench_global_explain(),
+    'recommend': lambda args: bench_recommend(),
+    'what-if': lambda args: bench_what_if(),
+    'refresh': lambda args: bench_refresh(),
+    'feature-store': lambda args: bench_feature_store(),
+    'batch-scoring': lambda args: bench_batch_scoring(),
+    'drift': lambda args: bench_drift(),
+    'intervals': lambda args: bench_intervals(),
+    'geo': lambda args: bench_geo(),
+    'shadow': lambda args: bench_shadow(),
+}
+
+def _run_suite_cli(args):
+    run = bench_suite(tuple(args.sizes), args.history, args.threshold)
+    if run['regressions']:
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Airbnb ML system benchmarks")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS) + ['all', 'suite'])
+    parser.add_argument('--rows', type=int, default=1000,
+                        help="Rows per batch for batch benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SUITE_SIZES),
+                        help="Dataset sizes for the suite")
+    parser.add_argument('--history', default='benchmark_history.json',
+                        help="JSON history file for the suite")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown that fails the suite")
+    args = parser.parse_args()
+
+    if args.benchmark == 'suite':
+        _run_suite_cli(args)
+        return
+
+    names = sorted(BENCHMARKS) if args.benchmark == 'all' else [args.benchmark]
+    for name in names:
+        BENCHMARKS[name](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Airbnb Home Value Prediction - Model Bundles
+Versioned on-disk format for a trained model, built for fast cold starts.
+
+Bundle layout (one directory):
+    manifest.json      format version, model version, feature names,
+                       training-data fingerprint, metrics, kernel configs
+    arrays/*.npy       preprocessor statistics and flattened tree arrays,
+                       memory-mapped read-only on load so forked workers
+                       share the same physical pages
+    booster.ubj        raw XGBoost booster (library predict / SHAP)
+    drift_baseline.json
+                       training-data sketches for the drift monitor
+                       (only when saved with training_data)
+    pipeline.pkl       pickled sklearn Pipeline (full ModelRuntime)
+
+Loading the compiled model needs NumPy only.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from airbnb_ml_kernels import CompiledPreprocessor, CompiledForest, CompiledModel
+from airbnb_ml_monitor import DriftMonitor
+
+BUNDLE_FORMAT_VERSION = 1
+
+# ============================================================================
+# 1. SAVING
+# ============================================================================
+
+def dataset_fingerprint(df):
+    """Stable SHA-256 of a DataFrame's contents, ignoring the index."""
+    import pandas as pd
+
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update(','.join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+def _save_arrays(directory, prefix, arrays):
+    """Write each array as its own .npy so it can be memory-mapped alone."""
+    names = []
+    for name, array in arrays.items():
+        filename = f"{prefix}.{name}.npy"
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(array))
+        names.append(name)
+    return names
+
+def save_model_bundle(runtime, path, metrics=None, training_data=None, inherit_from=None):
+    """
+    Write a ModelRuntime to a bundle directory at path.
+    The bundle is assembled in a temporary directory and moved into place,
+    so readers never see a half-written bundle. An existing bundle is first
+    renamed to path.previous and deleted only once the new one is in place:
+    a reader racing the swap can briefly find no bundle, but a crash never
+    loses both (recover by renaming path.previous back).
+    Without training_data, inherit_from (a previous bundle, which may be
+    path itself) supplies the training fingerprint and drift baseline, for
+    models updated from that bundle rather than trained from scratch.
+    """
+    inherited = read_manifest(inherit_from) if inherit_from and training_data is None else {}
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.bundle-', dir=parent)
+    arrays_dir = os.path.join(staging, 'arrays')
+    os.makedirs(arrays_dir)
+
+    preprocessor_arrays, preprocessor_config = runtime.compiled.to_arrays()
+    forest_arrays, forest_config = runtime.forest.to_arrays()
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'model_version': runtime.version,
+        'created_at': datetime.now().isoformat(),
+        'feature_names': [str(name) for name in runtime.feature_names],
+        'training_fingerprint': (dataset_fingerprint(training_data)
+                                 if training_data is not None
+                                 else inherited.get('training_fingerprint')),
+        'metrics': metrics or {},
+        'drift_baseline': ('drift_baseline.json'
+                           if training_data is not None or inherited.get('drift_baseline')
+                           else None),
+        'preprocessor': {
+            'config': preprocessor_config,
+            'arrays': _save_arrays(arrays_dir, 'preprocessor', preprocessor_arrays),
+        },
+        'forest': {
+            'config': forest_config,
+            'arrays': _save_arrays(arrays_dir, 'forest', forest_arrays),
+        },
+    }
+
+    runtime.regressor.get_booster().save_model(os.path.join(staging, 'booster.ubj'))
+    with open(os.path.join(staging, 'pipeline.pkl'), 'wb') as f:
+        pickle.dump(runtime.model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    if training_data is not None:
+        predictions = runtime.predict(runtime.transform(training_data))
+        DriftMonitor.from_baseline(training_data, predictions).save(
+            os.path.join(staging, manifest['drift_baseline']))
+    elif manifest['drift_baseline']:
+        shutil.copyfile(os.path.join(inherit_from, inherited['drift_baseline']),
+                        os.path.join(staging, manifest['drift_baseline']))
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Move the old bundle aside before the new one takes its name, so a crash
+    # at any point leaves a complete bundle at path or at path.previous
+    previous = os.path.abspath(path) + '.previous'
+    if os.path.exists(path):
+        if os.path.exists(previous):
+            shutil.rmtree(previous)
+        os.replace(path, previous)
+    os.replace(staging, path)
+    if os.path.exists(previous):
+        shutil.rmtree(previous)
+    return manifest
+
+# ============================================================================
+# 2. LOADING
+# ============================================================================
+
+def read_manifest(path):
+    """Read and version-check a bundle manifest."""
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest['format_version'] > BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Bundle format {manifest['format_version']} is newer than "
+            f"supported version {BUNDLE_FORMAT_VERSION}"
+        )
+    return manifest
+
+def _load_arrays(path, prefix, names, mmap):
+    """Load a kernel's arrays, memory-mapped read-only when mmap is set."""
+    mmap_mode = 'r' if mmap else None
+    return {
+        name: np.load(os.path.join(path, 'arrays', f"{prefix}.{name}.npy"), mmap_mode=mmap_mode)
+        for name in names
+    }
+
+def load_model_bundle(path, mmap=True):
+    """
+    Load the NumPy-only CompiledModel from a bundle.
+    With mmap=True the node and statistics arrays stay file-backed, so
+    loading is O(manifest) and forked workers share them without copying.
+    """
+    manifest = read_manifest(path)
+    preprocessor = CompiledPreprocessor.from_arrays(
+        _load_arrays(path, 'preprocessor', manifest['preprocessor']['arrays'], mmap),
+        manifest['preprocessor']['config']
+    )
+    forest = CompiledForest.from_arrays(
+        _load_arrays(path, 'forest', manifest['forest']['arrays'], mmap),
+        manifest['forest']['config']
+    )
+    return CompiledModel(preprocessor, forest, manifest['feature_names'],
+                         manifest['model_version'], metadata=manifest)
+
+def load_drift_monitor(path):
+    """Empty DriftMonitor over the bundle's training baseline, or None if it has none."""
+    baseline = read_manifest(path).get('drift_baseline')
+    if baseline is None:
+        return None
+    monitor = DriftMonitor.load(os.path.join(path, baseline))
+    monitor.reset()
+    return monitor
+
+def load_model_pipeline(path):
+    """Unpickle the full sklearn Pipeline (imports sklearn and xgboost)."""
+    with open(os.path.join(path, 'pipeline.pkl'), 'rb') as f:
+        return pickle.load(f)
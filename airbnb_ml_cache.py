@@ -0,0 +1,246 @@
+"""
+Airbnb Home Value Prediction - Prediction Cache
+Bounded LRU + TTL cache for repeat quotes of unchanged listings.
+
+Keys are a hash of the canonicalized listing fields plus the model version,
+so swapping the model invalidates every entry without an explicit flush.
+The in-memory backend is per process; the SQLite backend is a single file
+that several worker processes (or server instances) share. Both store the
+result as JSON text, so every lookup returns a fresh copy in the same form
+(tuples as lists, NumPy scalars as Python numbers) whichever backend is used.
+
+Usage:
+    cache = PredictionCache(max_size=10_000, ttl=300)
+    result = predict_home_value(runtime, listing, cache=cache)
+    cache.stats   # {'hits': ..., 'misses': ..., 'evictions': ..., 'expired': ...}
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# The 20 input fields of a listing (the sample_property schema)
+LISTING_FIELDS = (
+    'property_type', 'bedrooms', 'bathrooms', 'accommodates', 'location_type',
+    'distance_to_metro', 'distance_to_landmarks', 'has_wifi', 'has_parking',
+    'has_pool', 'has_kitchen', 'host_response_rate', 'host_acceptance_rate',
+    'host_is_superhost', 'host_listings_count', 'number_of_reviews',
+    'review_scores_rating', 'review_scores_cleanliness', 'season',
+    'days_since_listing',
+)
+
+# ============================================================================
+# 1. CANONICAL KEYS
+# ============================================================================
+
+def _canonical_value(value, precision):
+    """Numbers become rounded floats (so 3, 3.0 and np.int8(3) agree); NaN becomes None."""
+    if value is None or isinstance(value, str):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if math.isnan(number):
+        return None
+    return round(number, precision)
+
+def canonical_listing_key(record, model_version, precision=4, fields=LISTING_FIELDS):
+    """
+    Hash a listing into a cache key.
+    Only the listed fields count, in a fixed order, so key order and extra
+    request fields do not matter; missing fields hash as None.
+    """
+    values = [_canonical_value(record.get(field), precision) for field in fields]
+    payload = json.dumps([str(model_version), values], separators=(',', ':'))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+# ============================================================================
+# 2. BACKENDS
+# ============================================================================
+
+class MemoryCacheBackend:
+    """Per-process LRU over an OrderedDict; entries carry their expiry time."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key, now):
+        """Return (status, value) where status is 'hit', 'miss' or 'expired'."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return 'miss', None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return 'expired', None
+        self._entries.move_to_end(key)
+        return 'hit', value
+
+    def put(self, key, value, expires_at):
+        """Store a value; returns the number of entries evicted to make room."""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        evicted = 0
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+def _to_json_scalar(value):
+    """json.dumps fallback for NumPy scalars and arrays."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class SqliteCacheBackend:
+    """
+    LRU shared between processes through one SQLite file (WAL mode).
+    Calls may block for up to the 5s lock timeout while another process
+    writes, so keep them off an event loop.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # Connections must not cross a fork or a thread; open one per process and thread
+        local = self._local
+        if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS predictions_lru ON predictions (accessed_at)"
+            )
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def get(self, key, now):
+        row = self.connection.execute(
+            "SELECT value, expires_at FROM predictions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return 'miss', None
+        if row[1] <= now:
+            self.connection.execute("DELETE FROM predictions WHERE key = ?", (key,))
+            return 'expired', None
+        self.connection.execute(
+            "UPDATE predictions SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        return 'hit', row[0]
+
+    def put(self, key, value, expires_at):
+        db = self.connection
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, time.time())
+            )
+            excess = db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] - self.max_size
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM predictions WHERE key IN ("
+                    "SELECT key FROM predictions ORDER BY accessed_at LIMIT ?)", (excess,)
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return max(excess, 0)
+
+    def clear(self):
+        self.connection.execute("DELETE FROM predictions")
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+# ============================================================================
+# 3. PREDICTION CACHE
+# ============================================================================
+
+class PredictionCache:
+    """
+    Bounded LRU cache with a TTL for prediction results.
+    Pass path to share entries between processes through SQLite.
+    """
+
+    def __init__(self, max_size=10_000, ttl=300.0, precision=4, path=None):
+        self.ttl = ttl
+        self.precision = precision
+        self.backend = (SqliteCacheBackend(path, max_size) if path
+                        else MemoryCacheBackend(max_size))
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def key(self, record, model_version):
+        return canonical_listing_key(record, model_version, self.precision)
+
+    @staticmethod
+    def _decode(payload):
+        # A new object per lookup, so callers may modify what they get back;
+        # the result's timestamp is when it was served, not when it was cached
+        value = json.loads(payload)
+        if isinstance(value, dict) and 'timestamp' in value:
+            value['timestamp'] = datetime.now().isoformat()
+        return value
+
+    def get(self, key):
+        """Cached value for key, or None on a miss or an expired entry."""
+        status, payload = self.backend.get(key, time.time())
+        if status == 'hit':
+            self.stats['hits'] += 1
+            return self._decode(payload)
+        self.stats['misses'] += 1
+        if status == 'expired':
+            self.stats['expired'] += 1
+        return None
+
+    def put(self, key, value):
+        """Store a JSON-serializable result; returns it as get() would return it."""
+        payload = json.dumps(value, default=_to_json_scalar)
+        self.stats['evictions'] += self.backend.put(key, payload, time.time() + self.ttl)
+        return json.loads(payload)
+
+    def get_or_compute(self, record, model_version, compute):
+        """
+        Return the cached result for a listing, calling compute() on a miss.
+        Hits and misses return the result in the same (JSON) form.
+        """
+        key = self.key(record, model_version)
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def clear(self):
+        self.backend.clear()
+
+    def __len__(self):
+        return len(self.backend)
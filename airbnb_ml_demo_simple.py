@@ -11,9 +11,13 @@ from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
 from sklearn.ensemble import GradientBoostingRegressor
 from datetime import datetime
+import pickle
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
+from airbnb_ml_intervals import conformal_quantile
+
 print("=" * 80)
 print("🏠 AIRBNB HOME VALUE PREDICTION - ML SYSTEM DEMO")
 print("=" * 80)
@@ -115,7 +119,9 @@ model = GradientBoostingRegressor(
     random_state=42
 )
 
+train_start = time.perf_counter()
 model.fit(X_train_scaled, y_train)
+training_seconds = time.perf_counter() - train_start
 
 train_score = model.score(X_train_scaled, y_train)
 test_score = model.score(X_test_scaled, y_test)
@@ -159,8 +165,11 @@ print(f"   Property: 3 bed, 2 bath, Downtown, Entire Home")
 print(f"   Amenities: WiFi ✓, Parking ✓, Pool ✗")
 print(f"   Host: 95% response rate, 4.8★ rating")
 print(f"   ")
+# Split-conformal 90% interval from the held-out residuals
+half_width = conformal_quantile(np.abs(y_test - model.predict(X_test_scaled)), 0.9)
 print(f"   💰 Predicted Price: ${prediction:.2f}/night")
-print(f"   📊 Model Confidence: 92%")
+print(f"   📊 90% Interval: ${max(prediction - half_width, 0):.2f} - "
+      f"${prediction + half_width:.2f}/night")
 
 # Recommendations
 print("\n📊 Step 7: Generating Recommendations...")
@@ -178,12 +187,23 @@ for i, (action, impact, priority) in enumerate(recommendations, 1):
 
 # System metrics
 print("\n📊 Step 8: System Performance Metrics...")
-print(f"   ⚡ Prediction Latency: <100ms (Real-time)")
+latencies = []
+for _ in range(200):
+    start = time.perf_counter()
+    model.predict(scaler.transform(sample))
+    latencies.append((time.perf_counter() - start) * 1000)
+batch = np.tile(X_test_scaled, (max(1, 10_000 // len(X_test_scaled)), 1))
+start = time.perf_counter()
+model.predict(batch)
+batch_rate = len(batch) / (time.perf_counter() - start)
+model_size_mb = len(pickle.dumps((scaler, model))) / 1e6
+
+print(f"   ⚡ Prediction Latency: p50 {np.percentile(latencies, 50):.2f}ms, "
+      f"p99 {np.percentile(latencies, 99):.2f}ms (single listing)")
 print(f"   📈 Model Accuracy (R²): {test_score:.4f}")
-print(f"   🎯 Scalability: 10M+ listings supported")
-print(f"   ✅ Uptime: 99.9% (Production SLA)")
-print(f"   🔄 Training Time: <5 minutes")
-print(f"   💾 Model Size: Lightweight (~10MB)")
+print(f"   🎯 Batch Throughput: {batch_rate:,.0f} listings/sec")
+print(f"   🔄 Training Time: {training_seconds:.1f}s ({len(X_train)} rows)")
+print(f"   💾 Model Size: {model_size_mb:.2f}MB (pickled scaler + model)")
 
 # Business impact
 print("\n📊 Step 9: Business Impact Analysis...")
@@ -198,7 +218,7 @@ print("=" * 80)
 
 print("\n📝 Next Steps:")
 print("   1. Deploy model as FastAPI service")
-print("   2. Set up Airflow for batch predictions")
+print("   2. Schedule batch predictions (python airbnb_ml_batch.py --bundle ... --input ... --output ...)")
 print("   3. Implement A/B testing framework")
 print("   4. Add monitoring and alerting")
 print("   5. Scale to production with Kubernetes")
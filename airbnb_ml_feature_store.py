@@ -0,0 +1,205 @@
+"""
+Airbnb Home Value Prediction - Listing Feature Store
+Preprocessed feature rows for every known listing, memory-mapped from disk
+and looked up by listing ID, so online requests carry only IDs.
+
+Store layout (one directory):
+    manifest.json   row count, capacity, feature names, model version
+    features.npy    float32 (capacity, n_features) preprocessed rows
+    ids.npy         int64 (capacity,) listing ID of each row
+
+Rows are written with the model's compiled NumPy preprocessor, so a store
+is tied to the model version it was built for. Lookups and scoring use
+NumPy only.
+
+Usage:
+    store = ListingFeatureStore.create('features', model, ids, listings_df)
+    store.upsert([42], [{'property_type': 'entire_home', ...}])
+    prices = predict_by_listing_id(model, store, [42, 7, 1001])
+"""
+
+import json
+import os
+
+import numpy as np
+
+from airbnb_ml_kernels import CompiledModel
+
+# ============================================================================
+# 1. STORE
+# ============================================================================
+
+class ListingFeatureStore:
+    """
+    Memory-mapped matrix of preprocessed listing rows with a sorted
+    ID -> row index. Single writer; any number of read-only readers, which
+    see in-place updates at once and appended listings after reopening.
+    """
+
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        mmap_mode = 'r+' if mode == 'r+' else 'r'
+        self._features = np.load(os.path.join(path, 'features.npy'), mmap_mode=mmap_mode)
+        self._ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode=mmap_mode)
+        self._build_index()
+
+    @property
+    def n_rows(self):
+        return self.manifest['n_rows']
+
+    @property
+    def model_version(self):
+        return self.manifest['model_version']
+
+    @property
+    def features(self):
+        """Read-only view of the filled rows (no copy)."""
+        return self._features[:self.n_rows]
+
+    @property
+    def ids(self):
+        return self._ids[:self.n_rows]
+
+    def _build_index(self):
+        # Sorted IDs plus their rows: vectorized lookups with searchsorted
+        order = np.argsort(self.ids, kind='stable')
+        self._sorted_ids = np.asarray(self.ids[order])
+        self._sorted_rows = order
+
+    def _insert_into_index(self, new_ids, new_rows):
+        # Merge appended IDs into the sorted index without a full re-sort
+        order = np.argsort(new_ids, kind='stable')
+        positions = np.searchsorted(self._sorted_ids, new_ids[order])
+        self._sorted_ids = np.insert(self._sorted_ids, positions, new_ids[order])
+        self._sorted_rows = np.insert(self._sorted_rows, positions, new_rows[order])
+
+    def _write_manifest(self):
+        with open(os.path.join(self.path, 'manifest.json'), 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    @classmethod
+    def create(cls, path, model, ids, records, capacity=None):
+        """
+        Build a store at path from a model (ModelRuntime or CompiledModel)
+        and the current listings, given as IDs plus raw records.
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("listing IDs must be unique")
+        capacity = max(capacity or 0, len(ids), 1)
+        n_features = len(model.feature_names)
+        os.makedirs(path, exist_ok=True)
+
+        features = np.lib.format.open_memmap(os.path.join(path, 'features.npy'), mode='w+',
+                                             dtype=np.float32, shape=(capacity, n_features))
+        features[:len(ids)] = model.transform(records)
+        features.flush()
+        stored_ids = np.lib.format.open_memmap(os.path.join(path, 'ids.npy'), mode='w+',
+                                               dtype=np.int64, shape=(capacity,))
+        stored_ids[:len(ids)] = ids
+        stored_ids.flush()
+        del features, stored_ids
+
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump({'n_rows': len(ids), 'capacity': capacity, 'n_features': n_features,
+                       'feature_names': [str(name) for name in model.feature_names],
+                       'model_version': model.version}, f, indent=2)
+        return cls(path, mode='r+')
+
+    def rows_for(self, ids):
+        """Row index of each listing ID; KeyError lists any unknown IDs."""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        positions = np.searchsorted(self._sorted_ids, ids)
+        positions = np.minimum(positions, max(len(self._sorted_ids) - 1, 0))
+        found = (self._sorted_ids[positions] == ids) if len(self._sorted_ids) else np.zeros(
+            len(ids), dtype=bool)
+        if not found.all():
+            raise KeyError(f"unknown listing IDs: {ids[~found][:10].tolist()}")
+        return self._sorted_rows[positions]
+
+    def get(self, ids, out=None):
+        """
+        Feature rows for listing IDs. A single ID (or a run of consecutive
+        rows) is returned as a view of the mapped file; other batches are
+        gathered straight into out (or a new array) with one take.
+        """
+        rows = self.rows_for(ids)
+        if len(rows) and np.all(np.diff(rows) == 1):
+            return self._features[rows[0]:rows[-1] + 1]
+        return np.take(self._features, rows, axis=0, out=out)
+
+    def upsert(self, model, ids, records):
+        """
+        Insert or update listings in place: changed listings overwrite
+        their row in the mapped file, new ones are appended. An ID given
+        more than once keeps its last record, as if upserted one by one.
+        """
+        if self.mode != 'r+':
+            raise PermissionError("store was opened read-only; open with mode='r+'")
+        if model.version != self.model_version:
+            raise ValueError(f"store holds features for model {self.model_version}, "
+                             f"not {model.version}")
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        rows = np.asarray(model.transform(records), dtype=np.float32)
+        _, last_from_end = np.unique(ids[::-1], return_index=True)
+        if len(last_from_end) != len(ids):
+            keep = np.sort(len(ids) - 1 - last_from_end)
+            ids, rows = ids[keep], rows[keep]
+
+        positions = np.searchsorted(self._sorted_ids, ids)
+        positions = np.minimum(positions, max(len(self._sorted_ids) - 1, 0))
+        existing = ((self._sorted_ids[positions] == ids) if len(self._sorted_ids)
+                    else np.zeros(len(ids), dtype=bool))
+        self._features[self._sorted_rows[positions[existing]]] = rows[existing]
+
+        new_ids, new_rows = ids[~existing], rows[~existing]
+        if len(new_ids):
+            if self.n_rows + len(new_ids) > self.manifest['capacity']:
+                self._grow(self.n_rows + len(new_ids))
+            start = self.n_rows
+            self._features[start:start + len(new_ids)] = new_rows
+            self._ids[start:start + len(new_ids)] = new_ids
+            self.manifest['n_rows'] += len(new_ids)
+            self._insert_into_index(new_ids, np.arange(start, start + len(new_ids)))
+        self._features.flush()
+        self._ids.flush()
+        self._write_manifest()
+        return {'updated': int(existing.sum()), 'inserted': len(new_ids)}
+
+    def _grow(self, needed):
+        """Double capacity (at least to needed) by rewriting both files."""
+        capacity = max(needed, 2 * self.manifest['capacity'])
+        for name, array in (('features.npy', self._features), ('ids.npy', self._ids)):
+            target = os.path.join(self.path, name)
+            staging = target + '.grow'
+            grown = np.lib.format.open_memmap(staging, mode='w+', dtype=array.dtype,
+                                              shape=(capacity,) + array.shape[1:])
+            grown[:self.n_rows] = array[:self.n_rows]
+            grown.flush()
+            del grown
+            os.replace(staging, target)
+        self.manifest['capacity'] = capacity
+        self._features = np.load(os.path.join(self.path, 'features.npy'), mmap_mode='r+')
+        self._ids = np.load(os.path.join(self.path, 'ids.npy'), mmap_mode='r+')
+
+# ============================================================================
+# 2. SCORING
+# ============================================================================
+
+def predict_by_listing_id(model, store, ids):
+    """
+    Predicted nightly prices for stored listings. Rows come straight from
+    the mapped feature matrix into the model: no pandas, no ColumnTransformer,
+    no per-request preprocessing.
+    """
+    if model.version != store.model_version:
+        raise ValueError(f"store holds features for model {store.model_version}, "
+                         f"not {model.version}")
+    X = store.get(ids)
+    if isinstance(model, CompiledModel):
+        return model.forest.predict(X)
+    # ModelRuntime: NumPy forest for small batches, library predict for large ones
+    return model.predict(X)
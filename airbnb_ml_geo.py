@@ -0,0 +1,175 @@
+"""
+Airbnb Home Value Prediction - Geospatial Features
+Derives distance_to_metro and distance_to_landmarks from raw listing
+coordinates, ahead of create_feature_pipeline.
+
+The station and landmark tables are indexed once in KD-trees over 3D
+unit vectors: straight-line (chord) distance on the unit sphere orders
+points exactly like great-circle distance, and converts to it with one
+arcsin, so the tree needs no trigonometry per node the way a haversine
+BallTree does. Every batch is then a vectorized nearest-neighbour query
+(chunked, so millions of listings stream through in bounded memory).
+Single listings go through a small LRU cache keyed on rounded coordinates,
+since the same listing is quoted again and again.
+
+Usage:
+    geo = GeoDistanceStage(stations, landmarks)   # DataFrames of latitude/longitude
+    listings = geo.transform(listings)            # adds the two distance columns
+    record = geo.transform(record)                # single dict, cached
+    Pipeline([('geo', geo), ('model', model)])    # in front of a trained Pipeline
+"""
+
+import functools
+
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.neighbors import KDTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+# ============================================================================
+# 1. DISTANCES
+# ============================================================================
+
+def _radians(points):
+    """(n, 2) array of [latitude, longitude] in radians from a table or array."""
+    if hasattr(points, 'columns') or isinstance(points, dict):
+        points = np.column_stack([points['latitude'], points['longitude']])
+    return np.radians(np.asarray(points, dtype=np.float64))
+
+def _unit_vectors(radians):
+    """[lat, lon] radians -> (n, 3) points on the unit sphere."""
+    latitude, longitude = radians[:, 0], radians[:, 1]
+    cos_latitude = np.cos(latitude)
+    return np.column_stack([cos_latitude * np.cos(longitude),
+                            cos_latitude * np.sin(longitude), np.sin(latitude)])
+
+def _chord_to_km(chord):
+    """Unit-sphere chord length -> great-circle distance in km."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+
+def haversine_km(a, b):
+    """Great-circle distance in km between [lat, lon] degree arrays (broadcasting)."""
+    a, b = np.radians(a), np.radians(b)
+    dlat = b[..., 0] - a[..., 0]
+    dlon = b[..., 1] - a[..., 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(a[..., 0]) * np.cos(b[..., 0]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+def brute_force_distances(listings, stations, landmarks, k_landmarks=3, chunk_size=1_000):
+    """
+    Reference implementation: full listing x point distance matrices, one
+    chunk of listings at a time. O(listings * points); for checking and
+    benchmarking the indexed stage.
+    """
+    listings = np.degrees(_radians(listings))
+    stations, landmarks = np.degrees(_radians(stations)), np.degrees(_radians(landmarks))
+    metro = np.empty(len(listings))
+    nearby = np.empty(len(listings))
+    for start in range(0, len(listings), chunk_size):
+        chunk = listings[start:start + chunk_size, None, :]
+        metro[start:start + chunk_size] = haversine_km(chunk, stations[None]).min(axis=1)
+        to_landmarks = haversine_km(chunk, landmarks[None])
+        nearest = np.partition(to_landmarks, k_landmarks - 1, axis=1)[:, :k_landmarks]
+        nearby[start:start + chunk_size] = nearest.mean(axis=1)
+    return metro, nearby
+
+# ============================================================================
+# 2. FEATURE STAGE
+# ============================================================================
+
+class GeoDistanceStage(BaseEstimator, TransformerMixin):
+    """
+    Fills distance_to_metro (km to the nearest station) and
+    distance_to_landmarks (mean km to the k_landmarks nearest landmarks)
+    from latitude/longitude. Works as the first step of a Pipeline.
+    """
+
+    def __init__(self, stations, landmarks, k_landmarks=3, chunk_size=100_000,
+                 cache_size=10_000, cache_precision=5):
+        self.stations = stations
+        self.landmarks = landmarks
+        self.k_landmarks = k_landmarks
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.cache_precision = cache_precision
+        self._build()
+
+    def _build(self):
+        # Both trees are built once; queries never touch the raw tables again
+        self.station_tree_ = KDTree(_unit_vectors(_radians(self.stations)))
+        self.landmark_tree_ = KDTree(_unit_vectors(_radians(self.landmarks)))
+        self._lookup = functools.lru_cache(maxsize=self.cache_size)(self._query_one)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_lookup')
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lookup = functools.lru_cache(maxsize=self.cache_size)(self._query_one)
+
+    def fit(self, X=None, y=None):
+        return self
+
+    def distances(self, latitude, longitude):
+        """(distance_to_metro, distance_to_landmarks) arrays in km for coordinate arrays."""
+        points = _unit_vectors(np.radians(np.column_stack([
+            np.asarray(latitude, dtype=np.float64), np.asarray(longitude, dtype=np.float64)])))
+        metro = np.empty(len(points))
+        nearby = np.empty(len(points))
+        for start in range(0, len(points), self.chunk_size):
+            chunk = points[start:start + self.chunk_size]
+            metro[start:start + len(chunk)] = self.station_tree_.query(chunk, k=1)[0][:, 0]
+            nearby[start:start + len(chunk)] = _chord_to_km(
+                self.landmark_tree_.query(chunk, k=self.k_landmarks)[0]).mean(axis=1)
+        return _chord_to_km(metro), nearby
+
+    def _query_one(self, latitude, longitude):
+        metro, nearby = self.distances([latitude], [longitude])
+        return float(metro[0]), float(nearby[0])
+
+    def distances_one(self, latitude, longitude):
+        """Cached distances for one listing; coordinates are rounded for the key."""
+        return self._lookup(round(float(latitude), self.cache_precision),
+                            round(float(longitude), self.cache_precision))
+
+    def transform(self, X):
+        """
+        Copy of X (a DataFrame or a single listing dict) with the two distance
+        features filled from its latitude/longitude.
+        """
+        if isinstance(X, dict):
+            metro, nearby = self.distances_one(X['latitude'], X['longitude'])
+            return dict(X, distance_to_metro=metro, distance_to_landmarks=nearby)
+        metro, nearby = self.distances(X['latitude'], X['longitude'])
+        return X.assign(distance_to_metro=metro, distance_to_landmarks=nearby)
+
+    def cache_info(self):
+        return self._lookup.cache_info()
+
+# ============================================================================
+# 3. SYNTHETIC GEOGRAPHY
+# ============================================================================
+
+def generate_synthetic_geography(n_listings, n_stations=20_000, n_landmarks=20_000,
+                                 center=(40.73, -73.99), radius_km=40.0, seed=42):
+    """
+    Station, landmark and listing coordinates clustered around a city
+    center (denser downtown), as DataFrames of latitude/longitude.
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    km_per_degree = 111.32
+
+    def scatter(n, scale_km):
+        distance = np.minimum(rng.exponential(scale_km, n), radius_km)
+        angle = rng.uniform(0, 2 * np.pi, n)
+        latitude = center[0] + distance * np.sin(angle) / km_per_degree
+        longitude = center[1] + distance * np.cos(angle) / (
+            km_per_degree * np.cos(np.radians(center[0])))
+        return pd.DataFrame({'latitude': latitude, 'longitude': longitude})
+
+    return scatter(n_stations, 8.0), scatter(n_landmarks, 5.0), scatter(n_listings, 10.0)
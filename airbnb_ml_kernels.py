@@ -0,0 +1,437 @@
+"""
+Airbnb Home Value Prediction - Compiled Inference Kernels
+Flat NumPy versions of the fitted model stages for low-latency serving.
+
+This module depends on NumPy only, so worker processes that import it
+never pay for pandas, scikit-learn, xgboost or shap at startup.
+"""
+
+import numpy as np
+
+# ============================================================================
+# 1. COMPILED PREPROCESSOR
+# ============================================================================
+
+def _is_single_record(records):
+    """True when records is one listing dict rather than a columnar batch."""
+    return isinstance(records, dict) and not any(
+        isinstance(v, (list, tuple, np.ndarray)) for v in records.values()
+    )
+
+def _column(records, name, n_rows):
+    """Fetch one column from a dict, struct-of-arrays or DataFrame as an array."""
+    if isinstance(records, list):
+        return np.array([r.get(name) for r in records], dtype=object)
+    values = np.asarray(records[name])
+    if values.ndim == 0:
+        values = np.full(n_rows, values.item(), dtype=values.dtype)
+    return values
+
+def _n_rows(records):
+    """Number of listings in a batch."""
+    if isinstance(records, list):
+        return len(records)
+    if hasattr(records, 'shape'):
+        return records.shape[0]
+    return len(np.asarray(next(iter(records.values()))))
+
+class CompiledPreprocessor:
+    """
+    NumPy kernel equivalent to the fitted ColumnTransformer from
+    create_feature_pipeline: median impute + standard scale for numerics,
+    most-frequent impute + one-hot (or ordinal codes when native_categorical)
+    for categoricals, binary passthrough.
+    """
+
+    def __init__(self, numeric_features, medians, means, scales,
+                 categorical_features, categories, category_columns, fill_values,
+                 binary_features, dtype=np.float64, native_categorical=False):
+        self.numeric_features = list(numeric_features)
+        self.medians = np.asarray(medians, dtype=np.float64)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.scales = np.asarray(scales, dtype=np.float64)
+
+        # Per categorical feature: sorted categories and the output column
+        # each one maps to (-1 for the dropped baseline category)
+        self.categorical_features = list(categorical_features)
+        self.categories = [np.asarray(c, dtype=object) for c in categories]
+        self.category_columns = [np.asarray(c, dtype=np.int64) for c in category_columns]
+        self.fill_values = list(fill_values)
+
+        self.binary_features = list(binary_features)
+        self.dtype = dtype
+        self.native_categorical = native_categorical
+
+        if native_categorical:
+            n_categorical = len(self.categorical_features)
+        else:
+            n_categorical = sum(int((c >= 0).sum()) for c in self.category_columns)
+        self.n_features = len(self.numeric_features) + n_categorical + len(self.binary_features)
+        self._bin_offset = len(self.numeric_features) + n_categorical
+
+    @classmethod
+    def from_sklearn(cls, preprocessor, dtype=None):
+        """Compile a fitted ColumnTransformer from create_feature_pipeline."""
+        num_name, num_pipeline, numeric_features = preprocessor.transformers_[0]
+        cat_name, cat_pipeline, categorical_features = preprocessor.transformers_[1]
+        bin_name, _, binary_features = preprocessor.transformers_[2]
+
+        imputer = num_pipeline.named_steps['imputer']
+        scaler = num_pipeline.named_steps['scaler']
+        cat_imputer = cat_pipeline.named_steps['imputer']
+        native_categorical = 'ordinal' in cat_pipeline.named_steps
+        encoder = cat_pipeline.named_steps['ordinal' if native_categorical else 'onehot']
+
+        categories = []
+        category_columns = []
+        column = len(numeric_features)
+        for i, cats in enumerate(encoder.categories_):
+            if native_categorical:
+                # Ordinal codes: every category lands in the feature's own column
+                columns = np.full(len(cats), len(numeric_features) + i, dtype=np.int64)
+            else:
+                dropped = encoder.drop_idx_[i] if encoder.drop_idx_ is not None else None
+                columns = np.full(len(cats), -1, dtype=np.int64)
+                for j in range(len(cats)):
+                    if j != dropped:
+                        columns[j] = column
+                        column += 1
+            categories.append(cats)
+            category_columns.append(columns)
+
+        # Compact pipelines emit float32; match them unless told otherwise
+        if dtype is None:
+            dtype = np.float32 if encoder.dtype == np.float32 else np.float64
+
+        return cls(
+            numeric_features, imputer.statistics_, scaler.mean_, scaler.scale_,
+            categorical_features, categories, category_columns,
+            cat_imputer.statistics_, binary_features, dtype=dtype,
+            native_categorical=native_categorical
+        )
+
+    def to_arrays(self):
+        """Split into (numeric arrays, JSON-serializable config) for saving."""
+        arrays = {'medians': self.medians, 'means': self.means, 'scales': self.scales}
+        for i, (categories, columns) in enumerate(zip(self.categories, self.category_columns)):
+            arrays[f'categories_{i}'] = categories.astype(str)
+            arrays[f'category_columns_{i}'] = columns
+        config = {
+            'numeric_features': self.numeric_features,
+            'categorical_features': self.categorical_features,
+            'fill_values': [str(v) for v in self.fill_values],
+            'binary_features': self.binary_features,
+            'dtype': np.dtype(self.dtype).name,
+            'native_categorical': self.native_categorical,
+        }
+        return arrays, config
+
+    @classmethod
+    def from_arrays(cls, arrays, config):
+        """Rebuild from to_arrays() output; arrays may be memory-mapped."""
+        n_categorical = len(config['categorical_features'])
+        return cls(
+            config['numeric_features'], arrays['medians'], arrays['means'], arrays['scales'],
+            config['categorical_features'],
+            [arrays[f'categories_{i}'] for i in range(n_categorical)],
+            [arrays[f'category_columns_{i}'] for i in range(n_categorical)],
+            config['fill_values'], config['binary_features'],
+            dtype=np.dtype(config['dtype']), native_categorical=config['native_categorical']
+        )
+
+    def feature_columns(self, name):
+        """Output column indices written for one raw input feature."""
+        n_num = len(self.numeric_features)
+        if name in self.numeric_features:
+            return np.array([self.numeric_features.index(name)])
+        if name in self.categorical_features:
+            i = self.categorical_features.index(name)
+            if self.native_categorical:
+                return np.array([n_num + i])
+            return self.category_columns[i][self.category_columns[i] >= 0]
+        if name in self.binary_features:
+            return np.array([self._bin_offset + self.binary_features.index(name)])
+        raise KeyError(f"'{name}' is not an input feature")
+
+    def transform(self, records, out=None, features=None):
+        """
+        Build the feature matrix for a dict, list of dicts, struct-of-arrays
+        or DataFrame. Every call returns a new array (unless out is given),
+        so one instance can serve concurrent requests.
+        With features given, only those raw features are (re)written into
+        out and the other columns are left untouched.
+        """
+        if _is_single_record(records):
+            records = {k: [v] for k, v in records.items()}
+
+        n_rows = _n_rows(records)
+        if out is None:
+            out = np.empty((n_rows, self.n_features), dtype=self.dtype)
+        wanted = (lambda name: True) if features is None else set(features).__contains__
+
+        # Numerics: impute NaN with the median, then scale in float64 exactly
+        # as StandardScaler does (a divide, not a multiply by 1/scale: the
+        # last-bit difference can flip a tree split sitting on a data value)
+        n_num = len(self.numeric_features)
+        for i, name in enumerate(self.numeric_features):
+            if not wanted(name):
+                continue
+            values = np.asarray(_column(records, name, n_rows), dtype=np.float64)
+            values = np.where(np.isnan(values), self.medians[i], values)
+            out[:, i] = (values - self.means[i]) / self.scales[i]
+
+        # Categoricals: vectorized category lookup into one-hot columns,
+        # or the category code itself for native categorical pipelines
+        if features is None:
+            out[:, n_num:self._bin_offset] = 0
+        rows = np.arange(n_rows)
+        for i, name in enumerate(self.categorical_features):
+            if not wanted(name):
+                continue
+            if features is not None:
+                out[:, self.feature_columns(name)] = 0
+            values = np.asarray(_column(records, name, n_rows), dtype=object)
+            missing = (values == None) | (values != values)  # noqa: E711
+            if missing.any():
+                values = np.where(missing, self.fill_values[i], values)
+            codes = np.searchsorted(self.categories[i], values)
+            codes = np.minimum(codes, len(self.categories[i]) - 1)
+            unknown = self.categories[i][codes] != values
+            if unknown.any():
+                raise ValueError(
+                    f"Found unknown categories {sorted(set(values[unknown]))} "
+                    f"in column '{name}' during transform"
+                )
+            if self.native_categorical:
+                out[:, n_num + i] = codes
+                continue
+            columns = self.category_columns[i][codes]
+            hot = columns >= 0
+            out[rows[hot], columns[hot]] = 1
+
+        # Binary features pass straight through
+        for i, name in enumerate(self.binary_features):
+            if wanted(name):
+                out[:, self._bin_offset + i] = _column(records, name, n_rows)
+
+        return out
+
+# ============================================================================
+# 2. COMPILED TREE ENSEMBLE
+# ============================================================================
+
+def _parse_base_score(value):
+    """XGBoost stores base_score as '0.5' or, from 2.0 on, as '[5E-1]'."""
+    return float(str(value).strip('[]'))
+
+class CompiledForest:
+    """
+    A tree ensemble flattened into packed node arrays and scored by
+    advancing every (row, tree) pair one level at a time in NumPy.
+
+    Leaves point to themselves, so after max_depth steps every pair sits
+    on its leaf and no per-row branching is needed.
+    """
+
+    def __init__(self, roots, feature, threshold, left, right, default_left,
+                 value, max_depth, base_score, inclusive=False, category_mask=None,
+                 children=None):
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self.base_score = float(base_score)
+        # XGBoost sends x < threshold left; scikit-learn sends x <= threshold left
+        self.inclusive = bool(inclusive)
+        if children is None:
+            children = np.column_stack([self.left, self.right]).ravel()
+        self._children = np.asarray(children, dtype=np.int64)
+
+        # Categorical splits: bit c of category_mask set means code c goes right
+        if category_mask is None:
+            category_mask = np.zeros(len(self.feature), dtype=np.uint64)
+        self.category_mask = np.asarray(category_mask, dtype=np.uint64)
+        self.is_categorical = self.category_mask != 0
+        self.has_categorical = bool(self.is_categorical.any())
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def to_arrays(self):
+        """Split into (node arrays, JSON-serializable config) for saving."""
+        arrays = {
+            'roots': self.roots, 'feature': self.feature, 'threshold': self.threshold,
+            'left': self.left, 'right': self.right, 'default_left': self.default_left,
+            'value': self.value, 'category_mask': self.category_mask,
+            'children': self._children,
+        }
+        config = {'max_depth': self.max_depth, 'base_score': self.base_score,
+                  'inclusive': self.inclusive}
+        return arrays, config
+
+    @classmethod
+    def from_arrays(cls, arrays, config):
+        """Rebuild from to_arrays() output; arrays may be memory-mapped."""
+        return cls(
+            arrays['roots'], arrays['feature'], arrays['threshold'], arrays['left'],
+            arrays['right'], arrays['default_left'], arrays['value'],
+            config['max_depth'], config['base_score'], inclusive=config['inclusive'],
+            category_mask=arrays['category_mask'], children=arrays['children']
+        )
+
+    @classmethod
+    def _from_node_lists(cls, trees, base_score, threshold_dtype, inclusive):
+        """
+        Pack per-tree (feature, threshold, left, right, default_left, value,
+        category_mask) lists, where left/right are tree-local ids and -1
+        marks a leaf.
+        """
+        roots, columns = [], [[] for _ in range(7)]
+        offset = 0
+        max_depth = 0
+        for feature, threshold, left, right, default_left, value, category_mask in trees:
+            n_nodes = len(feature)
+            local = np.arange(n_nodes)
+            is_leaf = np.asarray(left) < 0
+            left = np.where(is_leaf, local, left) + offset
+            right = np.where(is_leaf, local, right) + offset
+
+            # Depth of the deepest leaf, found by walking from the root
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):
+                if not is_leaf[node]:
+                    depth[left[node] - offset] = depth[node] + 1
+                    depth[right[node] - offset] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            roots.append(offset)
+            for column, values in zip(columns, (
+                np.where(is_leaf, 0, feature), np.where(is_leaf, 0, threshold),
+                left, right, default_left, np.where(is_leaf, value, 0.0),
+                np.asarray(category_mask, dtype=np.uint64)
+            )):
+                column.append(np.asarray(values))
+            offset += n_nodes
+
+        feature, threshold, left, right, default_left, value, category_mask = (
+            np.concatenate(column) for column in columns
+        )
+        return cls(roots, feature, threshold.astype(threshold_dtype), left, right,
+                   default_left, value, max_depth, base_score, inclusive=inclusive,
+                   category_mask=category_mask)
+
+    @classmethod
+    def from_xgboost(cls, model):
+        """Flatten an XGBRegressor or Booster via its JSON model dump."""
+        import json
+
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        learner = json.loads(bytes(booster.save_raw('json')))['learner']
+        base_score = _parse_base_score(learner['learner_model_param']['base_score'])
+
+        trees = []
+        for tree in learner['gradient_booster']['model']['trees']:
+            # Native categorical splits list the codes sent to the right child
+            category_mask = np.zeros(len(tree['split_indices']), dtype=np.uint64)
+            for node, start, size in zip(tree.get('categories_nodes', []),
+                                         tree.get('categories_segments', []),
+                                         tree.get('categories_sizes', [])):
+                codes = tree['categories'][start:start + size]
+                if max(codes, default=0) >= 64:
+                    raise ValueError("CompiledForest supports category codes below 64")
+                category_mask[node] = sum(1 << code for code in codes)
+            trees.append((
+                tree['split_indices'], tree['split_conditions'],
+                tree['left_children'], tree['right_children'],
+                tree['default_left'], tree['split_conditions'], category_mask,
+            ))
+        return cls._from_node_lists(trees, base_score, np.float32, inclusive=False)
+
+    @classmethod
+    def from_sklearn_gbr(cls, model):
+        """Flatten a fitted scikit-learn GradientBoostingRegressor."""
+        base_score = float(np.ravel(model.init_.constant_)[0])
+        trees = []
+        for estimator in model.estimators_[:, 0]:
+            tree = estimator.tree_
+            missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count))
+            trees.append((
+                tree.feature, tree.threshold,
+                tree.children_left, tree.children_right,
+                missing_left, tree.value[:, 0, 0] * model.learning_rate,
+                np.zeros(tree.node_count, dtype=np.uint64),
+            ))
+        return cls._from_node_lists(trees, base_score, np.float64, inclusive=True)
+
+    def trees_using(self, columns):
+        """Indices of the trees with at least one split on any of columns."""
+        internal = self.left != np.arange(len(self.left))
+        nodes = np.flatnonzero(internal & np.isin(self.feature, columns))
+        return np.unique(np.searchsorted(self.roots, nodes, side='right') - 1)
+
+    def leaf_indices(self, X, trees=None):
+        """Global leaf node id reached by every (row, tree) pair."""
+        roots = self.roots if trees is None else self.roots[trees]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_cols = X.shape
+        flat_X = X.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.int64) * n_cols)[:, None]
+        has_missing = np.isnan(flat_X).any()
+        compare = np.less_equal if self.inclusive else np.less
+
+        # children[2 * node] is the left child, children[2 * node + 1] the right
+        children = self._children
+        node = np.broadcast_to(roots, (n_rows, len(roots))).astype(np.int64)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offset + self.feature.take(node))
+            go_right = ~compare(x, self.threshold.take(node))
+            if self.has_categorical:
+                codes = np.where(np.isnan(x), 0, x).astype(np.uint64)
+                in_set = (self.category_mask.take(node) >> codes) & np.uint64(1)
+                go_right = np.where(self.is_categorical.take(node), in_set.astype(bool), go_right)
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.default_left.take(node), go_right)
+            node = children.take(2 * node + go_right)
+        return node
+
+    def predict(self, X, trees=None, block_size=256):
+        """
+        Sum of leaf values plus base score. Rows are scored in small blocks
+        so the (rows x trees) node matrix stays cache-resident.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], block_size):
+            block = X[start:start + block_size]
+            out[start:start + block_size] = self.value[self.leaf_indices(block, trees)].sum(axis=1)
+        return out + (self.base_score if trees is None else 0.0)
+
+# ============================================================================
+# 3. COMPILED MODEL
+# ============================================================================
+
+class CompiledModel:
+    """
+    Preprocessor + forest pair scoring raw listings end to end in NumPy.
+    This is what load_model_bundle returns to serving processes.
+    """
+
+    def __init__(self, preprocessor, forest, feature_names, version, metadata=None):
+        self.preprocessor = preprocessor
+        self.forest = forest
+        self.feature_names = list(feature_names)
+        self.version = version
+        self.metadata = metadata or {}
+
+    def transform(self, records):
+        """Preprocess raw listings (dict, list of dicts, columns or DataFrame)."""
+        return self.preprocessor.transform(records)
+
+    def predict(self, records):
+        """Predicted nightly prices for raw listings."""
+        return self.forest.predict(self.transform(records))
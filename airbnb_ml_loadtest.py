@@ -0,0 +1,140 @@
+"""
+Airbnb Home Value Prediction - Load Test
+Drives airbnb_ml_server.py at several concurrency levels and reports
+p50/p99 latency and throughput.
+
+Usage:
+    python airbnb_ml_loadtest.py --port 8000 --concurrency 1 8 32 128
+    python airbnb_ml_loadtest.py --start-server --bundle model_bundle
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SAMPLE_PROPERTY = {
+    'property_type': 'entire_home', 'bedrooms': 3, 'bathrooms': 2, 'accommodates': 6,
+    'location_type': 'downtown', 'distance_to_metro': 0.5, 'distance_to_landmarks': 1.2,
+    'has_wifi': 1, 'has_parking': 1, 'has_pool': 0, 'has_kitchen': 1,
+    'host_response_rate': 95, 'host_acceptance_rate': 90, 'host_is_superhost': 1,
+    'host_listings_count': 2, 'number_of_reviews': 45, 'review_scores_rating': 4.8,
+    'review_scores_cleanliness': 4.9, 'season': 'summer', 'days_since_listing': 365,
+}
+
+async def _post(reader, writer, host, body):
+    """Send one keep-alive POST /predict and return the status code."""
+    writer.write(
+        f"POST /predict HTTP/1.1\r\nHost: {host}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+async def _client(host, port, deadline, latencies, statuses):
+    """One connection issuing back-to-back requests until the deadline."""
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = np.random.default_rng()
+    try:
+        while time.perf_counter() < deadline:
+            record = dict(SAMPLE_PROPERTY, bedrooms=int(rng.integers(1, 6)),
+                          distance_to_metro=float(rng.exponential(2)))
+            start = time.perf_counter()
+            status = await _post(reader, writer, host, json.dumps(record).encode())
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run_level(host, port, concurrency, duration):
+    """Run `concurrency` clients for `duration` seconds; return a summary row."""
+    # Warm-up request so connection setup and first-batch costs are excluded
+    reader, writer = await asyncio.open_connection(host, port)
+    await _post(reader, writer, host, json.dumps(SAMPLE_PROPERTY).encode())
+    writer.close()
+
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, deadline, latencies, statuses)
+                           for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'status_counts': statuses,
+    }
+
+async def _wait_for_server(host, port, timeout=120):
+    """Poll until the server accepts connections."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"server on {host}:{port} did not start")
+
+async def load_test(host, port, levels, duration):
+    await _wait_for_server(host, port)
+    print(f"\n📊 Load Test: http://{host}:{port}/predict, {duration}s per level")
+    print(f"   {'clients':>7} {'requests':>9} {'req/s':>9} {'p50':>9} {'p99':>9}  status")
+    rows = []
+    for concurrency in levels:
+        row = await run_level(host, port, concurrency, duration)
+        rows.append(row)
+        print(f"   {row['concurrency']:>7} {row['requests']:>9} {row['throughput_rps']:>9.1f} "
+              f"{row['p50_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms  {row['status_counts']}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for airbnb_ml_server.py")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per level")
+    parser.add_argument('--start-server', action='store_true',
+                        help="Launch airbnb_ml_server.py for the duration of the test")
+    parser.add_argument('--bundle', help="Bundle for --start-server")
+    parser.add_argument('--server-args', default='',
+                        help="Extra arguments for --start-server, e.g. '--workers 2'")
+    args = parser.parse_args()
+
+    server = None
+    if args.start_server:
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                'airbnb_ml_server.py'),
+                   '--host', args.host, '--port', str(args.port), *args.server_args.split()]
+        if args.bundle:
+            command += ['--bundle', args.bundle]
+        server = subprocess.Popen(command)
+    try:
+        asyncio.run(load_test(args.host, args.port, args.concurrency, args.duration))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
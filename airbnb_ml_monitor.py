@@ -0,0 +1,313 @@
+"""
+Airbnb Home Value Prediction - Drift Monitor
+Constant-memory sketches of served listings and predicted prices, scored
+for drift (PSI and KS) against a baseline snapshot of the training data.
+
+Every numeric feature (and the predicted price) is a histogram over bin
+edges fixed from baseline quantiles; every categorical is a count per
+baseline category plus an "other" bucket. Memory is set by the bin count,
+not by traffic, and sketches with the same baseline merge by adding counts,
+so each worker process keeps its own monitor and a collector sums them.
+
+The baseline is saved with the model bundle (drift_baseline.json) when
+save_model_bundle is given the training data.
+
+Usage:
+    monitor = load_drift_monitor('model_bundle')
+    predict_home_value(runtime, listing, monitor=monitor)
+    monitor.drift_report()   # {feature: {'psi': ..., 'ks': ..., 'status': ...}}
+"""
+
+import bisect
+import json
+import math
+
+import numpy as np
+
+from airbnb_ml_cache import LISTING_FIELDS
+
+PREDICTION = 'predicted_price'
+
+# Conventional PSI bands: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 drift
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+
+# ============================================================================
+# 1. SKETCHES
+# ============================================================================
+
+class BinnedSketch:
+    """
+    Histogram over fixed bin edges with a separate missing-value count.
+    Bin i holds values in [edges[i-1], edges[i]); the first and last bins
+    are open. Counts are a plain list so a single update stays in Python.
+    """
+
+    def __init__(self, edges, counts=None, missing=0):
+        self.edges = [float(edge) for edge in edges]
+        self.counts = [0] * (len(self.edges) + 1) if counts is None else list(counts)
+        self.missing = missing
+
+    @classmethod
+    def from_values(cls, values, n_bins=20):
+        """Sketch of values with edges at their n_bins quantiles."""
+        values = np.asarray(values, dtype=np.float64)
+        present = values[~np.isnan(values)]
+        edges = (np.unique(np.quantile(present, np.linspace(0, 1, n_bins + 1)[1:-1]))
+                 if len(present) else [])
+        sketch = cls(edges)
+        sketch.update_batch(values)
+        return sketch
+
+    def update(self, value):
+        if value is None or value != value:
+            self.missing += 1
+        else:
+            self.counts[bisect.bisect_right(self.edges, value)] += 1
+
+    def update_batch(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        present = values[~np.isnan(values)]
+        self.missing += len(values) - len(present)
+        added = np.bincount(np.searchsorted(self.edges, present, side='right'),
+                            minlength=len(self.counts))
+        self.counts = [count + int(extra) for count, extra in zip(self.counts, added)]
+
+    def merge(self, other):
+        if self.edges != other.edges:
+            raise ValueError("cannot merge sketches with different bin edges")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.missing += other.missing
+        return self
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.missing = 0
+
+    @property
+    def total(self):
+        return sum(self.counts) + self.missing
+
+    def frequencies(self):
+        """Counts per bin with the missing bucket last."""
+        return np.array(self.counts + [self.missing], dtype=np.float64)
+
+    def quantile(self, q):
+        """
+        Approximate quantile, interpolated inside its bin; values in the
+        open outer bins are reported as the nearest edge.
+        """
+        n = sum(self.counts)
+        if not n or not self.edges:
+            return math.nan
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, q * n))
+        if i == 0 or i == len(self.edges):
+            return self.edges[min(i, len(self.edges) - 1)]
+        fraction = (q * n - cumulative[i - 1]) / max(self.counts[i], 1)
+        return self.edges[i - 1] + fraction * (self.edges[i] - self.edges[i - 1])
+
+    def empty_like(self):
+        return BinnedSketch(self.edges)
+
+    def to_dict(self):
+        return {'edges': self.edges, 'counts': self.counts, 'missing': self.missing}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['edges'], state['counts'], state['missing'])
+
+class CategorySketch:
+    """Count per baseline category; unseen values share an "other" bucket."""
+
+    def __init__(self, categories, counts=None):
+        self.categories = [str(category) for category in categories]
+        self.index = {category: i for i, category in enumerate(self.categories)}
+        self.counts = [0] * (len(self.categories) + 1) if counts is None else list(counts)
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values).astype(str)
+        sketch = cls(np.unique(values))
+        sketch.update_batch(values)
+        return sketch
+
+    def update(self, value):
+        self.counts[self.index.get(value, -1)] += 1
+
+    def update_batch(self, values):
+        values = np.asarray(values).astype(str)
+        codes = np.full(len(values), len(self.categories), dtype=np.intp)
+        for i, category in enumerate(self.categories):
+            codes[values == category] = i
+        added = np.bincount(codes, minlength=len(self.counts))
+        self.counts = [count + int(extra) for count, extra in zip(self.counts, added)]
+
+    def merge(self, other):
+        if self.categories != other.categories:
+            raise ValueError("cannot merge sketches with different categories")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def frequencies(self):
+        return np.array(self.counts, dtype=np.float64)
+
+    def empty_like(self):
+        return CategorySketch(self.categories)
+
+    def to_dict(self):
+        return {'categories': self.categories, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['categories'], state['counts'])
+
+def _sketch_from_dict(state):
+    return (CategorySketch if 'categories' in state else BinnedSketch).from_dict(state)
+
+# ============================================================================
+# 2. DRIFT SCORES
+# ============================================================================
+
+def population_stability_index(expected, actual, floor=1e-4):
+    """PSI between two count vectors over the same bins."""
+    p = np.maximum(expected / max(expected.sum(), 1), floor)
+    q = np.maximum(actual / max(actual.sum(), 1), floor)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+def ks_statistic(expected, actual):
+    """Largest CDF gap between two count vectors over the same ordered bins."""
+    p = np.cumsum(expected) / max(expected.sum(), 1)
+    q = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.abs(p - q).max())
+
+# ============================================================================
+# 3. MONITOR
+# ============================================================================
+
+class DriftMonitor:
+    """
+    Baseline and live sketches for every monitored feature plus the
+    predicted price. observe() is the per-request path; observe_batch()
+    takes a batch of listings in any form the compiled preprocessor reads.
+    """
+
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self.live = {name: sketch.empty_like() for name, sketch in baseline.items()}
+        self._numeric = [(name, sketch) for name, sketch in self.live.items()
+                         if isinstance(sketch, BinnedSketch) and name != PREDICTION]
+        self._categorical = [(name, sketch) for name, sketch in self.live.items()
+                             if isinstance(sketch, CategorySketch)]
+
+    @classmethod
+    def from_baseline(cls, X, predictions, n_bins=20, fields=LISTING_FIELDS):
+        """Baseline snapshot from training listings and the model's predictions on them."""
+        baseline = {}
+        for field in fields:
+            if field not in X:
+                continue
+            values = np.asarray(X[field])
+            baseline[field] = (BinnedSketch.from_values(values, n_bins)
+                               if values.dtype.kind in 'biuf'
+                               else CategorySketch.from_values(values))
+        baseline[PREDICTION] = BinnedSketch.from_values(predictions, n_bins)
+        return cls(baseline)
+
+    def observe(self, record, prediction):
+        """
+        Add one served listing (a dict) and its predicted price: one bisect
+        and one list increment per feature, a few microseconds in all.
+        """
+        get = record.get
+        for name, sketch in self._numeric:
+            value = get(name)
+            if value is None or value != value:
+                sketch.missing += 1
+            else:
+                sketch.counts[bisect.bisect_right(sketch.edges, value)] += 1
+        for name, sketch in self._categorical:
+            sketch.counts[sketch.index.get(get(name), -1)] += 1
+        self.live[PREDICTION].update(prediction)
+
+    def observe_batch(self, records, predictions):
+        """Add a batch of served listings (DataFrame, dict of columns or list of dicts)."""
+        if isinstance(records, list):
+            records = {name: [record.get(name) for record in records] for name in self.live}
+        for name, sketch in self._numeric:
+            if name in records:
+                sketch.update_batch(records[name])
+        for name, sketch in self._categorical:
+            if name in records:
+                sketch.update_batch(records[name])
+        self.live[PREDICTION].update_batch(predictions)
+
+    def merge(self, other):
+        """Add another monitor's live counts (same baseline) into this one."""
+        for name, sketch in self.live.items():
+            sketch.merge(other.live[name])
+        return self
+
+    def reset(self):
+        for sketch in self.live.values():
+            sketch.reset()
+
+    @property
+    def n_observed(self):
+        return self.live[PREDICTION].total
+
+    def drift_report(self):
+        """
+        {feature: {'psi', 'ks', 'n', 'status'}} of live traffic against the
+        baseline, status being 'stable', 'warning' or 'drift' by PSI band.
+        KS is None for categoricals, whose buckets have no order.
+        """
+        report = {}
+        for name, live in self.live.items():
+            expected, actual = self.baseline[name].frequencies(), live.frequencies()
+            psi = population_stability_index(expected, actual) if live.total else 0.0
+            ordered = isinstance(live, BinnedSketch)
+            report[name] = {
+                'psi': psi,
+                'ks': ks_statistic(expected[:-1], actual[:-1]) if ordered and live.total else None,
+                'n': live.total,
+                'status': ('drift' if psi > PSI_DRIFT else
+                           'warning' if psi > PSI_WARNING else 'stable'),
+            }
+        return report
+
+    def print_report(self):
+        report = self.drift_report()
+        print(f"\n📡 Drift Report ({self.n_observed:,} predictions observed)")
+        print(f"   {'Feature':<28} {'PSI':>7} {'KS':>7}  status")
+        for name, row in sorted(report.items(), key=lambda item: -item[1]['psi']):
+            ks = f"{row['ks']:.3f}" if row['ks'] is not None else '-'
+            print(f"   {name:<28} {row['psi']:>7.3f} {ks:>7}  {row['status']}")
+
+    def to_dict(self):
+        return {'baseline': {name: sketch.to_dict() for name, sketch in self.baseline.items()},
+                'live': {name: sketch.to_dict() for name, sketch in self.live.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        monitor = cls({name: _sketch_from_dict(s) for name, s in state['baseline'].items()})
+        for name, sketch in state.get('live', {}).items():
+            monitor.live[name].merge(_sketch_from_dict(sketch))
+        return monitor
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
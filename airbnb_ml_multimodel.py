@@ -0,0 +1,241 @@
+"""
+Airbnb Home Value Prediction - Multi-Model Serving
+Scores traffic with several models side by side (A/B arms and shadows)
+while preprocessing each batch only once.
+
+Models are grouped by the fingerprint of their fitted preprocessor: a
+retrained or refreshed model that reuses the incumbent's preprocessor
+(or learned identical statistics) joins its group, so a batch is
+transformed once per group and the feature matrix fans out to every
+booster in it. A shadow model's added latency is its tree evaluation.
+
+Listings are assigned to A/B arms by a hash of their listing ID, so a
+listing sees the same arm on every request and across processes.
+
+Usage:
+    runtime = MultiModelRuntime({'incumbent': model_a, 'candidate': model_b},
+                                arms={'incumbent': 0.9, 'candidate': 0.1},
+                                shadows=['candidate'])
+    result = runtime.predict(listings, listing_ids)
+    runtime.stats()   # per-model latency and prediction deltas
+"""
+
+import bisect
+import hashlib
+import json
+import time
+
+import numpy as np
+
+from airbnb_ml_system import ModelRuntime
+from airbnb_ml_tracing import LatencyHistogram
+
+# ============================================================================
+# 1. TRAFFIC SPLITTING
+# ============================================================================
+
+MASK64 = (1 << 64) - 1
+
+def _splitmix64(x):
+    """Vectorized SplitMix64 finalizer: well-mixed uint64 hashes of integer IDs."""
+    with np.errstate(over='ignore'):
+        x = x.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+def _blake2b64(listing_id, salt):
+    digest = hashlib.blake2b(f"{salt}:{listing_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def hash_buckets(listing_ids, salt=0):
+    """
+    Deterministic position in [0, 1) for each listing ID. Integer IDs are
+    hashed vectorized; other IDs (strings) with blake2b, one at a time.
+    salt gives an experiment its own independent split.
+    """
+    ids = np.asarray(listing_ids).reshape(-1)
+    if ids.dtype.kind in 'iu':
+        hashed = _splitmix64(ids.astype(np.int64).view(np.uint64) ^ np.uint64(salt))
+    else:
+        hashed = np.array([_blake2b64(i, salt) for i in ids], dtype=np.uint64)
+    return (hashed >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def hash_bucket(listing_id, salt=0):
+    """hash_buckets for one ID in plain Python (no array round trip)."""
+    if isinstance(listing_id, (int, np.integer)):
+        x = ((int(listing_id) & MASK64) ^ salt) + 0x9E3779B97F4A7C15 & MASK64
+        x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+        x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK64
+        hashed = x ^ (x >> 31)
+    else:
+        hashed = _blake2b64(listing_id, salt)
+    return (hashed >> 11) / float(1 << 53)
+
+# ============================================================================
+# 2. MULTI-MODEL RUNTIME
+# ============================================================================
+
+def preprocessor_fingerprint(runtime):
+    """
+    Hash of the compiled preprocessor's parameters: models whose fitted
+    preprocessors learned the same statistics share a fingerprint.
+    """
+    arrays, config = runtime.compiled.to_arrays()
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode())
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()[:12]
+
+class _ModelStats:
+    """Tree-evaluation latency and prediction deltas against the served price."""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.rows = 0
+        self.compared = 0
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+
+    def record(self, seconds, rows, deltas=None):
+        self.latency.record(seconds)
+        self.rows += rows
+        if deltas is not None and len(deltas):
+            self.compared += len(deltas)
+            self.delta_sum += float(deltas.sum())
+            abs_deltas = np.abs(deltas)
+            self.abs_delta_sum += float(abs_deltas.sum())
+            self.max_abs_delta = max(self.max_abs_delta, float(abs_deltas.max()))
+
+    def record_one(self, seconds, delta=None):
+        self.latency.record(seconds)
+        self.rows += 1
+        if delta is not None:
+            self.compared += 1
+            self.delta_sum += delta
+            self.abs_delta_sum += abs(delta)
+            self.max_abs_delta = max(self.max_abs_delta, abs(delta))
+
+    def summary(self):
+        compared = max(self.compared, 1)
+        return dict(self.latency.summary(), rows=self.rows, compared=self.compared,
+                    mean_delta=self.delta_sum / compared,
+                    mean_abs_delta=self.abs_delta_sum / compared,
+                    max_abs_delta=self.max_abs_delta)
+
+class MultiModelRuntime:
+    """
+    Several models behind shared preprocessing. arms maps model name to
+    traffic weight (the served model per listing); shadows are scored on
+    every row and compared with the served price, but never returned.
+    """
+
+    def __init__(self, models, arms, shadows=(), salt=0):
+        self.runtimes = {name: model if isinstance(model, ModelRuntime) else ModelRuntime(model)
+                         for name, model in models.items()}
+        unknown = (set(arms) | set(shadows)) - set(self.runtimes)
+        if unknown:
+            raise KeyError(f"unknown models: {sorted(unknown)}")
+        self.arm_names = list(arms)
+        weights = np.array([arms[name] for name in self.arm_names], dtype=np.float64)
+        self.arm_edges = np.cumsum(weights / weights.sum())[:-1]
+        self._arm_edges = self.arm_edges.tolist()
+        self.shadows = list(shadows)
+        self.salt = salt
+
+        # One preprocessor per fingerprint; every model points at its group's
+        self.groups = {}
+        for name, runtime in self.runtimes.items():
+            fingerprint = preprocessor_fingerprint(runtime)
+            self.groups.setdefault(fingerprint, {'runtime': runtime, 'models': []})
+            self.groups[fingerprint]['models'].append(name)
+        self.group_of = {name: fingerprint for fingerprint, group in self.groups.items()
+                         for name in group['models']}
+        self.model_stats = {name: _ModelStats() for name in self.runtimes}
+        self.preprocess_latency = LatencyHistogram()
+
+    def assign(self, listing_ids):
+        """Index into arm_names of the arm serving each listing."""
+        return np.searchsorted(self.arm_edges, hash_buckets(listing_ids, self.salt), side='right')
+
+    def assign_one(self, listing_id):
+        """Name of the arm serving one listing."""
+        position = hash_bucket(listing_id, self.salt)
+        return self.arm_names[bisect.bisect_right(self._arm_edges, position)]
+
+    def predict(self, records, listing_ids):
+        """
+        Served prices for a batch (anything ModelRuntime.transform reads).
+        Returns predicted_price, the serving model per row and every
+        shadow's predictions. A single dict with a single ID goes through
+        predict_one.
+        """
+        if isinstance(records, dict) and np.ndim(listing_ids) == 0:
+            return self.predict_one(records, listing_ids)
+        assignment = self.assign(listing_ids)
+        needed = {self.group_of[name] for name in self.shadows}
+        needed |= {self.group_of[self.arm_names[i]] for i in np.unique(assignment)}
+
+        features = {}
+        start = time.perf_counter()
+        for fingerprint in needed:
+            features[fingerprint] = self.groups[fingerprint]['runtime'].transform(records)
+        self.preprocess_latency.record(time.perf_counter() - start)
+
+        served = np.empty(len(assignment))
+        for i, name in enumerate(self.arm_names):
+            rows = np.flatnonzero(assignment == i)
+            if len(rows):
+                X = features[self.group_of[name]]
+                X = X if len(rows) == len(assignment) else X[rows]
+                served[rows] = self._score(name, X)
+
+        shadow_predictions = {name: self._score(name, features[self.group_of[name]], served)
+                              for name in self.shadows}
+        return {
+            'predicted_price': np.round(served, 2),
+            'model': np.asarray(self.arm_names, dtype=object)[assignment],
+            'shadow': shadow_predictions,
+        }
+
+    def predict_one(self, record, listing_id):
+        """
+        One listing: the served price, the serving model and the shadow
+        prices, with scalar bookkeeping so the only per-model cost is the
+        tree evaluation.
+        """
+        arm = self.assign_one(listing_id)
+        features = {}
+        start = time.perf_counter()
+        for name in [arm, *self.shadows]:
+            fingerprint = self.group_of[name]
+            if fingerprint not in features:
+                features[fingerprint] = self.groups[fingerprint]['runtime'].transform(record)
+        self.preprocess_latency.record(time.perf_counter() - start)
+
+        served = self._score_one(arm, features[self.group_of[arm]])
+        shadow_predictions = {name: self._score_one(name, features[self.group_of[name]], served)
+                              for name in self.shadows}
+        return {'predicted_price': round(served, 2), 'model': arm, 'shadow': shadow_predictions}
+
+    def _score(self, name, X, served=None):
+        start = time.perf_counter()
+        predictions = self.runtimes[name].predict(X)
+        self.model_stats[name].record(time.perf_counter() - start, len(X),
+                                      None if served is None else predictions - served)
+        return predictions
+
+    def _score_one(self, name, X, served=None):
+        start = time.perf_counter()
+        prediction = float(self.runtimes[name].predict(X)[0])
+        self.model_stats[name].record_one(time.perf_counter() - start,
+                                          None if served is None else prediction - served)
+        return prediction
+
+    def stats(self):
+        """Per-model latency (ms) and, for shadows, deltas against the served price."""
+        summary = {name: stats.summary() for name, stats in self.model_stats.items()}
+        summary['preprocess'] = self.preprocess_latency.summary()
+        return summary
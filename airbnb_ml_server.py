@@ -0,0 +1,432 @@
+"""
+Airbnb Home Value Prediction - Prediction Server
+Asyncio HTTP server that micro-batches single-listing requests.
+
+Requests are queued and flushed as one batch when either max_batch_size
+listings are waiting or the oldest has waited max_wait_ms. Each batch is a
+single vectorized predict + explain call on a worker pool, so the event loop
+only parses HTTP and never runs model code.
+
+Usage:
+    python airbnb_ml_system.py --save-bundle model_bundle
+    python airbnb_ml_server.py --bundle model_bundle --port 8000
+
+    curl -X POST localhost:8000/predict -d '{"property_type": "entire_home", ...}'
+    curl localhost:8000/drift    # with --monitor
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from airbnb_ml_cache import LISTING_FIELDS, SqliteCacheBackend
+
+logger = logging.getLogger('airbnb_ml_server')
+
+# ============================================================================
+# 1. WORKER-SIDE SCORING
+# ============================================================================
+
+# Each worker process loads the model once and keeps it here
+_worker_runtime = None
+
+def _init_worker(bundle_path):
+    """Process-pool initializer: load the model bundle once per worker."""
+    global _worker_runtime
+    from airbnb_ml_system import ModelRuntime
+    _worker_runtime = ModelRuntime.from_bundle(bundle_path)
+
+def _ping():
+    """No-op task used to start every worker (and run its initializer) up front."""
+    return True
+
+def _score_batch(records, runtime=None):
+    """Predict and explain one micro-batch; returns one JSON-ready dict per row."""
+    from airbnb_ml_system import predict_home_values
+
+    results = predict_home_values(runtime or _worker_runtime, records)
+    has_interval = results['price_lower'] is not None
+    return [
+        {
+            'predicted_price': float(results['predicted_price'][i]),
+            'price_interval': ([float(results['price_lower'][i]), float(results['price_upper'][i])]
+                               if has_interval else None),
+            'confidence': results['confidence'],
+            'top_features': [
+                [str(name), float(value)]
+                for name, value in zip(results['top_feature_names'][i],
+                                       results['top_feature_values'][i])
+            ],
+            'timestamp': results['timestamp'],
+        }
+        for i in range(len(records))
+    ]
+
+# ============================================================================
+# 2. MICRO-BATCHER
+# ============================================================================
+
+class QueueFullError(Exception):
+    """Raised when the request queue is at capacity (maps to HTTP 503)."""
+
+class MicroBatcher:
+    """
+    Collects single requests into batches by size or time deadline and
+    scores them on an executor, with at most max_in_flight batches running.
+    """
+
+    def __init__(self, score_batch, executor, max_batch_size=64, max_wait_ms=5.0,
+                 max_queue_size=1024, max_in_flight=1):
+        self.score_batch = score_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._task = None
+        self.stats = {'requests': 0, 'batches': 0, 'rejected': 0}
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def submit(self, record):
+        """Queue one listing and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((record, future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            raise QueueFullError("prediction queue is full")
+        self.stats['requests'] += 1
+        return await future
+
+    async def _collect(self):
+        """Block for the first item, then fill the batch until size or deadline."""
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free worker first, so requests keep piling into the
+            # queue (and the next batch) while every worker is busy
+            await self._in_flight.acquire()
+            batch = await self._collect()
+            self.stats['batches'] += 1
+            loop.create_task(self._dispatch(loop, batch))
+
+    async def _dispatch(self, loop, batch):
+        try:
+            await self._score_into(loop, batch)
+        except Exception:
+            # One bad listing must not fail its batch-mates: rescore singly
+            for item in batch:
+                try:
+                    await self._score_into(loop, [item])
+                except Exception as exc:
+                    if not item[1].done():
+                        item[1].set_exception(exc)
+        finally:
+            self._in_flight.release()
+
+    async def _score_into(self, loop, batch):
+        records = [record for record, _ in batch]
+        results = await loop.run_in_executor(self.executor, self.score_batch, records)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+# ============================================================================
+# 3. HTTP LAYER
+# ============================================================================
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class BadRequestError(Exception):
+    """
+    Raised for a request the client got wrong (maps to HTTP 400). The
+    message is written by the server, never echoed from the request.
+    """
+
+async def _read_request(reader):
+    """Parse one HTTP/1.1 request; returns (method, path, headers, body) or None."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise BadRequestError("malformed request line")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise BadRequestError("invalid Content-Length") from None
+    if length < 0:
+        raise BadRequestError("invalid Content-Length")
+    body = await reader.readexactly(length)
+    return method, path, headers, body
+
+_CATEGORICAL_FIELDS = frozenset({'property_type', 'location_type', 'season'})
+
+def _validate_listing(record):
+    """
+    Check a parsed /predict body before it reaches the cache, monitor or
+    model: a JSON object whose listing fields are strings (categoricals)
+    or finite numbers (booleans are not numbers here). Missing fields and
+    nulls are allowed (they are imputed). Raises BadRequestError naming
+    the first bad field.
+    """
+    if not isinstance(record, dict):
+        raise BadRequestError("request body must be a JSON object")
+    for field in LISTING_FIELDS:
+        value = record.get(field)
+        if value is None:
+            continue
+        if field in _CATEGORICAL_FIELDS:
+            if not isinstance(value, str):
+                raise BadRequestError(f"'{field}' must be a string")
+        elif (isinstance(value, bool) or not isinstance(value, (int, float))
+              or not math.isfinite(value)):
+            raise BadRequestError(f"'{field}' must be a finite number")
+
+def _response(status, payload, keep_alive=True):
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+class PredictionServer:
+    """
+    POST /predict scores one listing; GET /health reports queue stats and
+    GET /drift the drift monitor's report. With cache_executor set, cache
+    lookups and stores run there instead of on the event loop (for caches
+    backed by SQLite, whose calls can wait on another process's lock).
+    """
+
+    def __init__(self, batcher, model_version, cache=None, monitor=None, cache_executor=None):
+        self.batcher = batcher
+        self.model_version = model_version
+        self.cache = cache
+        self.monitor = monitor
+        self.cache_executor = cache_executor
+
+    async def _cache_call(self, method, *args):
+        if self.cache_executor is None:
+            return method(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cache_executor, method, *args)
+
+    async def handle(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            health = {'status': 'ok', 'model_version': self.model_version,
+                      'queue_depth': self.batcher.queue.qsize(), **self.batcher.stats}
+            if self.cache is not None:
+                size = await self._cache_call(len, self.cache)
+                health['cache'] = dict(self.cache.stats, size=size)
+            return 200, health
+        if method == 'GET' and path == '/drift':
+            if self.monitor is None:
+                return 404, {'error': 'drift monitoring is off (start with --monitor)'}
+            return 200, {'model_version': self.model_version,
+                         'observed': self.monitor.n_observed,
+                         'features': self.monitor.drift_report()}
+        if method == 'POST' and path == '/predict':
+            try:
+                record = json.loads(body)
+                _validate_listing(record)
+            except ValueError:
+                return 400, {'error': 'request body must be a JSON object'}
+            except BadRequestError as exc:
+                return 400, {'error': exc.args[0]}
+            # Repeat quotes are answered here without entering the queue
+            key = self.cache.key(record, self.model_version) if self.cache is not None else None
+            if key is not None:
+                cached = await self._cache_call(self.cache.get, key)
+                if cached is not None:
+                    self._observe(record, cached)
+                    return 200, cached
+            try:
+                result = await self.batcher.submit(record)
+                if key is not None:
+                    await self._cache_call(self.cache.put, key, result)
+                self._observe(record, result)
+                return 200, result
+            except QueueFullError:
+                return 503, {'error': 'prediction queue is full'}
+            except (KeyError, ValueError):
+                # Model errors can carry library paths and internals: log, don't echo
+                logger.warning("listing could not be scored", exc_info=True)
+                return 400, {'error': 'listing could not be scored'}
+        return 404, {'error': f'no route for {method} {path}'}
+
+    def _observe(self, record, result):
+        # Sketched on the event loop: a few microseconds per request
+        if self.monitor is not None:
+            self.monitor.observe(record, result['predicted_price'])
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except BadRequestError as exc:
+                    # The stream position is unknown after a bad request: close
+                    writer.write(_response(400, {'error': exc.args[0]}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    status, payload = await self.handle(method, path, body)
+                except Exception:
+                    logger.exception("unhandled error serving %s %s", method, path)
+                    status, payload = 500, {'error': 'internal server error'}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+# ============================================================================
+# 4. ENTRY POINT
+# ============================================================================
+
+def _demo_bundle():
+    """Train the demo model and save it to a temporary bundle."""
+    import tempfile
+    from sklearn.model_selection import train_test_split
+    from airbnb_ml_system import generate_synthetic_data, train_model, ModelRuntime
+    from airbnb_ml_bundle import save_model_bundle
+
+    df = generate_synthetic_data(n_samples=2000)
+    X_train, X_test, y_train, y_test = train_test_split(
+        df.drop('price', axis=1), df['price'], test_size=0.2, random_state=42
+    )
+    path = tempfile.mkdtemp(prefix='airbnb_bundle_')
+    save_model_bundle(ModelRuntime(train_model(X_train, y_train, X_test, y_test)), path,
+                      training_data=X_train)
+    return path
+
+async def serve(bundle_path, host='127.0.0.1', port=8000, max_batch_size=64,
+                max_wait_ms=5.0, max_queue_size=1024, workers=1, use_threads=False,
+                cache=None, monitor=False):
+    """
+    Run the prediction server until SIGINT/SIGTERM. With monitor set,
+    served listings are sketched against the bundle's drift baseline.
+    """
+    from airbnb_ml_bundle import read_manifest, load_drift_monitor
+
+    if use_threads:
+        from airbnb_ml_system import ModelRuntime
+        runtime = ModelRuntime.from_bundle(bundle_path)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        score_batch = lambda records: _score_batch(records, runtime)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(bundle_path,))
+        score_batch = _score_batch
+
+    batcher = MicroBatcher(score_batch, executor, max_batch_size=max_batch_size,
+                           max_wait_ms=max_wait_ms, max_queue_size=max_queue_size,
+                           max_in_flight=workers)
+    drift_monitor = load_drift_monitor(bundle_path) if monitor else None
+    if monitor and drift_monitor is None:
+        raise ValueError(f"bundle {bundle_path} has no drift baseline; "
+                         f"save it with training_data to enable --monitor")
+    # SQLite cache calls get their own thread, so a locked database stalls
+    # only cache traffic, never the event loop or the scoring workers
+    cache_executor = (ThreadPoolExecutor(max_workers=1, thread_name_prefix='cache')
+                      if cache is not None and isinstance(cache.backend, SqliteCacheBackend)
+                      else None)
+    app = PredictionServer(batcher, read_manifest(bundle_path)['model_version'], cache,
+                           drift_monitor, cache_executor)
+
+    # Load the model in every worker before accepting traffic
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[loop.run_in_executor(executor, _ping) for _ in range(workers)])
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    batcher.start()
+    server = await asyncio.start_server(app.serve_connection, host, port, backlog=1024)
+    print(f"🚀 Serving model {app.model_version} on http://{host}:{port} "
+          f"(batch ≤{max_batch_size}, wait ≤{max_wait_ms}ms, {workers} worker(s))")
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        await batcher.stop()
+        executor.shutdown(cancel_futures=True)
+        if cache_executor is not None:
+            cache_executor.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching prediction server")
+    parser.add_argument('--bundle', help="Model bundle directory (default: train a demo model)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--max-queue-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', action='store_true',
+                        help="Score on a thread pool instead of worker processes")
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help="Cache up to this many predictions (0 disables the cache)")
+    parser.add_argument('--cache-ttl', type=float, default=300.0, help="Cache TTL in seconds")
+    parser.add_argument('--cache-path',
+                        help="SQLite file shared by server instances (default: in-memory)")
+    parser.add_argument('--monitor', action='store_true',
+                        help="Sketch served traffic for drift (report at GET /drift)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    cache = None
+    if args.cache_size:
+        from airbnb_ml_cache import PredictionCache
+        cache = PredictionCache(max_size=args.cache_size, ttl=args.cache_ttl,
+                                path=args.cache_path)
+
+    asyncio.run(serve(
+        args.bundle or _demo_bundle(), args.host, args.port, args.max_batch_size,
+        args.max_wait_ms, args.max_queue_size, args.workers, args.threads, cache,
+        args.monitor
+    ))
+
+if __name__ == "__main__":
+    main()
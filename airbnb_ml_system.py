@@ -7,72 +7,225 @@ This script demonstrates the end-to-end ML pipeline for predicting Airbnb home v
 
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.model_selection import train_test_split, cross_validate, KFold, ParameterSampler
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder, FunctionTransformer
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
+import xgboost as xgb
 from xgboost import XGBRegressor
-import shap
+import os
+import time
 import json
+import hashlib
+import pickle
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 
+from airbnb_ml_kernels import CompiledPreprocessor, CompiledForest
+from airbnb_ml_bundle import save_model_bundle, load_model_pipeline, read_manifest
+from airbnb_ml_intervals import ConformalIntervals
+from airbnb_ml_tracing import span, traced, enable_tracing
+
 # ============================================================================
 # 1. DATA GENERATION (Simulating Airbnb Dataset)
 # ============================================================================
 
-def generate_synthetic_data(n_samples=1000):
+# Category levels and narrowest lossless dtypes for the compact data mode
+LISTING_CATEGORIES = {
+    'property_type': ['entire_home', 'private_room', 'shared_room'],
+    'location_type': ['beach', 'downtown', 'rural', 'suburban'],
+    'season': ['fall', 'spring', 'summer', 'winter'],
+}
+
+COMPACT_DTYPES = {
+    'bedrooms': 'int8', 'accommodates': 'int8', 'bathrooms': 'float32',
+    'distance_to_metro': 'float32', 'distance_to_landmarks': 'float32',
+    'has_wifi': 'int8', 'has_parking': 'int8', 'has_pool': 'int8',
+    'has_kitchen': 'int8', 'host_is_superhost': 'int8',
+    'host_response_rate': 'float32', 'host_acceptance_rate': 'float32',
+    'host_listings_count': 'int16', 'number_of_reviews': 'int16',
+    'review_scores_rating': 'float32', 'review_scores_cleanliness': 'float32',
+    'days_since_listing': 'int16', 'price': 'float32',
+}
+
+@traced('generate_synthetic_data', rows_arg='n_samples')
+def generate_synthetic_data(n_samples=1000, compact=False):
     """
     Generate synthetic Airbnb listing data for demonstration.
     In production, this would come from actual Airbnb database.
+    compact=True returns categoricals and downcast numeric columns.
     """
     np.random.seed(42)
+    df = _generate_listings(n_samples, np.random)
+    return compact_listing_frame(df) if compact else df
+
+def compact_listing_frame(df):
+    """
+    Shrink a listing DataFrame: pandas categoricals for the string columns,
+    int8/int16 for counts and flags, float32 for continuous values.
+    """
+    dtypes = {column: dtype for column, dtype in COMPACT_DTYPES.items() if column in df}
+    for column, levels in LISTING_CATEGORIES.items():
+        if column in df:
+            dtypes[column] = pd.CategoricalDtype(levels)
+    return df.astype(dtypes)
+
+def memory_footprint(obj):
+    """Bytes held by a DataFrame/Series (including strings) or an array."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(obj, pd.DataFrame) else int(usage)
+    return int(obj.nbytes)
+
+def _generate_listings(n_samples, rng):
+    """
+    Draw n_samples listings (features + price) from rng, which is either
+    the legacy np.random module or a np.random.Generator.
+    """
+    integers = rng.integers if hasattr(rng, 'integers') else rng.randint
     
     data = {
         # Property Features
-        'property_type': np.random.choice(['entire_home', 'private_room', 'shared_room'], n_samples, p=[0.6, 0.3, 0.1]),
-        'bedrooms': np.random.randint(1, 6, n_samples),
-        'bathrooms': np.random.choice([1, 1.5, 2, 2.5, 3], n_samples),
-        'accommodates': np.random.randint(1, 10, n_samples),
+        'property_type': rng.choice(['entire_home', 'private_room', 'shared_room'], n_samples, p=[0.6, 0.3, 0.1]),
+        'bedrooms': integers(1, 6, n_samples),
+        'bathrooms': rng.choice([1, 1.5, 2, 2.5, 3], n_samples),
+        'accommodates': integers(1, 10, n_samples),
         
         # Location Features
-        'location_type': np.random.choice(['downtown', 'beach', 'suburban', 'rural'], n_samples, p=[0.3, 0.2, 0.4, 0.1]),
-        'distance_to_metro': np.random.exponential(2, n_samples),  # km
-        'distance_to_landmarks': np.random.exponential(3, n_samples),  # km
+        'location_type': rng.choice(['downtown', 'beach', 'suburban', 'rural'], n_samples, p=[0.3, 0.2, 0.4, 0.1]),
+        'distance_to_metro': rng.exponential(2, n_samples),  # km
+        'distance_to_landmarks': rng.exponential(3, n_samples),  # km
         
         # Amenities (binary features)
-        'has_wifi': np.random.choice([0, 1], n_samples, p=[0.05, 0.95]),
-        'has_parking': np.random.choice([0, 1], n_samples, p=[0.4, 0.6]),
-        'has_pool': np.random.choice([0, 1], n_samples, p=[0.8, 0.2]),
-        'has_kitchen': np.random.choice([0, 1], n_samples, p=[0.2, 0.8]),
+        'has_wifi': rng.choice([0, 1], n_samples, p=[0.05, 0.95]),
+        'has_parking': rng.choice([0, 1], n_samples, p=[0.4, 0.6]),
+        'has_pool': rng.choice([0, 1], n_samples, p=[0.8, 0.2]),
+        'has_kitchen': rng.choice([0, 1], n_samples, p=[0.2, 0.8]),
         
         # Host Quality Features
-        'host_response_rate': np.random.beta(8, 2, n_samples) * 100,  # %
-        'host_acceptance_rate': np.random.beta(7, 3, n_samples) * 100,  # %
-        'host_is_superhost': np.random.choice([0, 1], n_samples, p=[0.7, 0.3]),
-        'host_listings_count': np.random.poisson(3, n_samples),
+        'host_response_rate': rng.beta(8, 2, n_samples) * 100,  # %
+        'host_acceptance_rate': rng.beta(7, 3, n_samples) * 100,  # %
+        'host_is_superhost': rng.choice([0, 1], n_samples, p=[0.7, 0.3]),
+        'host_listings_count': rng.poisson(3, n_samples),
         
         # Review Features
-        'number_of_reviews': np.random.poisson(25, n_samples),
-        'review_scores_rating': np.random.beta(9, 1, n_samples) * 5,  # 0-5 scale
-        'review_scores_cleanliness': np.random.beta(9, 1, n_samples) * 5,
+        'number_of_reviews': rng.poisson(25, n_samples),
+        'review_scores_rating': rng.beta(9, 1, n_samples) * 5,  # 0-5 scale
+        'review_scores_cleanliness': rng.beta(9, 1, n_samples) * 5,
         
         # Market Features
-        'season': np.random.choice(['winter', 'spring', 'summer', 'fall'], n_samples),
-        'days_since_listing': np.random.randint(1, 1000, n_samples),
+        'season': rng.choice(['winter', 'spring', 'summer', 'fall'], n_samples),
+        'days_since_listing': integers(1, 1000, n_samples),
     }
     
     df = pd.DataFrame(data)
     
     # Generate target variable (price) based on features
-    df['price'] = generate_price(df)
+    df['price'] = generate_price(df, rng)
     
     return df
 
-def generate_price(df):
+def generate_synthetic_shard(shard_id, shard_size, seed=42, compact=False):
+    """
+    Generate one shard of listings from its own Generator stream.
+    The stream depends only on (seed, shard_id), so shard k is identical
+    no matter which worker produces it or how many workers there are.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(shard_id,)))
+    df = _generate_listings(shard_size, rng)
+    return compact_listing_frame(df) if compact else df
+
+def _shard_sizes(n_samples, chunk_size):
+    """Sizes of the fixed-size shards covering n_samples (last may be short)."""
+    n_shards = -(-n_samples // chunk_size)
+    return [min(chunk_size, n_samples - k * chunk_size) for k in range(n_shards)]
+
+def iter_synthetic_chunks(n_samples, chunk_size=100_000, seed=42, compact=False):
+    """
+    Yield the dataset as fixed-size DataFrame chunks.
+    Peak memory is one chunk, regardless of n_samples.
+    """
+    for shard_id, size in enumerate(_shard_sizes(n_samples, chunk_size)):
+        yield generate_synthetic_shard(shard_id, size, seed, compact)
+
+def _write_shard(task):
+    """Process-pool worker: generate one shard and write it to disk."""
+    path, shard_id, size, seed, fmt = task
+    df = generate_synthetic_shard(shard_id, size, seed)
+    
+    if fmt == 'parquet':
+        target = os.path.join(path, f"part-{shard_id:05d}.parquet")
+        df.to_parquet(target, index=False)
+    else:
+        # One .npy per column so readers can memory-map single features
+        target = os.path.join(path, f"part-{shard_id:05d}")
+        os.makedirs(target, exist_ok=True)
+        with open(os.path.join(target, 'columns.json'), 'w') as f:
+            json.dump(list(df.columns), f)
+        for column in df.columns:
+            values = df[column].to_numpy()
+            if values.dtype == object:
+                values = values.astype(str)
+            np.save(os.path.join(target, f"{column}.npy"), values)
+    
+    return target
+
+def write_synthetic_dataset(path, n_samples, chunk_size=100_000, seed=42,
+                            fmt='parquet', n_workers=None):
+    """
+    Generate a partitioned synthetic dataset with a process pool.
+    Each worker holds one chunk at a time, so peak memory is about
+    n_workers * chunk_size rows. fmt is 'parquet' or 'npy'.
+    """
+    if fmt not in ('parquet', 'npy'):
+        raise ValueError(f"Unknown dataset format: {fmt}")
+    os.makedirs(path, exist_ok=True)
+    
+    tasks = [(path, shard_id, size, seed, fmt)
+             for shard_id, size in enumerate(_shard_sizes(n_samples, chunk_size))]
+    
+    if n_workers == 1:
+        return [_write_shard(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return list(pool.map(_write_shard, tasks))
+
+def list_dataset_partitions(path):
+    """Partition paths of a dataset written by write_synthetic_dataset, in order."""
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.startswith('part-')
+    )
+
+def read_dataset_partition(partition, columns=None, mmap=True):
+    """Load one partition (.parquet file or directory of .npy columns)."""
+    if partition.endswith('.parquet'):
+        return pd.read_parquet(partition, columns=columns)
+    
+    if columns is None:
+        with open(os.path.join(partition, 'columns.json')) as f:
+            columns = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    return pd.DataFrame({
+        column: np.load(os.path.join(partition, f"{column}.npy"), mmap_mode=mmap_mode)
+        for column in columns
+    })
+
+def iter_dataset_chunks(path, columns=None):
+    """Stream a partitioned dataset back one partition at a time."""
+    for partition in list_dataset_partitions(path):
+        yield read_dataset_partition(partition, columns)
+
+def generate_price(df, rng=None):
     """
     Generate realistic prices based on features.
     This simulates the true underlying relationship we want to learn.
+    Noise is drawn from rng, defaulting to the global np.random state.
     """
     base_price = 50
     
@@ -122,7 +275,7 @@ def generate_price(df):
              distance_penalty * season_multiplier)
     
     # Add some noise
-    noise = np.random.normal(0, 10, len(df))
+    noise = (np.random if rng is None else rng).normal(0, 10, len(df))
     price = price + noise
     
     # Ensure positive prices
@@ -134,10 +287,21 @@ def generate_price(df):
 # 2. FEATURE ENGINEERING
 # ============================================================================
 
-def create_feature_pipeline():
+def _to_float32(X):
+    """Cast a transformer output to float32 (module-level so it pickles)."""
+    return np.asarray(X, dtype=np.float32)
+
+def _to_float64(X):
+    """Cast a transformer input to float64 (module-level so it pickles)."""
+    return np.asarray(X, dtype=np.float64)
+
+def create_feature_pipeline(compact=False, native_categorical=False):
     """
     Create preprocessing pipeline for features.
     Handles missing values, encoding, and scaling.
+    compact=True makes every block emit float32, halving the feature matrix.
+    native_categorical=True emits one integer code column per categorical
+    instead of one-hot columns, for XGBoost's native categorical splits.
     """
     # Numerical features
     numeric_features = [
@@ -158,24 +322,45 @@ def create_feature_pipeline():
         'host_is_superhost'
     ]
     
+    output_dtype = np.float32 if compact else np.float64
+    
     # Numerical pipeline: impute missing values with median, then scale
-    numeric_transformer = Pipeline(steps=[
+    numeric_steps = [
         ('imputer', SimpleImputer(strategy='median')),
         ('scaler', StandardScaler())
-    ])
+    ]
+    if compact:
+        # Scale in float64 whatever the input dtype and round once at the end,
+        # so the result does not depend on how the listings were stored (and
+        # the compiled kernel reproduces it bit for bit)
+        numeric_steps.insert(0, ('float64', FunctionTransformer(_to_float64,
+                                                                feature_names_out='one-to-one')))
+        numeric_steps.append(('float32', FunctionTransformer(_to_float32,
+                                                             feature_names_out='one-to-one')))
+    numeric_transformer = Pipeline(steps=numeric_steps)
     
     # Categorical pipeline: impute with most frequent, then one-hot encode
+    # (or ordinal-encode when the booster handles categories natively)
+    if native_categorical:
+        encoder = ('ordinal', OrdinalEncoder(dtype=output_dtype))
+    else:
+        encoder = ('onehot', OneHotEncoder(drop='first', sparse_output=False, dtype=output_dtype))
     categorical_transformer = Pipeline(steps=[
         ('imputer', SimpleImputer(strategy='most_frequent')),
-        ('onehot', OneHotEncoder(drop='first', sparse_output=False))
+        encoder
     ])
     
+    # Binary features pass through (as float32 in compact mode)
+    binary_transformer = 'passthrough'
+    if compact:
+        binary_transformer = FunctionTransformer(_to_float32, feature_names_out='one-to-one')
+    
     # Combine transformers
     preprocessor = ColumnTransformer(
         transformers=[
             ('num', numeric_transformer, numeric_features),
             ('cat', categorical_transformer, categorical_features),
-            ('bin', 'passthrough', binary_features)
+            ('bin', binary_transformer, binary_features)
         ])
     
     return preprocessor
@@ -184,65 +369,500 @@ def create_feature_pipeline():
 # 3. MODEL TRAINING
 # ============================================================================
 
-def train_model(X_train, y_train, X_test, y_test):
+@traced('train_model', rows_arg='X_train')
+def train_model(X_train, y_train, X_test, y_test, params=None, compact=False,
+                native_categorical=False, interval_coverage=0.9):
     """
     Train XGBoost model with hyperparameter tuning.
+    params overrides XGB_PARAMS, e.g. the best_params from tune_hyperparameters.
+    compact=True carries a float32 feature matrix through fit and predict.
+    native_categorical=True uses the hist tree method with categorical splits
+    on integer codes instead of one-hot columns.
+    The cross-validation folds' out-of-fold residuals calibrate conformal
+    price intervals at interval_coverage, stored as model.price_intervals_.
     """
     print("🤖 Training XGBoost Model...")
     
+    model = build_model(params=params, compact=compact,
+                        native_categorical=native_categorical)
+    
+    # Train model, one step at a time so each stage gets its own span
+    with span('preprocess.fit_transform', rows=len(X_train)):
+        X_fit = model.named_steps['preprocessor'].fit_transform(X_train)
+    with span('xgboost.fit', rows=len(X_train)):
+        model.named_steps['regressor'].fit(X_fit, y_train)
+    
+    # Evaluate
+    with span('train_model.score', rows=len(X_train) + len(X_test)):
+        train_score = model.score(X_train, y_train)
+        test_score = model.score(X_test, y_test)
+    
+    print(f"✅ Training R² Score: {train_score:.4f}")
+    print(f"✅ Testing R² Score: {test_score:.4f}")
+    
+    # Cross-validation, splitting cores between fold workers and booster threads
+    outer_jobs, inner_threads = thread_budget(5)
+    cv_model = clone(model).set_params(regressor__n_jobs=inner_threads)
+    with span('cross_val_score', rows=len(X_train)):
+        cv_results = cross_validate(cv_model, X_train, y_train, cv=5, scoring='r2',
+                                    n_jobs=outer_jobs, return_estimator=True,
+                                    return_indices=True)
+    cv_scores = cv_results['test_score']
+    print(f"✅ Cross-Validation R² Score: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
+    
+    # Conformal intervals from the same folds: each listing's residual comes
+    # from the fold model that did not train on it
+    with span('calibrate_intervals', rows=len(X_train)):
+        out_of_fold = np.empty(len(X_train))
+        for estimator, valid_idx in zip(cv_results['estimator'],
+                                        cv_results['indices']['test']):
+            out_of_fold[valid_idx] = estimator.predict(X_train.iloc[valid_idx])
+        model.price_intervals_ = ConformalIntervals.fit(
+            X_train, np.asarray(y_train) - out_of_fold, coverage=interval_coverage)
+    
+    return model
+
+def build_model(params=None, compact=False, native_categorical=False):
+    """Unfitted preprocessing + XGBoost Pipeline, as train_model fits it."""
     # Create preprocessing pipeline
-    preprocessor = create_feature_pipeline()
+    preprocessor = create_feature_pipeline(compact=compact,
+                                           native_categorical=native_categorical)
+    
+    regressor_params = {'n_estimators': 100, **XGB_PARAMS, **(params or {})}
+    if native_categorical:
+        regressor_params.update(tree_method='hist', enable_categorical=True,
+                                feature_types=native_feature_types(preprocessor))
     
     # Create full pipeline with XGBoost
-    model = Pipeline(steps=[
+    return Pipeline(steps=[
         ('preprocessor', preprocessor),
-        ('regressor', XGBRegressor(
-            n_estimators=100,
-            max_depth=6,
-            learning_rate=0.1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            random_state=42,
-            n_jobs=-1
-        ))
+        ('regressor', XGBRegressor(n_jobs=-1, **regressor_params))
     ])
+
+def native_feature_types(preprocessor):
+    """
+    XGBoost feature_types for a native categorical preprocessor:
+    'c' for each category-code column, 'q' for everything else.
+    """
+    _, _, numeric_features = preprocessor.transformers[0]
+    _, _, categorical_features = preprocessor.transformers[1]
+    _, _, binary_features = preprocessor.transformers[2]
+    return (['q'] * len(numeric_features) + ['c'] * len(categorical_features) +
+            ['q'] * len(binary_features))
+
+# Hyperparameters shared by train_model and the out-of-core trainer
+XGB_PARAMS = {
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'random_state': 42,
+}
+
+def _chunk_source(chunks):
+    """
+    Turn a dataset path or a zero-argument callable into a callable that
+    returns a fresh chunk iterator (training needs several passes).
+    """
+    if isinstance(chunks, str):
+        path = chunks
+        return lambda: iter_dataset_chunks(path)
+    return chunks
+
+def fit_preprocessor_streaming(chunks, target='price', sample_size=100_000, seed=0):
+    """
+    Fit the create_feature_pipeline preprocessor in one streaming pass.
+    Scaler means/variances and categorical levels are exact; the numeric
+    median used for imputation is estimated from a bounded uniform sample.
+    """
+    preprocessor = create_feature_pipeline()
+    numeric_features = preprocessor.transformers[0][2]
+    categorical_features = preprocessor.transformers[1][2]
     
-    # Train model
-    model.fit(X_train, y_train)
+    rng = np.random.default_rng(seed)
+    count = np.zeros(len(numeric_features))
+    mean = np.zeros(len(numeric_features))
+    m2 = np.zeros(len(numeric_features))
+    category_counts = [{} for _ in categorical_features]
+    sample, sample_keys = None, np.empty(0)
     
-    # Evaluate
-    train_score = model.score(X_train, y_train)
-    test_score = model.score(X_test, y_test)
+    for chunk in _chunk_source(chunks)():
+        X = chunk.drop(columns=[target], errors='ignore')
+        
+        # Exact running mean/variance, merged per chunk (Chan et al.)
+        values = X[numeric_features].to_numpy(dtype=np.float64)
+        n = (~np.isnan(values)).sum(axis=0)
+        chunk_mean = np.nanmean(values, axis=0)
+        chunk_m2 = np.nansum((values - chunk_mean) ** 2, axis=0)
+        total = count + n
+        delta = chunk_mean - mean
+        mean = mean + delta * n / np.maximum(total, 1)
+        m2 = m2 + chunk_m2 + delta ** 2 * count * n / np.maximum(total, 1)
+        count = total
+        
+        for counts, feature in zip(category_counts, categorical_features):
+            for category, c in X[feature].value_counts().items():
+                counts[category] = counts.get(category, 0) + c
+        
+        # Bottom-k random keys give a uniform sample of bounded size
+        keys = rng.random(len(X))
+        merged = X if sample is None else pd.concat([sample, X], ignore_index=True)
+        merged_keys = np.concatenate([sample_keys, keys])
+        keep = np.argsort(merged_keys)[:sample_size]
+        sample = merged.iloc[keep].reset_index(drop=True)
+        sample_keys = merged_keys[keep]
     
-    print(f"✅ Training R² Score: {train_score:.4f}")
-    print(f"✅ Testing R² Score: {test_score:.4f}")
+    if sample is None:
+        raise ValueError("No data chunks to fit on")
     
-    # Cross-validation
-    cv_scores = cross_val_score(model, X_train, y_train, cv=5, 
-                                scoring='r2', n_jobs=-1)
-    print(f"✅ Cross-Validation R² Score: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
+    # Fit on the sample with every level seen in the stream, then replace
+    # the sample statistics with the exact streaming ones
+    categories = [sorted(counts) for counts in category_counts]
+    preprocessor.set_params(cat__onehot__categories=categories)
+    preprocessor.fit(sample)
+    
+    scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+    scaler.mean_ = mean
+    scaler.var_ = m2 / count
+    scaler.scale_ = np.where(scaler.var_ > 0, np.sqrt(scaler.var_), 1.0)
+    scaler.n_samples_seen_ = count.astype(np.int64)
+    
+    cat_imputer = preprocessor.named_transformers_['cat'].named_steps['imputer']
+    cat_imputer.statistics_ = np.array(
+        [max(counts, key=counts.get) for counts in category_counts], dtype=object
+    )
+    
+    return preprocessor
+
+class _PreprocessedChunkIter(xgb.DataIter):
+    """Feeds preprocessed chunks to XGBoost's external-memory DMatrix."""
+    
+    def __init__(self, chunks, preprocessor, target, cache_prefix):
+        self._chunks = chunks
+        self._preprocessor = preprocessor
+        self._target = target
+        self._it = None
+        super().__init__(cache_prefix=cache_prefix)
+    
+    def next(self, input_data):
+        if self._it is None:
+            self._it = self._chunks()
+        chunk = next(self._it, None)
+        if chunk is None:
+            return False
+        X = self._preprocessor.transform(chunk.drop(columns=[self._target]))
+        input_data(data=X, label=chunk[self._target].to_numpy())
+        return True
+    
+    def reset(self):
+        self._it = None
+
+def train_model_out_of_core(chunks, eval_chunks=None, target='price',
+                            n_estimators=100, cache_dir=None):
+    """
+    Train the XGBoost pipeline from chunked data that does not fit in RAM.
+    chunks is a dataset path (see write_synthetic_dataset) or a callable
+    returning a fresh iterator of DataFrames. Memory is bounded by the
+    chunk size: pass 1 fits the preprocessor statistics, then transformed
+    chunks are paged through XGBoost's external-memory DMatrix.
+    Returns a regular Pipeline usable by predict_home_value.
+    """
+    print("🤖 Training XGBoost Model (out-of-core)...")
+    chunks = _chunk_source(chunks)
+    
+    # Pass 1: preprocessor statistics
+    preprocessor = fit_preprocessor_streaming(chunks, target=target)
+    
+    # Pass 2+: boosting over the paged, preprocessed chunks
+    owns_cache = cache_dir is None
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix='airbnb_xgb_cache_')
+    params = {
+        'objective': 'reg:squarederror',
+        'tree_method': 'hist',
+        'max_depth': XGB_PARAMS['max_depth'],
+        'eta': XGB_PARAMS['learning_rate'],
+        'subsample': XGB_PARAMS['subsample'],
+        'colsample_bytree': XGB_PARAMS['colsample_bytree'],
+        'seed': XGB_PARAMS['random_state'],
+    }
+    try:
+        data_iter = _PreprocessedChunkIter(chunks, preprocessor, target,
+                                           os.path.join(cache_dir, 'train'))
+        dtrain = xgb.ExtMemQuantileDMatrix(data_iter)
+        booster = xgb.train(params, dtrain, num_boost_round=n_estimators)
+        del dtrain, data_iter
+    finally:
+        # The page cache is only needed while training; keep a caller's directory
+        if owns_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    
+    # Wrap the booster so the result is an ordinary sklearn Pipeline
+    regressor = XGBRegressor(n_estimators=n_estimators, tree_method='hist', **XGB_PARAMS)
+    regressor.load_model(bytearray(booster.save_raw()))
+    model = Pipeline(steps=[('preprocessor', preprocessor), ('regressor', regressor)])
+    
+    if eval_chunks is not None:
+        print(f"✅ Testing R² Score: {score_streaming(model, eval_chunks, target):.4f}")
     
     return model
 
+def score_streaming(model, chunks, target='price'):
+    """R² of model over a chunked dataset, accumulated chunk by chunk."""
+    n, sum_y, sum_y2, sse = 0, 0.0, 0.0, 0.0
+    for chunk in _chunk_source(chunks)():
+        y = chunk[target].to_numpy(dtype=np.float64)
+        residual = y - model.predict(chunk.drop(columns=[target]))
+        n += len(y)
+        sum_y += y.sum()
+        sum_y2 += (y ** 2).sum()
+        sse += (residual ** 2).sum()
+    return 1 - sse / (sum_y2 - sum_y ** 2 / n)
+
+# Search space for tune_hyperparameters
+XGB_PARAM_SPACE = {
+    'max_depth': [3, 4, 5, 6, 8],
+    'learning_rate': [0.03, 0.05, 0.1, 0.2],
+    'subsample': [0.6, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'min_child_weight': [1, 3, 5],
+    'reg_lambda': [0.5, 1.0, 5.0],
+}
+
+def thread_budget(n_tasks, n_jobs=None):
+    """
+    Split n_jobs cores (default: all) into outer task workers and inner
+    booster threads so outer * inner never exceeds the core count.
+    """
+    total = n_jobs or os.cpu_count() or 1
+    outer = max(1, min(n_tasks, total))
+    return outer, max(1, total // outer)
+
+def map_bounded(pool, fn, tasks, max_in_flight):
+    """
+    pool.map that keeps at most max_in_flight tasks submitted ahead of the
+    caller, so tasks (any iterable, ideally a generator) are only built and
+    pickled as results are consumed. Results come back in task order.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(pool.submit(fn, task))
+    while pending:
+        yield pending.popleft().result()
+
+def preprocess_folds(X, y, cv=5, random_state=42):
+    """
+    Fit the preprocessor once per fold and cache the binned XGBoost
+    matrices, so every configuration in a search reuses them.
+    """
+    folds = []
+    y = np.asarray(y, dtype=np.float64)
+    splitter = KFold(n_splits=cv, shuffle=True, random_state=random_state)
+    for train_idx, valid_idx in splitter.split(X):
+        preprocessor = create_feature_pipeline()
+        X_train = preprocessor.fit_transform(X.iloc[train_idx]).astype(np.float32)
+        X_valid = preprocessor.transform(X.iloc[valid_idx]).astype(np.float32)
+        dtrain = xgb.QuantileDMatrix(X_train, label=y[train_idx])
+        dvalid = xgb.QuantileDMatrix(X_valid, label=y[valid_idx], ref=dtrain)
+        folds.append({'dtrain': dtrain, 'dvalid': dvalid, 'y_valid': y[valid_idx]})
+    return folds
+
+def _booster_params(config, nthread):
+    """Translate sklearn-style XGBRegressor params to xgb.train params."""
+    params = {'objective': 'reg:squarederror', 'tree_method': 'hist',
+              'eval_metric': 'rmse', 'nthread': nthread,
+              'seed': XGB_PARAMS['random_state']}
+    for key, value in config.items():
+        params['eta' if key == 'learning_rate' else key] = value
+    return params
+
+def _advance_fold(fold, state, config, rounds, nthread, early_stopping_rounds):
+    """Continue one (config, fold) booster up to `rounds` total boosting rounds."""
+    if state['stopped'] or state['rounds'] >= rounds:
+        return state
+    booster = xgb.train(
+        _booster_params(config, nthread), fold['dtrain'],
+        num_boost_round=rounds - state['rounds'],
+        evals=[(fold['dvalid'], 'valid')],
+        early_stopping_rounds=early_stopping_rounds,
+        xgb_model=state['booster'], verbose_eval=False
+    )
+    best = booster.best_iteration + 1
+    prediction = booster.predict(fold['dvalid'], iteration_range=(0, best))
+    residual = fold['y_valid'] - prediction
+    return {
+        'booster': booster,
+        'rounds': booster.num_boosted_rounds(),
+        'best_rounds': best,
+        # Early stopping fired when the booster ended short of its budget
+        'stopped': booster.num_boosted_rounds() < rounds,
+        'r2': 1 - (residual ** 2).sum() / ((fold['y_valid'] - fold['y_valid'].mean()) ** 2).sum(),
+    }
+
+@traced('tune_hyperparameters', rows_arg='X')
+def tune_hyperparameters(X, y, param_space=None, n_configs=27, cv=5,
+                         min_rounds=10, max_rounds=300, reduction=3,
+                         early_stopping_rounds=10, n_jobs=None, random_state=42):
+    """
+    Successive-halving search over XGBoost parameters on cached folds.
+    Every rung grows the boosting budget by `reduction` and keeps the best
+    1/reduction of configurations; survivors continue boosting from where
+    they stopped instead of restarting. Folds run on outer threads and each
+    booster gets an explicit share of the cores.
+    Returns a dict with best_params, best_score and the per-rung history.
+    """
+    print("🔧 Tuning XGBoost Hyperparameters (successive halving)...")
+    folds = preprocess_folds(X, y, cv=cv, random_state=random_state)
+    outer_jobs, inner_threads = thread_budget(cv, n_jobs)
+    
+    configs = list(ParameterSampler(param_space or XGB_PARAM_SPACE, n_configs,
+                                    random_state=random_state))
+    states = {i: [{'booster': None, 'rounds': 0, 'stopped': False} for _ in folds]
+              for i in range(len(configs))}
+    survivors = list(range(len(configs)))
+    history = []
+    rounds = min_rounds
+    
+    with ThreadPoolExecutor(max_workers=outer_jobs) as pool:
+        while True:
+            for i in survivors:
+                states[i] = list(pool.map(
+                    lambda pair: _advance_fold(pair[0], pair[1], configs[i], rounds,
+                                               inner_threads, early_stopping_rounds),
+                    zip(folds, states[i])
+                ))
+            scores = {i: np.mean([state['r2'] for state in states[i]]) for i in survivors}
+            for i in survivors:
+                history.append({'rung_rounds': rounds, 'config': i,
+                                'r2': scores[i], **configs[i]})
+            
+            if len(survivors) <= 1 or rounds >= max_rounds:
+                break
+            survivors = sorted(survivors, key=scores.get, reverse=True)
+            survivors = survivors[:max(1, len(survivors) // reduction)]
+            rounds = min(max_rounds, rounds * reduction)
+    
+    best = max(survivors, key=scores.get)
+    best_rounds = int(np.mean([state['best_rounds'] for state in states[best]]))
+    best_params = {**configs[best], 'n_estimators': best_rounds}
+    
+    print(f"✅ Evaluated {len(configs)} configurations")
+    print(f"✅ Best Cross-Validation R² Score: {scores[best]:.4f}")
+    print(f"✅ Best Parameters: {best_params}")
+    
+    return {
+        'best_params': best_params,
+        'best_score': scores[best],
+        'history': pd.DataFrame(history),
+    }
+
+def preprocessor_drift(preprocessor, X):
+    """
+    Largest shift of a numeric feature's mean in X from the frozen training
+    mean, in training standard deviations (0 = no drift).
+    """
+    _, num_pipeline, numeric_features = preprocessor.transformers_[0]
+    scaler = num_pipeline.named_steps['scaler']
+    means = X[numeric_features].astype(np.float64).mean().to_numpy()
+    return float(np.nanmax(np.abs(means - scaler.mean_) / scaler.scale_))
+
+@traced('refresh_model', rows_arg='X_new')
+def refresh_model(bundle_path, X_new, y_new, X_holdout, y_holdout, extra_rounds=20,
+                  max_r2_drop=0.0, output_path=None, training_data=None):
+    """
+    Incrementally update a saved model instead of retraining from scratch.
+    The previous bundle's preprocessor is reused with its statistics frozen
+    (the existing trees split on values scaled with them), and boosting
+    continues for extra_rounds on the new and changed rows only.
+    The refreshed model is kept only if its holdout R² is no more than
+    max_r2_drop below the previous model's; otherwise it is rolled back
+    and nothing is written. Accepted models are saved to output_path
+    (default: overwrite bundle_path), keeping the previous bundle's
+    metrics, training fingerprint and drift baseline; pass the full
+    training listings to rebuild the last two from them instead.
+    Returns a dict with the model in use, both R² scores and the timing.
+    """
+    print("🔁 Refreshing Model (warm-start boosting)...")
+    start = time.perf_counter()
+    previous = load_model_pipeline(bundle_path)
+    preprocessor = previous.named_steps['preprocessor']
+    regressor = previous.named_steps['regressor']
+    
+    with span('preprocess.transform', rows=len(X_new)):
+        X_fit = preprocessor.transform(X_new)
+    with span('xgboost.fit', rows=len(X_new)):
+        continued = XGBRegressor(**dict(regressor.get_params(), n_estimators=extra_rounds))
+        continued.fit(X_fit, y_new, xgb_model=regressor.get_booster())
+    refreshed = Pipeline(steps=[('preprocessor', preprocessor), ('regressor', continued)])
+    refresh_seconds = time.perf_counter() - start
+    
+    with span('refresh_model.validate', rows=len(X_holdout)):
+        previous_r2 = previous.score(X_holdout, y_holdout)
+        holdout_predictions = refreshed.predict(X_holdout)
+        refreshed_r2 = r2_score(y_holdout, holdout_predictions)
+        # Recalibrate the intervals on the holdout residuals of the new trees
+        previous_intervals = getattr(previous, 'price_intervals_', None)
+        if previous_intervals is not None:
+            refreshed.price_intervals_ = ConformalIntervals.fit(
+                X_holdout, np.asarray(y_holdout) - holdout_predictions,
+                coverage=previous_intervals.coverage,
+                bucket_columns=previous_intervals.bucket_columns)
+    rolled_back = refreshed_r2 < previous_r2 - max_r2_drop
+    
+    report = {
+        'model': previous if rolled_back else refreshed,
+        'rolled_back': rolled_back,
+        'previous_r2': previous_r2,
+        'refreshed_r2': refreshed_r2,
+        'n_trees': continued.get_booster().num_boosted_rounds(),
+        'rows': len(X_new),
+        'refresh_seconds': refresh_seconds,
+        'preprocessor_drift': preprocessor_drift(preprocessor, X_new),
+    }
+    
+    print(f"✅ Previous Holdout R² Score:  {previous_r2:.4f}")
+    print(f"✅ Refreshed Holdout R² Score: {refreshed_r2:.4f} "
+          f"(+{extra_rounds} trees on {len(X_new)} rows in {refresh_seconds:.2f}s)")
+    if rolled_back:
+        print("⚠️  Holdout R² regressed: rolled back to the previous model")
+    else:
+        previous_manifest = read_manifest(bundle_path)
+        manifest = save_model_bundle(
+            ModelRuntime(refreshed), output_path or bundle_path,
+            metrics={**previous_manifest['metrics'], 'holdout_r2': refreshed_r2,
+                     'previous_holdout_r2': previous_r2,
+                     'refreshed_from': previous_manifest['model_version']},
+            training_data=training_data, inherit_from=bundle_path
+        )
+        report['model_version'] = manifest['model_version']
+        print(f"💾 Saved refreshed model {manifest['model_version']}")
+    if report['preprocessor_drift'] > 0.5:
+        print(f"⚠️  New rows drift {report['preprocessor_drift']:.2f} std devs from the "
+              f"frozen preprocessor statistics; consider a full retrain")
+    
+    return report
+
 # ============================================================================
 # 4. MODEL EXPLAINABILITY (SHAP)
 # ============================================================================
 
+@traced('explain_predictions', rows_arg='X_sample')
 def explain_predictions(model, X_sample):
     """
     Generate SHAP values for model explainability.
     """
     print("\n🔍 Generating SHAP Explanations...")
+    runtime = _as_runtime(model)
     
     # Get preprocessed features
-    X_preprocessed = model.named_steps['preprocessor'].transform(X_sample)
+    X_preprocessed = runtime.transform(X_sample)
     
-    # Create SHAP explainer
-    explainer = shap.TreeExplainer(model.named_steps['regressor'])
-    shap_values = explainer.shap_values(X_preprocessed)
+    # Per-feature contributions straight from the booster (TreeSHAP)
+    shap_values = runtime.explain(X_preprocessed)
     
     # Get feature names after preprocessing
-    feature_names = get_feature_names(model)
+    feature_names = runtime.feature_names
     
     # Calculate feature importance
     importance = np.abs(shap_values).mean(axis=0)
@@ -267,12 +887,15 @@ def get_feature_names(model):
     num_features = preprocessor.transformers_[0][2]
     feature_names.extend(num_features)
     
-    # Categorical features (one-hot encoded)
+    # Categorical features (one-hot encoded, or original names when the
+    # booster splits on category codes natively)
     cat_pipeline = preprocessor.transformers_[1][1]
     cat_features = preprocessor.transformers_[1][2]
-    onehot = cat_pipeline.named_steps['onehot']
-    cat_feature_names = onehot.get_feature_names_out(cat_features)
-    feature_names.extend(cat_feature_names)
+    if 'onehot' in cat_pipeline.named_steps:
+        onehot = cat_pipeline.named_steps['onehot']
+        feature_names.extend(onehot.get_feature_names_out(cat_features))
+    else:
+        feature_names.extend(cat_features)
     
     # Binary features
     bin_features = preprocessor.transformers_[2][2]
@@ -280,99 +903,606 @@ def get_feature_names(model):
     
     return feature_names
 
+# Each explain worker process builds its runtime once and keeps it here
+_explain_runtime = None
+
+def _init_explain_worker(model, nthread):
+    global _explain_runtime
+    _explain_runtime = ModelRuntime(model)
+    _explain_runtime.booster.set_param({'nthread': nthread})
+
+def _explain_chunk(task, runtime=None):
+    """
+    |SHAP| partial sums for one chunk of rows, grouped by stratum.
+    Raw values go to the memory-mapped .npy at `offset` when one is given,
+    or are returned when keep_values is set (small pilot samples only).
+    Returns (sums, sums of squares, counts, values or None).
+    """
+    X_chunk, strata, n_strata, values_path, offset, keep_values = task
+    runtime = runtime or _explain_runtime
+    values = runtime.explain(runtime.transform(X_chunk))
+    if values_path is not None:
+        out = np.load(values_path, mmap_mode='r+')
+        out[offset:offset + len(values)] = values
+        out.flush()
+        del out
+    magnitude = np.abs(values).astype(np.float64)
+    membership = np.zeros((n_strata, len(strata)))
+    membership[strata, np.arange(len(strata))] = 1.0
+    return (membership @ magnitude, membership @ magnitude ** 2,
+            np.bincount(strata, minlength=n_strata), values if keep_values else None)
+
+def _stratified_sample(strata, n_strata, n_rows, exclude, rng):
+    """Proportional stratified sample of about n_rows positions, skipping `exclude`."""
+    available = np.ones(len(strata), dtype=bool)
+    available[exclude] = False
+    sizes = np.bincount(strata, minlength=n_strata)
+    picks = []
+    for h in range(n_strata):
+        pool = np.flatnonzero(available & (strata == h))
+        take = min(len(pool), int(np.ceil(n_rows * sizes[h] / len(strata))))
+        picks.append(rng.choice(pool, take, replace=False))
+    return np.sort(np.concatenate(picks))
+
+@traced('global_feature_importance', rows_arg='X')
+def global_feature_importance(model, X, chunk_size=10_000, n_jobs=None,
+                              strata_columns=('location_type', 'property_type'),
+                              target_error=None, pilot_size=2000, values_path=None,
+                              random_state=42):
+    """
+    Mean |SHAP| per feature over a large dataset, computed in chunks on a
+    process pool. Workers return per-stratum partial sums, so the full SHAP
+    matrix is never held in memory.
+    
+    With target_error set, rows are sampled by stratum (strata_columns) until
+    the standard error of every feature's importance is at most target_error
+    times the top feature's importance: a pilot sample estimates per-stratum
+    variances, then the sample is topped up to the size they call for.
+    Without it every row is explained and the result is exact.
+    
+    values_path, if given, receives the per-row SHAP values as a float32
+    .npy, one row per explained listing in row_index order.
+    Returns a dict with feature_importance (feature, importance, std_error),
+    row_index and n_explained.
+    """
+    print("\n🔍 Computing Global Feature Importance...")
+    runtime = _as_runtime(model)
+    rng = np.random.default_rng(random_state)
+    n_features = len(runtime.feature_names)
+    
+    if strata_columns:
+        strata, levels = pd.MultiIndex.from_frame(X[list(strata_columns)]).factorize()
+        strata = strata.astype(np.intp)
+    else:
+        strata, levels = np.zeros(len(X), dtype=np.intp), [None]
+    n_strata = len(levels)
+    weights = np.bincount(strata, minlength=n_strata) / len(X)
+    totals = [np.zeros((n_strata, n_features)), np.zeros((n_strata, n_features)),
+              np.zeros(n_strata)]
+    
+    def run(positions, values_out=None, offset=0, keep_values=False):
+        # Chunks are sliced lazily and at most two per worker are in flight,
+        # so the pool never holds a pickled copy of the whole dataset
+        tasks = ((X.iloc[positions[i:i + chunk_size]], strata[positions[i:i + chunk_size]],
+                  n_strata, values_out, offset + i, keep_values)
+                 for i in range(0, len(positions), chunk_size))
+        partials = (map_bounded(pool, _explain_chunk, tasks, 2 * outer) if pool
+                    else (_explain_chunk(task, runtime) for task in tasks))
+        # Merge partial sums as they stream back
+        kept = []
+        for partial in partials:
+            for total, part in zip(totals, partial[:3]):
+                total += part
+            kept.append(partial[3])
+        return kept
+    
+    def estimate():
+        sums, squares, counts = totals
+        seen = np.maximum(counts, 1)[:, None]
+        means = sums / seen
+        variances = np.maximum(squares / seen - means ** 2, 0) * seen / np.maximum(seen - 1, 1)
+        # Stratified mean, and its variance times n under proportional allocation
+        return weights @ means, weights @ variances
+    
+    def allocate(n_rows):
+        if values_path is None:
+            return None
+        np.lib.format.open_memmap(values_path, mode='w+', dtype=np.float32,
+                                  shape=(n_rows, n_features)).flush()
+        return values_path
+    
+    outer, inner = thread_budget(int(np.ceil(len(X) / chunk_size)), n_jobs)
+    pool = (ProcessPoolExecutor(max_workers=outer, initializer=_init_explain_worker,
+                                initargs=(runtime.model, inner))
+            if outer > 1 else None)
+    try:
+        if target_error is None:
+            row_index = np.arange(len(X))
+            run(row_index, allocate(len(X)))
+        else:
+            pilot = _stratified_sample(strata, n_strata, min(pilot_size, len(X)), [], rng)
+            pilot_values = run(pilot, keep_values=values_path is not None)
+            importance, spread = estimate()
+            bound = target_error * importance.max()
+            needed = int(np.ceil(spread.max() / bound ** 2)) if bound > 0 else len(X)
+            extra = (_stratified_sample(strata, n_strata, needed - len(pilot), pilot, rng)
+                     if needed > len(pilot) else np.array([], dtype=np.intp))
+            row_index = np.concatenate([pilot, extra])
+            values_out = allocate(len(row_index))
+            if values_out is not None:
+                out = np.load(values_out, mmap_mode='r+')
+                out[:len(pilot)] = np.concatenate(pilot_values)
+                out.flush()
+                del out
+            run(extra, values_out, offset=len(pilot))
+    finally:
+        if pool:
+            pool.shutdown()
+    
+    importance, spread = estimate()
+    n_explained = len(row_index)
+    exact = n_explained == len(X)
+    std_error = np.zeros(n_features) if exact else np.sqrt(spread / n_explained)
+    
+    feature_importance = pd.DataFrame({
+        'feature': runtime.feature_names,
+        'importance': importance,
+        'std_error': std_error
+    }).sort_values('importance', ascending=False)
+    
+    print(f"✅ Explained {n_explained:,} of {len(X):,} listings "
+          f"({'exact' if exact else f'stratified sample over {n_strata} strata'})")
+    print(feature_importance.head(10).to_string(index=False))
+    
+    return {
+        'feature_importance': feature_importance,
+        'row_index': X.index.to_numpy()[row_index],
+        'n_explained': n_explained,
+    }
+
 # ============================================================================
 # 5. REAL-TIME PREDICTION API (Simulation)
 # ============================================================================
 
-def predict_home_value(model, property_data):
+class ModelRuntime:
+    """
+    Long-lived serving state for a fitted Pipeline.
+    Everything here depends only on the model, so it is built once at
+    startup and shared by every request instead of being rebuilt per call.
+    """
+    
+    # Batches up to this size are scored by the NumPy forest, which has no
+    # per-call setup cost; larger ones go to the multithreaded library predict
+    forest_max_rows = 64
+    
+    def __init__(self, model, explain_method='native'):
+        self.model = model
+        self.preprocessor = model.named_steps['preprocessor']
+        self.regressor = model.named_steps['regressor']
+        self.booster = self.regressor.get_booster()
+        self.explain_method = explain_method
+        self._explainer = None
+        self.feature_names = get_feature_names(model)
+        self.feature_name_array = np.asarray(self.feature_names, dtype=object)
+        self.category_columns = get_category_columns(model)
+        self.version = hashlib.sha256(pickle.dumps(model)).hexdigest()[:12]
+        self.compiled = CompiledPreprocessor.from_sklearn(self.preprocessor)
+        self.forest = CompiledForest.from_xgboost(self.regressor)
+        # Conformal intervals calibrated by train_model (None for other fits)
+        self.intervals = getattr(model, 'price_intervals_', None)
+    
+    @classmethod
+    def from_bundle(cls, path):
+        """Full runtime (with SHAP) from a bundle written by save_model_bundle."""
+        runtime = cls(load_model_pipeline(path))
+        runtime.version = read_manifest(path)['model_version']
+        return runtime
+    
+    def transform(self, records):
+        """
+        Preprocess raw listings with the compiled NumPy kernel.
+        Accepts a dict, list of dicts, struct-of-arrays or DataFrame.
+        """
+        return self.compiled.transform(records)
+    
+    def predict(self, X_preprocessed):
+        """Predict prices for an already preprocessed feature matrix."""
+        if len(X_preprocessed) <= self.forest_max_rows:
+            return self.forest.predict(X_preprocessed)
+        return self.regressor.predict(X_preprocessed)
+    
+    @property
+    def explainer(self):
+        """shap.TreeExplainer, imported and built on first use only."""
+        if self._explainer is None:
+            import shap
+            self._explainer = shap.TreeExplainer(self.regressor)
+        return self._explainer
+    
+    def explain(self, X_preprocessed):
+        """
+        SHAP values for an already preprocessed feature matrix.
+        The default 'native' method reads the booster's own TreeSHAP output
+        (pred_contribs), so the shap library is never imported; 'shap' goes
+        through shap.TreeExplainer.
+        """
+        if self.explain_method == 'shap':
+            return self.explainer.shap_values(X_preprocessed)
+        dmatrix = xgb.DMatrix(X_preprocessed, feature_types=self.regressor.feature_types,
+                              enable_categorical=bool(self.regressor.enable_categorical))
+        # Last column is the bias term (expected value), not a feature
+        return self.booster.predict(dmatrix, pred_contribs=True)[:, :-1]
+
+def get_category_columns(model):
+    """
+    Map each categorical feature to {category: output column index}.
+    The category dropped by the one-hot encoder maps to -1 (all zeros).
+    With native categorical encoding every category of a feature maps to
+    that feature's single code column.
+    """
+    preprocessor = model.named_steps['preprocessor']
+    num_features = preprocessor.transformers_[0][2]
+    cat_features = preprocessor.transformers_[1][2]
+    cat_steps = preprocessor.transformers_[1][1].named_steps
+    
+    if 'ordinal' in cat_steps:
+        return {
+            feature: {category: len(num_features) + i for category in categories}
+            for i, (feature, categories) in enumerate(zip(cat_features,
+                                                          cat_steps['ordinal'].categories_))
+        }
+    onehot = cat_steps['onehot']
+    
+    category_columns = {}
+    column = len(num_features)
+    for i, feature in enumerate(cat_features):
+        dropped = onehot.drop_idx_[i] if onehot.drop_idx_ is not None else None
+        mapping = {}
+        for j, category in enumerate(onehot.categories_[i]):
+            if j == dropped:
+                mapping[category] = -1
+            else:
+                mapping[category] = column
+                column += 1
+        category_columns[feature] = mapping
+    
+    return category_columns
+
+def _as_runtime(model):
+    """Accept either a fitted Pipeline or a prebuilt ModelRuntime."""
+    if isinstance(model, ModelRuntime):
+        return model
+    return ModelRuntime(model)
+
+@traced('predict_home_value')
+def predict_home_value(model, property_data, cache=None, monitor=None):
     """
     Simulate real-time prediction API.
     In production, this would be a FastAPI endpoint.
+    Pass a ModelRuntime to skip rebuilding the explainer on every call,
+    a PredictionCache to serve repeat quotes without re-scoring, and a
+    DriftMonitor to sketch every served listing and price (cache hits too).
     """
-    # Convert input to DataFrame
-    df_input = pd.DataFrame([property_data])
+    runtime = _as_runtime(model)
+    if cache is not None:
+        result = cache.get_or_compute(property_data, runtime.version,
+                                      lambda: predict_home_value(runtime, property_data))
+        if monitor is not None:
+            monitor.observe(property_data, result['predicted_price'])
+        return result
     
-    # Make prediction
-    prediction = model.predict(df_input)[0]
+    # Make prediction (the compiled preprocessor reads the dict directly)
+    with span('predict_home_value.preprocess', rows=1):
+        X_preprocessed = runtime.transform(property_data)
+    with span('predict_home_value.predict', rows=1):
+        prediction = runtime.predict(X_preprocessed)[0]
     
     # Get SHAP explanation
-    X_preprocessed = model.named_steps['preprocessor'].transform(df_input)
-    explainer = shap.TreeExplainer(model.named_steps['regressor'])
-    shap_values = explainer.shap_values(X_preprocessed)
+    with span('predict_home_value.explain', rows=1):
+        shap_values = runtime.explain(X_preprocessed)
+        
+        # Top 5 features by absolute contribution
+        names, values = _top_k_contributions(shap_values, runtime.feature_name_array, 5)
+        top_features = list(zip(names[0], values[0]))
     
-    # Get feature names and importance
-    feature_names = get_feature_names(model)
-    feature_importance = dict(zip(feature_names, shap_values[0]))
+    if monitor is not None:
+        monitor.observe(property_data, prediction)
     
-    # Sort by absolute importance
-    top_features = sorted(feature_importance.items(), 
-                         key=lambda x: abs(x[1]), 
-                         reverse=True)[:5]
+    # Conformal interval: one lookup of the listing's bucket half-width
+    interval, coverage = None, None
+    if runtime.intervals is not None:
+        half_width = runtime.intervals.half_width(property_data)
+        interval = (round(max(prediction - half_width, 0.0), 2), round(prediction + half_width, 2))
+        coverage = runtime.intervals.coverage
     
     return {
         'predicted_price': round(prediction, 2),
-        'confidence': 0.92,  # In production, calculate from model uncertainty
+        'price_interval': interval,
+        'confidence': coverage,  # coverage level of price_interval
         'top_features': top_features,
         'timestamp': datetime.now().isoformat()
     }
 
+def _records_to_columns(records):
+    """
+    Normalize a batch of listings into something the compiled preprocessor
+    reads column by column, without building a DataFrame.
+    Accepts a list of dicts, a DataFrame, a pyarrow Table/RecordBatch,
+    a NumPy structured array or a dict of equal-length column arrays.
+    """
+    if isinstance(records, (pd.DataFrame, dict)):
+        return records
+    if isinstance(records, np.ndarray) and records.dtype.names:
+        return {name: records[name] for name in records.dtype.names}
+    if hasattr(records, 'column_names'):
+        return {name: np.asarray(records.column(name)) for name in records.column_names}
+    return list(records)
+
+def _top_k_contributions(contributions, feature_names, k=5):
+    """
+    Select the k largest |contribution| columns per row, ordered by magnitude.
+    Returns (names, values) arrays of shape (n_rows, k).
+    """
+    k = min(k, contributions.shape[1])
+    magnitude = np.abs(contributions)
+    top = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(magnitude, top, axis=1), axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    names = np.asarray(feature_names, dtype=object)[top]
+    values = np.take_along_axis(contributions, top, axis=1)
+    return names, values
+
+def predict_home_values(model, records, top_k=5, explain=True, monitor=None):
+    """
+    Batch version of predict_home_value.
+    Preprocesses the whole batch once, then predicts and explains it with
+    one vectorized call each. Results are columnar: one array per field.
+    """
+    runtime = _as_runtime(model)
+    columns = _records_to_columns(records)
+    
+    # Preprocess once and reuse the matrix for prediction and SHAP
+    with span('predict_home_values.preprocess'):
+        X_preprocessed = runtime.transform(columns)
+    with span('predict_home_values.predict', rows=len(X_preprocessed)):
+        predictions = runtime.predict(X_preprocessed)
+    if monitor is not None:
+        monitor.observe_batch(columns, predictions)
+    
+    results = {
+        'predicted_price': np.round(predictions, 2),
+        'price_lower': None,
+        'price_upper': None,
+        'confidence': None,
+        'timestamp': datetime.now().isoformat()
+    }
+    if runtime.intervals is not None:
+        with span('predict_home_values.intervals', rows=len(predictions)):
+            lower, upper = runtime.intervals.interval(columns, predictions)
+        results.update(price_lower=np.round(lower, 2), price_upper=np.round(upper, 2),
+                       confidence=runtime.intervals.coverage)
+    
+    if explain:
+        with span('predict_home_values.explain', rows=len(X_preprocessed)):
+            shap_values = runtime.explain(X_preprocessed)
+            names, values = _top_k_contributions(shap_values, runtime.feature_name_array,
+                                                 top_k)
+        results['top_feature_names'] = names
+        results['top_feature_values'] = values
+    
+    return results
+
+def measure_serving_metrics(model, records, n_calls=200, batch_rows=10_000):
+    """
+    Measured serving numbers for the demo printout: single-listing
+    predict_home_value latency (p50/p99), batch throughput and model size.
+    records is a DataFrame of listings to sample requests from.
+    """
+    runtime = _as_runtime(model)
+    requests = records.head(n_calls).to_dict('records')
+    latencies = []
+    for i in range(n_calls):
+        start = time.perf_counter()
+        predict_home_value(runtime, requests[i % len(requests)])
+        latencies.append(time.perf_counter() - start)
+    
+    reps = int(np.ceil(batch_rows / len(records)))
+    batch = records.iloc[np.tile(np.arange(len(records)), reps)[:batch_rows]]
+    start = time.perf_counter()
+    predict_home_values(runtime, batch, explain=False)
+    batch_seconds = time.perf_counter() - start
+    
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'batch_rows_per_sec': batch_rows / batch_seconds,
+        'model_size_mb': len(pickle.dumps(runtime.model)) / 1e6,
+    }
+
 # ============================================================================
 # 6. RECOMMENDATIONS ENGINE
 # ============================================================================
 
-def generate_recommendations(property_data, current_price):
+# Each rule reads one column, or a tuple of columns with a tuple of defaults,
+# and `when` maps the values (one float64 argument per column) to a boolean
+# mask. Missing values (absent, None or NaN) read as the rule's default. The
+# batch path passes arrays and generate_recommendations np.float64 scalars,
+# so the same `when` serves both.
+RECOMMENDATION_RULES = [
+    {'column': 'has_wifi', 'default': 0, 'when': lambda v: v == 0,
+     'action': 'Add WiFi', 'expected_impact': '+$10-15/night', 'priority': 'High'},
+    {'column': 'has_parking', 'default': 0, 'when': lambda v: v == 0,
+     'action': 'Provide parking', 'expected_impact': '+$12-18/night', 'priority': 'High'},
+    {'column': 'has_pool', 'default': 0, 'when': lambda v: v == 0,
+     'action': 'Add pool (if feasible)', 'expected_impact': '+$30-50/night',
+     'priority': 'Medium'},
+    {'column': 'host_response_rate', 'default': 100, 'when': lambda v: v < 90,
+     'action': 'Improve response rate to 90%+', 'expected_impact': '+$8-12/night',
+     'priority': 'High'},
+    {'column': 'review_scores_rating', 'default': 5, 'when': lambda v: v < 4.5,
+     'action': 'Focus on improving guest ratings', 'expected_impact': '+$10-20/night',
+     'priority': 'High'},
+]
+
+def _rule_inputs(rule):
+    """(columns, defaults) of a rule as tuples, for one or several columns."""
+    column, default = rule['column'], rule.get('default')
+    if isinstance(column, str):
+        return (column,), (default,)
+    return tuple(column), (tuple(default) if default is not None else (None,) * len(column))
+
+def _rule_column(columns, name, default, n_rows):
+    """One rule input as a float array, with the rule default for missing values."""
+    if isinstance(columns, list):
+        values = np.array([r.get(name) for r in columns], dtype=np.float64)
+    elif name not in columns:
+        values = np.full(n_rows, np.nan)
+    else:
+        values = np.asarray(columns[name], dtype=np.float64)
+    missing = np.isnan(values)
+    if default is not None and missing.any():
+        values = np.where(missing, default, values)
+    return values
+
+def _rule_value(record, name, default):
+    """_rule_column for a single listing, as an np.float64 scalar."""
+    value = record.get(name)
+    if value is None or value != value:
+        value = np.nan if default is None else default
+    return np.float64(value)
+
+def recommendation_masks(records, rules=None):
+    """
+    Evaluate every rule over a batch of listings at once.
+    Returns a (n_rows, n_rules) boolean matrix: True where the rule fires.
+    """
+    rules = RECOMMENDATION_RULES if rules is None else rules
+    columns = _records_to_columns(records)
+    n_rows = (len(next(iter(columns.values()))) if isinstance(columns, dict)
+              else len(columns))
+    masks = np.empty((n_rows, len(rules)), dtype=bool)
+    for j, rule in enumerate(rules):
+        names, defaults = _rule_inputs(rule)
+        masks[:, j] = rule['when'](*[_rule_column(columns, name, default, n_rows)
+                                     for name, default in zip(names, defaults)])
+    return masks
+
+@traced('recommend_batch')
+def recommend_batch(records, rules=None):
+    """
+    Recommendations for a whole batch in exploded form: one row per
+    (listing, fired rule), in rule order within each listing.
+    Columns: row (position in the batch), rule (index into rules) and
+    categorical action, expected_impact and priority.
+    """
+    rules = RECOMMENDATION_RULES if rules is None else rules
+    rows, rule_ids = np.nonzero(recommendation_masks(records, rules))
+    recommendations = {'row': rows, 'rule': rule_ids}
+    for field in ('action', 'expected_impact', 'priority'):
+        # Factorize the per-rule labels so each field is one gather of codes
+        codes, labels = pd.factorize(np.array([rule[field] for rule in rules], dtype=object))
+        recommendations[field] = pd.Categorical.from_codes(codes[rule_ids], labels)
+    return pd.DataFrame(recommendations)
+
+def generate_recommendations(property_data, current_price, rules=None):
     """
     Generate actionable recommendations to increase property value.
+    Single-listing wrapper around the vectorized rule engine.
     """
+    rules = RECOMMENDATION_RULES if rules is None else rules
     recommendations = []
+    for rule in rules:
+        # Same rule functions and missing-value defaults as the batch path,
+        # applied to scalars
+        names, defaults = _rule_inputs(rule)
+        if rule['when'](*[_rule_value(property_data, name, default)
+                          for name, default in zip(names, defaults)]):
+            recommendations.append({
+                'action': rule['action'],
+                'expected_impact': rule['expected_impact'],
+                'priority': rule['priority']
+            })
+    return recommendations
+
+# Candidate interventions for the what-if engine. Each change sets a column to
+# a constant or to a function of its current values.
+INTERVENTIONS = [
+    {'action': 'Add WiFi', 'changes': {'has_wifi': 1}},
+    {'action': 'Provide parking', 'changes': {'has_parking': 1}},
+    {'action': 'Add pool (if feasible)', 'changes': {'has_pool': 1}},
+    {'action': 'Improve response rate to 90%+',
+     'changes': {'host_response_rate': lambda v: np.fmax(v, 90)}},
+    {'action': 'Focus on improving guest ratings',
+     'changes': {'review_scores_rating': lambda v: np.fmax(v, 4.5)}},
+]
+
+def _slice_columns(columns, start, stop):
+    """Rows [start, stop) of a DataFrame or dict of column arrays."""
+    if isinstance(columns, pd.DataFrame):
+        return columns.iloc[start:stop]
+    return {name: np.asarray(values)[start:stop] for name, values in columns.items()}
+
+@traced('estimate_intervention_impacts')
+def estimate_intervention_impacts(model, records, interventions=None, chunk_size=100_000):
+    """
+    Model-estimated price change per listing for each intervention.
+    Every chunk is preprocessed once. For each intervention only the
+    changed input columns are re-encoded, only the listings it actually
+    changes are rescored, and only the trees that split on those columns
+    are evaluated: the other trees give the same leaf either way, so their
+    contributions cancel out of the delta.
+    Returns a DataFrame with one column of dollar deltas per action.
+    """
+    runtime = _as_runtime(model)
+    interventions = INTERVENTIONS if interventions is None else interventions
+    columns = _records_to_columns(records)
+    if isinstance(columns, list):
+        columns = pd.DataFrame(columns)
+    n_rows = (len(next(iter(columns.values()))) if isinstance(columns, dict)
+              else len(columns))
     
-    # Check amenities
-    if not property_data.get('has_wifi', 0):
-        recommendations.append({
-            'action': 'Add WiFi',
-            'expected_impact': '+$10-15/night',
-            'priority': 'High'
-        })
-    
-    if not property_data.get('has_parking', 0):
-        recommendations.append({
-            'action': 'Provide parking',
-            'expected_impact': '+$12-18/night',
-            'priority': 'High'
-        })
-    
-    if not property_data.get('has_pool', 0):
-        recommendations.append({
-            'action': 'Add pool (if feasible)',
-            'expected_impact': '+$30-50/night',
-            'priority': 'Medium'
-        })
-    
-    # Check host quality
-    if property_data.get('host_response_rate', 100) < 90:
-        recommendations.append({
-            'action': 'Improve response rate to 90%+',
-            'expected_impact': '+$8-12/night',
-            'priority': 'High'
-        })
-    
-    # Check reviews
-    if property_data.get('review_scores_rating', 5) < 4.5:
-        recommendations.append({
-            'action': 'Focus on improving guest ratings',
-            'expected_impact': '+$10-20/night',
-            'priority': 'High'
-        })
+    preprocessor, forest = runtime.compiled, runtime.forest
+    touched_trees = [
+        forest.trees_using(np.concatenate([preprocessor.feature_columns(name)
+                                           for name in intervention['changes']]))
+        for intervention in interventions
+    ]
     
-    return recommendations
+    deltas = np.zeros((n_rows, len(interventions)))
+    for start in range(0, n_rows, chunk_size):
+        chunk = _slice_columns(columns, start, start + chunk_size)
+        X_base = preprocessor.transform(chunk)
+        for j, intervention in enumerate(interventions):
+            after = {}
+            changed = np.zeros(len(X_base), dtype=bool)
+            for name, change in intervention['changes'].items():
+                before = np.asarray(chunk[name])
+                value = change(before) if callable(change) else change
+                after[name] = np.broadcast_to(value, before.shape)
+                changed |= np.asarray(after[name] != before)
+            rows = np.flatnonzero(changed)
+            if len(rows) == 0 or len(touched_trees[j]) == 0:
+                continue
+            X_after = X_base[rows]
+            preprocessor.transform({name: values[rows] for name, values in after.items()},
+                                   out=X_after, features=after)
+            deltas[start + rows, j] = (forest.predict(X_after, trees=touched_trees[j]) -
+                                       forest.predict(X_base[rows], trees=touched_trees[j]))
+    
+    return pd.DataFrame(deltas, columns=[i['action'] for i in interventions],
+                        index=columns.index if isinstance(columns, pd.DataFrame) else None)
 
 # ============================================================================
 # 7. MAIN EXECUTION
 # ============================================================================
 
-def main():
+def main(compact=False, native_categorical=False, bundle_path=None):
     """
     Main execution pipeline demonstrating end-to-end ML system.
+    compact=True runs the whole demo on the compact memory layout;
+    native_categorical=True trains on category codes instead of one-hot.
+    bundle_path, if given, is where the trained model bundle is saved.
     """
     print("=" * 80)
     print("🏠 AIRBNB HOME VALUE PREDICTION - ML SYSTEM DEMO")
@@ -380,28 +1510,41 @@ def main():
     
     # 1. Generate data
     print("\n📊 Step 1: Generating Synthetic Dataset...")
-    df = generate_synthetic_data(n_samples=2000)
+    df = generate_synthetic_data(n_samples=2000, compact=compact)
     print(f"✅ Generated {len(df)} property listings")
     print(f"\nDataset shape: {df.shape}")
     print(f"\nSample data:\n{df.head()}")
     
     # 2. Split data
     print("\n📊 Step 2: Splitting Data...")
-    X = df.drop('price', axis=1)
-    y = df['price']
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+    with span('train_test_split', rows=len(df)):
+        X = df.drop('price', axis=1)
+        y = df['price']
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
     print(f"✅ Training set: {len(X_train)} samples")
     print(f"✅ Testing set: {len(X_test)} samples")
     
     # 3. Train model
     print("\n📊 Step 3: Training Model...")
-    model = train_model(X_train, y_train, X_test, y_test)
+    train_start = time.perf_counter()
+    model = train_model(X_train, y_train, X_test, y_test, compact=compact,
+                        native_categorical=native_categorical)
+    training_seconds = time.perf_counter() - train_start
+    
+    # Build the serving runtime once; every later step reuses it
+    runtime = ModelRuntime(model)
+    
+    # Memory held by each stage's data
+    print(f"\n💾 Memory Footprint ({'compact' if compact else 'default'} layout):")
+    for stage, data in [('Raw dataset', df), ('Training features', X_train),
+                        ('Preprocessed matrix', runtime.transform(X_train))]:
+        print(f"   {stage:<20} {memory_footprint(data) / 1024:>10,.1f} KB")
     
     # 4. Explain model
     print("\n📊 Step 4: Model Explainability...")
-    shap_values, feature_importance = explain_predictions(model, X_test.head(100))
+    shap_values, feature_importance = explain_predictions(runtime, X_test.head(100))
     
     # 5. Real-time prediction example
     print("\n📊 Step 5: Real-Time Prediction Example...")
@@ -428,33 +1571,68 @@ def main():
         'days_since_listing': 365
     }
     
-    prediction_result = predict_home_value(model, sample_property)
+    prediction_result = predict_home_value(runtime, sample_property)
+    lower, upper = prediction_result['price_interval']
     print(f"\n🎯 Prediction Result:")
     print(f"   Predicted Price: ${prediction_result['predicted_price']}/night")
-    print(f"   Confidence: {prediction_result['confidence']*100}%")
+    print(f"   {prediction_result['confidence']:.0%} Interval: ${lower} - ${upper}/night")
     print(f"\n   Top Contributing Features:")
     for feature, value in prediction_result['top_features']:
         print(f"   - {feature}: {value:+.2f}")
     
     # 6. Generate recommendations
     print("\n📊 Step 6: Generating Recommendations...")
-    recommendations = generate_recommendations(sample_property, 
-                                              prediction_result['predicted_price'])
+    with span('generate_recommendations', rows=1):
+        recommendations = generate_recommendations(sample_property, 
+                                                  prediction_result['predicted_price'])
+    impacts = estimate_intervention_impacts(runtime, [sample_property]).iloc[0]
     print(f"\n💡 Recommendations to Increase Value:")
     for i, rec in enumerate(recommendations, 1):
         print(f"   {i}. {rec['action']}")
         print(f"      Impact: {rec['expected_impact']} | Priority: {rec['priority']}")
+        if rec['action'] in impacts:
+            impact = impacts[rec['action']]
+            print(f"      Model estimate: {'+' if impact >= 0 else '-'}${abs(impact):.2f}/night")
     
     # 7. System metrics
+    # (measured on this machine; see airbnb_ml_benchmark.py suite for the full grid)
     print("\n📊 Step 7: System Performance Metrics...")
-    print(f"   ⚡ Prediction Latency: <100ms (Real-time)")
+    metrics = measure_serving_metrics(runtime, X_test)
+    print(f"   ⚡ Prediction Latency: p50 {metrics['p50_ms']:.1f}ms, "
+          f"p99 {metrics['p99_ms']:.1f}ms (single listing, with SHAP)")
     print(f"   📈 Model Accuracy (R²): {model.score(X_test, y_test):.4f}")
-    print(f"   🎯 Scalability: 10M+ listings supported")
-    print(f"   ✅ Uptime: 99.9% (Production SLA)")
+    print(f"   🎯 Batch Throughput: {metrics['batch_rows_per_sec']:,.0f} listings/sec")
+    print(f"   🔄 Training Time: {training_seconds:.1f}s (fit + 5-fold CV, {len(X_train)} rows)")
+    print(f"   💾 Model Size: {metrics['model_size_mb']:.2f}MB (pickled Pipeline)")
+    
+    # 8. Persist the model for serving processes
+    if bundle_path:
+        print("\n📊 Step 8: Saving Model Bundle...")
+        manifest = save_model_bundle(
+            runtime, bundle_path, training_data=X_train,
+            metrics={'train_r2': model.score(X_train, y_train),
+                     'test_r2': model.score(X_test, y_test)}
+        )
+        print(f"   💾 Saved model {manifest['model_version']} to {bundle_path}")
     
     print("\n" + "=" * 80)
     print("✅ ML SYSTEM DEMO COMPLETED SUCCESSFULLY!")
     print("=" * 80)
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Airbnb home value ML system demo")
+    parser.add_argument('--compact', action='store_true',
+                        help="Use categoricals, downcast columns and float32 features")
+    parser.add_argument('--native-categorical', action='store_true',
+                        help="Let XGBoost split on category codes instead of one-hot columns")
+    parser.add_argument('--save-bundle', metavar='DIR',
+                        help="Save the trained model bundle to DIR")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="Record per-stage spans and write a Chrome trace to FILE")
+    args = parser.parse_args()
+    if args.trace:
+        enable_tracing(args.trace)
+    main(compact=args.compact, native_categorical=args.native_categorical,
+         bundle_path=args.save_bundle)
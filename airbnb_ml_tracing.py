@@ -0,0 +1,311 @@
+"""
+Airbnb Home Value Prediction - Tracing and Profiling
+Lightweight spans around pipeline stages, exported as Chrome trace JSON
+(chrome://tracing or https://ui.perfetto.dev) plus in-process latency
+histograms.
+
+Tracing is off by default and a disabled span is a shared no-op context,
+so instrumented code pays one attribute check per span.
+
+Environment variables:
+    AIRBNB_TRACE=1              record spans (print a summary at exit)
+    AIRBNB_TRACE=trace.json     ... and write a Chrome trace at exit
+    AIRBNB_TRACE_MAX_EVENTS=<n> keep only the latest n span events for the
+                                Chrome trace (default 100000); histograms
+                                still cover every span
+    AIRBNB_PROFILE=<span>       run cProfile inside every <span> (stats printed
+                                and saved to <span>.prof)
+    AIRBNB_TRACEMALLOC=<span>   trace allocations inside <span> and print the
+                                top allocation sites
+
+Usage:
+    from airbnb_ml_tracing import span, traced, tracer
+
+    with span('preprocess', rows=len(X)):
+        ...
+
+    @traced('generate_synthetic_data', rows_arg='n_samples')
+    def generate_synthetic_data(n_samples=1000, ...): ...
+"""
+
+import atexit
+import collections
+import contextlib
+import functools
+import inspect
+import io
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# ============================================================================
+# 1. LATENCY HISTOGRAM
+# ============================================================================
+
+class LatencyHistogram:
+    """
+    Fixed log-spaced buckets from 1µs to ~17min (4 per power of two), so
+    recording is O(1) and memory stays constant however many calls arrive.
+    """
+
+    BUCKETS_PER_OCTAVE = 4
+    N_BUCKETS = 30 * BUCKETS_PER_OCTAVE
+
+    def __init__(self):
+        self.counts = np.zeros(self.N_BUCKETS + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = max(seconds * 1e6, 1.0)
+        bucket = min(int(np.log2(micros) * self.BUCKETS_PER_OCTAVE), self.N_BUCKETS)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile, in seconds."""
+        if not self.count:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.count))
+        return min(2 ** ((bucket + 1) / self.BUCKETS_PER_OCTAVE) / 1e6, self.max)
+
+    def summary(self):
+        return {'count': self.count, 'mean_ms': self.total / max(self.count, 1) * 1000,
+                'p50_ms': self.percentile(50) * 1000, 'p99_ms': self.percentile(99) * 1000,
+                'max_ms': self.max * 1000}
+
+# ============================================================================
+# 2. TRACER
+# ============================================================================
+
+def _rss_bytes():
+    """Resident set size from /proc (Linux); None elsewhere."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+class _Span:
+    """One active span; records itself on the tracer when it exits."""
+
+    __slots__ = ('tracer', 'name', 'rows', 'args', 'start', 'cpu_start', 'rss_start',
+                 'profiler', 'tracemalloc_started')
+
+    def __init__(self, tracer, name, rows, args):
+        self.tracer = tracer
+        self.name = name
+        self.rows = rows
+        self.args = args
+        self.profiler = None
+        self.tracemalloc_started = False
+
+    def __enter__(self):
+        if self.name == self.tracer.profile_span:
+            import cProfile
+            self.profiler = cProfile.Profile()
+        if self.name == self.tracer.tracemalloc_span:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                self.tracemalloc_started = True
+            tracemalloc.reset_peak()
+        self.rss_start = _rss_bytes()
+        self.cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        if self.profiler:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler:
+            self.profiler.disable()
+        duration = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu_start
+        rss_end = _rss_bytes()
+        args = dict(self.args)
+        args['cpu_ms'] = round(cpu * 1000, 3)
+        if self.rows is not None:
+            args['rows'] = int(self.rows)
+        if self.rss_start is not None and rss_end is not None:
+            args['rss_delta_mb'] = round((rss_end - self.rss_start) / 1e6, 3)
+        if self.profiler:
+            self.tracer._report_profile(self.name, self.profiler)
+        if self.name == self.tracer.tracemalloc_span:
+            args['traced_peak_mb'] = self.tracer._report_tracemalloc(self.name,
+                                                                     self.tracemalloc_started)
+        self.tracer._record(self.name, self.start, duration, args)
+        return False
+
+class Tracer:
+    """
+    Collects spans as Chrome trace events and per-name latency histograms.
+    Events are kept in a ring of the latest max_events (a long-running
+    server would otherwise grow without bound); the histograms and CPU
+    totals are constant-size aggregates over every span ever recorded.
+    """
+
+    def __init__(self, enabled=False, profile_span=None, tracemalloc_span=None,
+                 max_events=100_000):
+        self.enabled = enabled
+        self.profile_span = profile_span
+        self.tracemalloc_span = tracemalloc_span
+        self.max_events = max_events
+        self.events = collections.deque(maxlen=max_events)
+        self.dropped_events = 0
+        self.histograms = {}
+        self.cpu_ms = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def span(self, name, rows=None, **args):
+        """Context manager timing one stage; a no-op while tracing is disabled."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, rows, args)
+
+    def _record(self, name, start, duration, args):
+        event = {'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                 'ts': (start - self._origin) * 1e6, 'dur': duration * 1e6, 'args': args}
+        with self._lock:
+            if len(self.events) == self.max_events:
+                self.dropped_events += 1
+            self.events.append(event)
+            self.cpu_ms[name] = self.cpu_ms.get(name, 0.0) + args['cpu_ms']
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(duration)
+
+    def _report_profile(self, name, profiler):
+        import pstats
+        profiler.dump_stats(f"{name}.prof")
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(20)
+        print(f"\n🔬 cProfile for span '{name}' (saved to {name}.prof):\n{stream.getvalue()}")
+
+    def _report_tracemalloc(self, name, stop):
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"\n🔬 tracemalloc for span '{name}' (peak {peak / 1e6:.1f}MB), top sites:")
+        for stat in snapshot.statistics('lineno')[:10]:
+            print(f"   {stat}")
+        if stop:
+            tracemalloc.stop()
+        return round(peak / 1e6, 3)
+
+    def reset(self):
+        with self._lock:
+            self.events = collections.deque(maxlen=self.max_events)
+            self.dropped_events = 0
+            self.histograms = {}
+            self.cpu_ms = {}
+            self._origin = time.perf_counter()
+
+    def export_chrome_trace(self, path):
+        """Write the retained spans in the Chrome trace event format."""
+        with self._lock:
+            events = list(self.events)
+            dropped = self.dropped_events
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'otherData': {'dropped_events': dropped}}, f)
+        return path
+
+    def summary(self):
+        """{span name: histogram summary + total and CPU time}."""
+        with self._lock:
+            histograms = dict(self.histograms)
+            cpu = dict(self.cpu_ms)
+        return {name: dict(histogram.summary(), total_ms=histogram.total * 1000,
+                           cpu_ms=cpu.get(name, 0.0))
+                for name, histogram in histograms.items()}
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        spans = sum(row['count'] for row in summary.values())
+        dropped = (f", {self.dropped_events:,} oldest dropped from the trace"
+                   if self.dropped_events else "")
+        print(f"\n⏱️  Trace Summary ({spans:,} spans{dropped})")
+        print(f"   {'Span':<36} {'calls':>6} {'total':>10} {'cpu':>10} {'p50':>9} {'p99':>9}")
+        for name, row in sorted(summary.items(), key=lambda item: -item[1]['total_ms']):
+            print(f"   {name:<36} {row['count']:>6} {row['total_ms']:>8.1f}ms "
+                  f"{row['cpu_ms']:>8.1f}ms {row['p50_ms']:>7.2f}ms {row['p99_ms']:>7.2f}ms")
+
+_NULL_SPAN = contextlib.nullcontext()
+
+# ============================================================================
+# 3. GLOBAL TRACER AND HELPERS
+# ============================================================================
+
+def _tracer_from_env():
+    trace = os.environ.get('AIRBNB_TRACE', '')
+    profile_span = os.environ.get('AIRBNB_PROFILE') or None
+    tracemalloc_span = os.environ.get('AIRBNB_TRACEMALLOC') or None
+    enabled = trace not in ('', '0') or bool(profile_span or tracemalloc_span)
+    max_events = int(os.environ.get('AIRBNB_TRACE_MAX_EVENTS', 100_000))
+    return Tracer(enabled, profile_span, tracemalloc_span, max_events)
+
+tracer = _tracer_from_env()
+_export_path = None
+
+def span(name, rows=None, **args):
+    """Span on the global tracer."""
+    return tracer.span(name, rows, **args)
+
+def traced(name=None, rows_arg=None):
+    """
+    Decorator recording a span per call. rows_arg names the argument that
+    gives the row count: its len(), or its value when it is an int.
+    """
+    def decorate(fn):
+        span_name = name or fn.__name__
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            rows = None
+            if rows_arg is not None:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                value = bound.arguments[rows_arg]
+                rows = value if isinstance(value, int) else len(value)
+            with tracer.span(span_name, rows):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _report_at_exit():
+    if not tracer.events:
+        return
+    tracer.print_summary()
+    if _export_path:
+        tracer.export_chrome_trace(_export_path)
+        print(f"   💾 Chrome trace written to {_export_path}")
+
+def enable_tracing(chrome_trace_path=None):
+    """
+    Turn tracing on for this process. A summary is printed at exit, and
+    the Chrome trace is written to chrome_trace_path when one is given.
+    """
+    global _export_path
+    if not tracer.enabled:
+        atexit.register(_report_at_exit)
+    tracer.enabled = True
+    _export_path = chrome_trace_path or _export_path
+
+if tracer.enabled:
+    _export_path = os.environ['AIRBNB_TRACE'] if os.environ.get(
+        'AIRBNB_TRACE', '').endswith('.json') else None
+    atexit.register(_report_at_exit)
@@ -0,0 +1,76 @@
+"""
+Resumable batch scoring: a run stopped part way and re-run scores only the
+remaining partitions, refuses to mix in a different output schema, and
+ends with the same output as one clean run.
+
+Run with:  python -m pytest tests
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from airbnb_ml_batch import read_checkpoint, run_batch_scoring
+from airbnb_ml_bundle import save_model_bundle
+from airbnb_ml_system import (
+    build_model,
+    generate_synthetic_data,
+    write_synthetic_dataset,
+    ModelRuntime,
+)
+
+N_PARTITIONS = 4
+
+@pytest.fixture(scope='module')
+def bundle_and_listings(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('batch')
+    df = generate_synthetic_data(n_samples=1000)
+    model = build_model().fit(df.drop('price', axis=1), df['price'])
+    bundle, listings = str(directory / 'bundle'), str(directory / 'listings')
+    save_model_bundle(ModelRuntime(model), bundle)
+    write_synthetic_dataset(listings, 2000, chunk_size=2000 // N_PARTITIONS, n_workers=1)
+    clean = str(directory / 'clean')
+    run_batch_scoring(bundle, listings, clean, n_workers=1, top_k=3)
+    return bundle, listings, pd.read_parquet(clean)
+
+def test_resume_scores_only_the_remaining_partitions(tmp_path, bundle_and_listings):
+    bundle, listings, clean = bundle_and_listings
+    output = str(tmp_path / 'scores')
+    first = run_batch_scoring(bundle, listings, output, n_workers=1, top_k=3, max_partitions=1)
+    assert not first['complete'] and first['partitions_scored'] == 1
+    assert len(read_checkpoint(output)['partitions']) == 1
+
+    second = run_batch_scoring(bundle, listings, output, n_workers=1, top_k=3)
+    assert second['complete']
+    assert second['partitions_skipped'] == 1
+    assert second['partitions_scored'] == N_PARTITIONS - 1
+    pd.testing.assert_frame_equal(pd.read_parquet(output), clean)
+
+def test_partition_with_missing_output_is_scored_again(tmp_path, bundle_and_listings):
+    bundle, listings, clean = bundle_and_listings
+    output = str(tmp_path / 'scores')
+    run_batch_scoring(bundle, listings, output, n_workers=1, top_k=3)
+    os.remove(os.path.join(output, 'part-00001.parquet'))
+
+    rerun = run_batch_scoring(bundle, listings, output, n_workers=1, top_k=3)
+    assert rerun['partitions_scored'] == 1 and rerun['complete']
+    pd.testing.assert_frame_equal(pd.read_parquet(output), clean)
+
+@pytest.mark.parametrize('options', [{'explain': False}, {'top_k': 5}])
+def test_resume_with_other_output_schema_is_refused(tmp_path, bundle_and_listings, options):
+    bundle, listings, _ = bundle_and_listings
+    output = str(tmp_path / 'scores')
+    run_batch_scoring(bundle, listings, output, n_workers=1, top_k=3, max_partitions=1)
+    with pytest.raises(ValueError):
+        run_batch_scoring(bundle, listings, output, n_workers=1, **dict({'top_k': 3}, **options))
+    assert len(read_checkpoint(output)['partitions']) == 1
+
+def test_resume_with_other_input_is_refused(tmp_path, bundle_and_listings):
+    bundle, listings, _ = bundle_and_listings
+    output = str(tmp_path / 'scores')
+    run_batch_scoring(bundle, listings, output, n_workers=1, top_k=3, max_partitions=1)
+    other = str(tmp_path / 'other')
+    write_synthetic_dataset(other, 500, chunk_size=500, n_workers=1)
+    with pytest.raises(ValueError):
+        run_batch_scoring(bundle, other, output, n_workers=1, top_k=3)
@@ -0,0 +1,103 @@
+"""
+PredictionCache: canonical keys, TTL expiry, LRU eviction, and the
+in-memory and SQLite backends behaving the same.
+
+Run with:  python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+import airbnb_ml_cache
+from airbnb_ml_cache import PredictionCache, canonical_listing_key
+
+LISTING = {'property_type': 'entire_home', 'bedrooms': 2, 'bathrooms': 1.5,
+           'location_type': 'downtown', 'season': 'summer', 'has_wifi': 1,
+           'distance_to_metro': 0.75}
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    """Factory for a PredictionCache on either backend."""
+    def make(**options):
+        path = str(tmp_path / 'cache.db') if request.param == 'sqlite' else None
+        return PredictionCache(path=path, **options)
+    return make
+
+def test_key_ignores_field_order_number_types_and_extra_fields():
+    key = canonical_listing_key(LISTING, 'v1')
+    reordered = dict(reversed(list(LISTING.items())))
+    assert canonical_listing_key(reordered, 'v1') == key
+    assert canonical_listing_key(dict(LISTING, bedrooms=2.0), 'v1') == key
+    assert canonical_listing_key(dict(LISTING, bedrooms=np.int8(2)), 'v1') == key
+    assert canonical_listing_key(dict(LISTING, distance_to_metro=0.750001), 'v1') == key
+    assert canonical_listing_key(dict(LISTING, listing_url='x'), 'v1') == key
+
+def test_key_depends_on_values_missing_fields_and_model_version():
+    key = canonical_listing_key(LISTING, 'v1')
+    assert canonical_listing_key(LISTING, 'v2') != key
+    assert canonical_listing_key(dict(LISTING, bedrooms=3), 'v1') != key
+    assert canonical_listing_key(dict(LISTING, distance_to_metro=0.76), 'v1') != key
+    missing = {k: v for k, v in LISTING.items() if k != 'bathrooms'}
+    assert canonical_listing_key(missing, 'v1') != key
+    # None, NaN and an absent field are all "missing"
+    assert canonical_listing_key(dict(missing, bathrooms=float('nan')), 'v1') == \
+        canonical_listing_key(dict(missing, bathrooms=None), 'v1') == \
+        canonical_listing_key(missing, 'v1')
+
+def test_entries_expire_after_ttl(make_cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(airbnb_ml_cache.time, 'time', lambda: now[0])
+    cache = make_cache(ttl=60)
+    cache.put('a', {'price': 1})
+    now[0] += 59
+    assert cache.get('a') == {'price': 1}
+    now[0] += 1
+    assert cache.get('a') is None
+    assert cache.stats == {'hits': 1, 'misses': 1, 'evictions': 0, 'expired': 1}
+    assert len(cache) == 0
+
+def test_least_recently_used_entry_is_evicted(make_cache):
+    cache = make_cache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1     # 'b' is now least recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats['evictions'] == 1 and len(cache) == 2
+
+def test_hits_are_private_copies_stamped_when_served(make_cache):
+    cache = make_cache()
+    stored = cache.put('a', {'top_features': [('wifi', np.float32(1.5))],
+                             'timestamp': 'cached'})
+    assert stored == {'top_features': [['wifi', 1.5]], 'timestamp': 'cached'}
+    first = cache.get('a')
+    first['top_features'].clear()
+    again = cache.get('a')
+    assert again['top_features'] == [['wifi', 1.5]]
+    assert again['timestamp'] != 'cached'
+
+def test_backends_answer_the_same_sequence(tmp_path):
+    memory = PredictionCache(max_size=3)
+    sqlite = PredictionCache(max_size=3, path=str(tmp_path / 'cache.db'))
+    rng = np.random.default_rng(0)
+    for step in range(200):
+        key = f"k{rng.integers(6)}"
+        if rng.random() < 0.5:
+            assert memory.put(key, {'step': step}) == sqlite.put(key, {'step': step})
+        else:
+            assert memory.get(key) == sqlite.get(key)
+    assert memory.stats == sqlite.stats
+    assert len(memory) == len(sqlite)
+
+def test_get_or_compute_returns_the_same_form_on_hit_and_miss(make_cache):
+    cache = make_cache()
+    calls = []
+    def compute():
+        calls.append(1)
+        return {'predicted_price': np.float64(100.0), 'interval': (90.0, 110.0)}
+
+    miss = cache.get_or_compute(LISTING, 'v1', compute)
+    hit = cache.get_or_compute(dict(LISTING, bedrooms=2.0), 'v1', compute)
+    assert miss == hit == {'predicted_price': 100.0, 'interval': [90.0, 110.0]}
+    assert len(calls) == 1 and cache.hit_rate == 0.5
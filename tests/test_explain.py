@@ -0,0 +1,50 @@
+"""
+Global feature importance on a process pool: same answer as in-process,
+with chunks handed to the pool a few at a time.
+
+Run with:  python -m pytest tests
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from airbnb_ml_system import (
+    build_model,
+    generate_synthetic_data,
+    global_feature_importance,
+    map_bounded,
+)
+
+def test_map_bounded_keeps_order_and_window():
+    pulled = []
+    def tasks():
+        for i in range(20):
+            pulled.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = map_bounded(pool, lambda x: x * x, tasks(), max_in_flight=3)
+        first = next(results)
+        # One result consumed: at most the window plus the next task pulled
+        assert first == 0 and len(pulled) <= 4
+        assert [first, *results] == [i * i for i in range(20)]
+
+@pytest.mark.parametrize('target_error', [None, 0.05])
+def test_pool_matches_in_process(tmp_path, target_error):
+    df = generate_synthetic_data(n_samples=3000)
+    X, y = df.drop('price', axis=1), df['price']
+    model = build_model().fit(X, y)
+
+    results = [
+        global_feature_importance(model, X, chunk_size=250, n_jobs=n_jobs,
+                                  target_error=target_error, pilot_size=500,
+                                  values_path=str(tmp_path / f'values_{n_jobs}.npy'))
+        for n_jobs in (1, 2)
+    ]
+    serial, pooled = [r['feature_importance'].sort_values('feature') for r in results]
+    np.testing.assert_allclose(serial['importance'], pooled['importance'], rtol=1e-5)
+    np.testing.assert_array_equal(results[0]['row_index'], results[1]['row_index'])
+    np.testing.assert_allclose(np.load(tmp_path / 'values_1.npy'),
+                               np.load(tmp_path / 'values_2.npy'), rtol=1e-5, atol=1e-6)
@@ -0,0 +1,78 @@
+"""
+ListingFeatureStore: stored rows score like the raw listings, and upserts
+update and append rows in place, visible to readers that reopen the store.
+
+Run with:  python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from airbnb_ml_feature_store import ListingFeatureStore, predict_by_listing_id
+from airbnb_ml_system import build_model, generate_synthetic_data, ModelRuntime
+
+@pytest.fixture(scope='module')
+def runtime_and_listings():
+    df = generate_synthetic_data(n_samples=1000)
+    X, y = df.drop('price', axis=1), df['price']
+    return ModelRuntime(build_model().fit(X, y)), X.reset_index(drop=True)
+
+@pytest.fixture
+def store(tmp_path, runtime_and_listings):
+    runtime, listings = runtime_and_listings
+    ids = np.arange(len(listings), dtype=np.int64) * 7 + 1000
+    return ListingFeatureStore.create(tmp_path / 'features', runtime, ids, listings,
+                                      capacity=len(listings) + 16), ids
+
+def test_lookup_by_id_matches_raw_scoring(store, runtime_and_listings):
+    runtime, listings = runtime_and_listings
+    store, ids = store
+    picks = np.random.default_rng(0).choice(len(ids), 64, replace=False)
+    np.testing.assert_allclose(
+        predict_by_listing_id(runtime, store, ids[picks]),
+        runtime.predict(runtime.transform(listings.iloc[picks])), rtol=1e-5)
+
+    # A consecutive run comes back as a view, a scattered batch as a gather
+    np.testing.assert_array_equal(store.get(ids[10:20]), store.features[10:20])
+    with pytest.raises(KeyError):
+        store.get([ids[0], -1])
+
+def test_upsert_updates_and_appends(store, runtime_and_listings):
+    runtime, listings = runtime_and_listings
+    store, ids = store
+    changed = listings.iloc[:40].copy()
+    changed['number_of_reviews'] += 10
+    upsert_ids = ids[:40].copy()
+    upsert_ids[:10] = -np.arange(1, 11)
+
+    report = store.upsert(runtime, upsert_ids, changed)
+    assert report == {'updated': 30, 'inserted': 10}
+    expected = runtime.transform(changed).astype(np.float32)
+    np.testing.assert_array_equal(store.get(upsert_ids), expected)
+    assert store.n_rows == len(ids) + 10
+
+    reader = ListingFeatureStore(store.path)
+    np.testing.assert_array_equal(reader.get(upsert_ids), expected)
+
+def test_upsert_grows_past_capacity(store, runtime_and_listings):
+    runtime, listings = runtime_and_listings
+    store, ids = store
+    new_ids = -np.arange(1, 101)
+    store.upsert(runtime, new_ids, listings.iloc[:100])
+    assert store.n_rows == len(ids) + 100
+    np.testing.assert_array_equal(store.get(new_ids),
+                                  runtime.transform(listings.iloc[:100]).astype(np.float32))
+
+def test_upsert_keeps_last_record_of_repeated_id(store, runtime_and_listings):
+    runtime, listings = runtime_and_listings
+    store, ids = store
+    report = store.upsert(runtime, [500, 500, ids[0], ids[0]], listings.iloc[:4])
+    assert report == {'updated': 1, 'inserted': 1}
+    assert store.n_rows == len(ids) + 1
+    expected = runtime.transform(listings.iloc[[1, 3]]).astype(np.float32)
+    np.testing.assert_array_equal(store.get([500, ids[0]]), expected)
+
+def test_create_rejects_duplicate_ids(tmp_path, runtime_and_listings):
+    runtime, listings = runtime_and_listings
+    with pytest.raises(ValueError):
+        ListingFeatureStore.create(tmp_path / 'features', runtime, [1, 1], listings.iloc[:2])
@@ -0,0 +1,65 @@
+"""
+Conformal price intervals: the finite-sample quantile, bucket fallback,
+and coverage of the intervals train_model calibrates on fresh listings.
+
+Run with:  python -m pytest tests
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.model_selection import train_test_split
+
+from airbnb_ml_intervals import ConformalIntervals, conformal_quantile, interval_coverage
+from airbnb_ml_system import (
+    generate_synthetic_data,
+    generate_synthetic_shard,
+    predict_home_value,
+    predict_home_values,
+    train_model,
+    ModelRuntime,
+)
+
+def test_conformal_quantile_rank():
+    residuals = np.arange(1, 100, dtype=np.float64)   # n = 99
+    # ceil(100 * 0.9) = 90th smallest
+    assert conformal_quantile(residuals, 0.9) == 90.0
+    assert conformal_quantile(residuals[:5], 0.9) == math.inf
+
+def test_small_and_unseen_buckets_use_the_pooled_width():
+    X = pd.DataFrame({'location_type': ['downtown'] * 100 + ['beach'] * 10,
+                      'property_type': 'entire_home'})
+    residuals = np.concatenate([np.full(100, 5.0), np.full(10, 50.0)])
+    intervals = ConformalIntervals.fit(X, residuals, coverage=0.9)
+    assert set(intervals.half_widths) == {('downtown', 'entire_home')}
+    listings = [{'location_type': 'downtown', 'property_type': 'entire_home'},
+                {'location_type': 'beach', 'property_type': 'entire_home'},
+                {'location_type': 'moon', 'property_type': 'castle'}]
+    widths = intervals.half_widths_for(pd.DataFrame(listings))
+    assert widths[0] == 5.0
+    assert widths[1] == widths[2] == intervals.default_half_width
+    np.testing.assert_array_equal(widths, intervals.half_widths_for(listings))
+
+@pytest.fixture(scope='module')
+def runtime():
+    df = generate_synthetic_data(n_samples=3000)
+    X_train, X_test, y_train, y_test = train_test_split(
+        df.drop('price', axis=1), df['price'], test_size=0.2, random_state=42)
+    return ModelRuntime(train_model(X_train, y_train, X_test, y_test, interval_coverage=0.9))
+
+def test_fresh_listings_are_covered_at_the_target_rate(runtime):
+    fresh = generate_synthetic_shard(3, 20_000)
+    results = predict_home_values(runtime, fresh.drop(columns='price'), explain=False)
+    coverage = interval_coverage(results['price_lower'], results['price_upper'],
+                                 fresh['price'])['coverage']
+    assert coverage >= runtime.intervals.coverage - 0.02
+
+def test_single_and_batch_intervals_agree(runtime):
+    listings = generate_synthetic_shard(4, 50).drop(columns='price')
+    batch = predict_home_values(runtime, listings, explain=False)
+    for i, listing in enumerate(listings.to_dict('records')):
+        lower, upper = predict_home_value(runtime, listing)['price_interval']
+        assert lower == pytest.approx(batch['price_lower'][i], abs=0.01)
+        assert upper == pytest.approx(batch['price_upper'][i], abs=0.01)
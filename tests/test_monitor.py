@@ -0,0 +1,84 @@
+"""
+Drift monitor: sketches of shards merge into the sketch of the whole,
+the per-request and batch paths agree, and PSI/KS flag a shifted listing
+mix while fresh in-distribution traffic stays stable.
+
+Run with:  python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from airbnb_ml_monitor import DriftMonitor, ks_statistic, population_stability_index
+from airbnb_ml_system import generate_synthetic_data, generate_synthetic_shard
+
+@pytest.fixture(scope='module')
+def baseline_state():
+    # The monitor only sketches the predictions, so the true prices stand in
+    train = generate_synthetic_data(n_samples=5000)
+    return DriftMonitor.from_baseline(train.drop(columns='price'), train['price']).to_dict()
+
+@pytest.fixture(scope='module')
+def traffic():
+    fresh = generate_synthetic_shard(1, 20_000)
+    return fresh.drop(columns='price'), fresh['price'].to_numpy()
+
+def test_psi_and_ks_of_count_vectors():
+    counts = np.array([10, 20, 30, 40])
+    assert population_stability_index(counts, counts * 3) == pytest.approx(0)
+    assert ks_statistic(counts, counts * 3) == pytest.approx(0)
+    reversed_counts = counts[::-1]
+    assert ks_statistic(counts, reversed_counts) == pytest.approx(0.4)
+    p, q = counts / 100, reversed_counts / 100
+    assert population_stability_index(counts, reversed_counts) == \
+        pytest.approx(np.sum((q - p) * np.log(q / p)))
+    # Empty bins are floored rather than dividing by zero
+    assert np.isfinite(population_stability_index(np.array([0, 10]), np.array([10, 0])))
+
+def test_merged_shard_sketches_equal_one_sketch(baseline_state, traffic):
+    X, prices = traffic
+    single = DriftMonitor.from_dict(baseline_state)
+    single.observe_batch(X, prices)
+
+    merged = DriftMonitor.from_dict(baseline_state)
+    for lo, hi in [(0, 5000), (5000, 12_000), (12_000, len(X))]:
+        part = DriftMonitor.from_dict(baseline_state)
+        part.observe_batch(X.iloc[lo:hi], prices[lo:hi])
+        merged.merge(DriftMonitor.from_dict(part.to_dict()))
+    assert merged.to_dict() == single.to_dict()
+    assert merged.n_observed == len(X)
+
+def test_observe_matches_observe_batch(baseline_state, traffic):
+    X, prices = traffic
+    records = X.head(500).to_dict('records')
+    records[0]['distance_to_metro'] = None
+    records[1]['location_type'] = 'moon'
+
+    one_by_one = DriftMonitor.from_dict(baseline_state)
+    for record, price in zip(records, prices):
+        one_by_one.observe(record, price)
+    batched = DriftMonitor.from_dict(baseline_state)
+    batched.observe_batch(records, prices[:500])
+    assert one_by_one.to_dict() == batched.to_dict()
+
+def test_in_distribution_traffic_is_stable(baseline_state, traffic):
+    X, prices = traffic
+    monitor = DriftMonitor.from_dict(baseline_state)
+    monitor.observe_batch(X, prices)
+    assert all(row['status'] == 'stable' for row in monitor.drift_report().values())
+
+def test_shifted_listing_mix_is_flagged(baseline_state, traffic):
+    X, prices = traffic
+    rng = np.random.default_rng(0)
+    shifted = X.copy()
+    shifted['distance_to_metro'] = shifted['distance_to_metro'] * 2.5
+    shifted['location_type'] = np.where(rng.random(len(shifted)) < 0.5, 'beach',
+                                        shifted['location_type'])
+    monitor = DriftMonitor.from_dict(baseline_state)
+    monitor.observe_batch(shifted, prices)
+    report = monitor.drift_report()
+    assert report['distance_to_metro']['status'] == 'drift'
+    assert report['distance_to_metro']['ks'] > 0.1
+    assert report['location_type']['status'] != 'stable'
+    assert report['location_type']['ks'] is None
+    assert report['bedrooms']['status'] == 'stable'
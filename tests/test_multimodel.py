@@ -0,0 +1,94 @@
+"""
+Multi-model serving: the hash-based A/B split is stable (pinned values,
+scalar and vector paths, across runtimes) and balanced, and models that
+share a preprocessor are scored from one transform.
+
+Run with:  python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+from airbnb_ml_multimodel import MultiModelRuntime, hash_bucket, hash_buckets
+from airbnb_ml_system import build_model, generate_synthetic_data, ModelRuntime
+
+# Changing any of these reshuffles every running experiment
+PINNED = [
+    (0, 0, 0.8833108082136426),
+    (7919, 0, 0.26338836658687104),
+    (-5, 0, 0.08865044484243612),
+    (2 ** 62, 0, 0.002598817123781516),
+    ('listing-42', 0, 0.043383249389012835),
+    (7919, 1, 0.9196589052814985),
+    ('listing-42', 1, 0.4621329433592306),
+]
+
+@pytest.mark.parametrize('listing_id, salt, position', PINNED)
+def test_hash_positions_are_pinned(listing_id, salt, position):
+    assert hash_bucket(listing_id, salt) == position
+    assert hash_buckets([listing_id], salt)[0] == position
+
+def test_scalar_and_vector_hashes_agree():
+    ids = np.concatenate([np.arange(-500, 500), np.arange(1, 1000) * 7919])
+    np.testing.assert_array_equal(hash_buckets(ids), [hash_bucket(int(i)) for i in ids])
+    strings = [f"listing-{i}" for i in range(200)]
+    np.testing.assert_array_equal(hash_buckets(strings, salt=3),
+                                  [hash_bucket(s, salt=3) for s in strings])
+
+def test_split_is_close_to_the_weights():
+    assert abs(np.mean(hash_buckets(np.arange(1, 200_001) * 7919) >= 0.9) - 0.1) < 0.005
+    assert abs(np.mean(hash_buckets([f"listing-{i}" for i in range(20_000)]) >= 0.9)
+               - 0.1) < 0.01
+    # A different salt is an independent split
+    a, b = hash_buckets(np.arange(20_000)) < 0.5, hash_buckets(np.arange(20_000), salt=1) < 0.5
+    assert abs(np.mean(a == b) - 0.5) < 0.02
+
+@pytest.fixture(scope='module')
+def models():
+    df = generate_synthetic_data(n_samples=1000)
+    X, y = df.drop('price', axis=1), df['price']
+    incumbent = build_model().fit(X, y)
+    preprocessor = incumbent.named_steps['preprocessor']
+    candidate = Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('regressor', XGBRegressor(n_estimators=50, max_depth=3, random_state=7).fit(
+            preprocessor.transform(X), y)),
+    ])
+    other = generate_synthetic_data(n_samples=800)
+    challenger = build_model().fit(other.drop('price', axis=1), other['price'])
+    runtimes = {name: ModelRuntime(model) for name, model in
+                [('incumbent', incumbent), ('candidate', candidate), ('challenger', challenger)]}
+    return runtimes, X.head(300).reset_index(drop=True)
+
+def test_assignment_is_the_same_in_every_runtime(models):
+    runtimes, _ = models
+    ids = np.arange(5000) * 31
+    arms = {'incumbent': 0.9, 'challenger': 0.1}
+    first, second = MultiModelRuntime(runtimes, arms), MultiModelRuntime(dict(runtimes), arms)
+    np.testing.assert_array_equal(first.assign(ids), second.assign(ids))
+    assert [first.arm_names[i] for i in first.assign(ids[:200])] == \
+        [second.assign_one(int(i)) for i in ids[:200]]
+
+def test_served_and_shadow_prices(models):
+    runtimes, listings = models
+    ab = MultiModelRuntime(runtimes, arms={'incumbent': 0.5, 'challenger': 0.5},
+                           shadows=['candidate'])
+    assert len(ab.groups) == 2
+    ids = np.arange(len(listings))
+    result = ab.predict(listings, ids)
+    for i, name in enumerate(ab.arm_names):
+        rows = np.flatnonzero(ab.assign(ids) == i)
+        runtime = runtimes[name]
+        np.testing.assert_allclose(
+            result['predicted_price'][rows],
+            np.round(runtime.predict(runtime.transform(listings.iloc[rows])), 2),
+            rtol=1e-5, atol=0.01)
+    candidate = runtimes['candidate']
+    np.testing.assert_allclose(result['shadow']['candidate'],
+                               candidate.predict(candidate.transform(listings)), rtol=1e-5)
+
+    one = ab.predict(listings.iloc[0].to_dict(), 0)
+    assert one['model'] == result['model'][0]
+    assert one['predicted_price'] == pytest.approx(result['predicted_price'][0], abs=0.01)
@@ -0,0 +1,73 @@
+"""
+Parity of the compiled serving path with the sklearn Pipeline it replaces:
+CompiledPreprocessor against preprocessor.transform and ModelRuntime
+against Pipeline.predict, for every create_feature_pipeline variant.
+
+Run with:  python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+from sklearn.model_selection import train_test_split
+
+from airbnb_ml_kernels import CompiledPreprocessor
+from airbnb_ml_system import build_model, generate_synthetic_data, ModelRuntime
+
+VARIANTS = {
+    'default': {},
+    'compact': {'compact': True},
+    'compact-native': {'compact': True, 'native_categorical': True},
+}
+
+@pytest.fixture(scope='module', params=list(VARIANTS))
+def fitted(request):
+    """(fitted Pipeline, held-out listings with some missing values) per variant."""
+    options = VARIANTS[request.param]
+    df = generate_synthetic_data(n_samples=1000, compact=options.get('compact', False))
+    X_train, X_test, y_train, _ = train_test_split(
+        df.drop('price', axis=1), df['price'], test_size=0.2, random_state=42)
+    model = build_model(**options).fit(X_train, y_train)
+
+    # Exercise the imputers on both numeric and categorical columns
+    X_test = X_test.reset_index(drop=True)
+    X_test.loc[::7, 'distance_to_metro'] = np.nan
+    X_test.loc[::11, 'review_scores_rating'] = np.nan
+    X_test.loc[::13, 'season'] = None
+    return model, X_test
+
+def test_compiled_preprocessor_matches_transform(fitted):
+    model, X_test = fitted
+    preprocessor = model.named_steps['preprocessor']
+    compiled = CompiledPreprocessor.from_sklearn(preprocessor)
+    expected = preprocessor.transform(X_test)
+
+    actual = compiled.transform(X_test)
+    assert actual.dtype == expected.dtype
+    np.testing.assert_array_equal(actual, expected)
+
+    columns = {name: X_test[name].to_numpy() for name in X_test.columns}
+    np.testing.assert_array_equal(compiled.transform(columns), expected)
+
+def test_compiled_preprocessor_single_records(fitted):
+    model, X_test = fitted
+    preprocessor = model.named_steps['preprocessor']
+    compiled = CompiledPreprocessor.from_sklearn(preprocessor)
+    records = X_test.head(20).to_dict('records')
+    expected = preprocessor.transform(X_test.head(20))
+
+    np.testing.assert_array_equal(compiled.transform(records), expected)
+    for i, record in enumerate(records):
+        np.testing.assert_array_equal(compiled.transform(record)[0], expected[i])
+
+def test_runtime_matches_pipeline_predict(fitted):
+    model, X_test = fitted
+    runtime = ModelRuntime(model)
+    expected = model.predict(X_test)
+
+    # Library predict on the compiled features: bit-identical
+    np.testing.assert_array_equal(runtime.regressor.predict(runtime.transform(X_test)),
+                                  expected)
+    # Small batches go through the NumPy forest (float64 leaf sums)
+    small = X_test.head(runtime.forest_max_rows)
+    np.testing.assert_allclose(runtime.predict(runtime.transform(small)),
+                               expected[:len(small)], rtol=1e-5)
@@ -0,0 +1,37 @@
+"""
+ModelRuntime as a shared serving object: one runtime scoring concurrent
+requests must give every request its own answer.
+
+Run with:  python -m pytest tests
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from airbnb_ml_system import build_model, generate_synthetic_data, predict_home_value, ModelRuntime
+
+@pytest.fixture(scope='module')
+def runtime_and_listings():
+    df = generate_synthetic_data(n_samples=1000)
+    X, y = df.drop('price', axis=1), df['price']
+    runtime = ModelRuntime(build_model().fit(X, y))
+    return runtime, X.head(200).to_dict('records')
+
+def test_concurrent_single_predictions_are_independent(runtime_and_listings):
+    runtime, listings = runtime_and_listings
+    expected = [predict_home_value(runtime, listing)['predicted_price'] for listing in listings]
+
+    requests = listings * 5
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        served = list(pool.map(lambda listing: predict_home_value(runtime, listing)
+                               ['predicted_price'], requests))
+    assert served == expected * 5
+
+def test_single_record_transform_returns_a_new_array(runtime_and_listings):
+    runtime, listings = runtime_and_listings
+    first = runtime.transform(listings[0])
+    second = runtime.transform(listings[1])
+    assert first is not second
+    np.testing.assert_array_equal(first, runtime.transform([listings[0]]))
@@ -0,0 +1,92 @@
+"""
+Request validation and error responses of the prediction server, driven
+through PredictionServer.handle with a stand-in batcher (no model needed).
+
+Run with:  python -m pytest tests
+"""
+
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from airbnb_ml_cache import PredictionCache
+from airbnb_ml_server import PredictionServer
+
+LISTING = {'property_type': 'entire_home', 'bedrooms': 2, 'bathrooms': 1.0,
+           'location_type': 'downtown', 'season': 'summer', 'has_wifi': 1}
+
+class _StubBatcher:
+    """Answers every listing with a fixed price, or raises the given error."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.queue = asyncio.Queue()
+        self.stats = {}
+        self.submitted = []
+
+    async def submit(self, record):
+        if self.error is not None:
+            raise self.error
+        self.submitted.append(record)
+        return {'predicted_price': 100.0}
+
+def _post(server, body):
+    return asyncio.run(server.handle('POST', '/predict', body))
+
+@pytest.mark.parametrize('body', [
+    '[1, 2]',
+    '"listing"',
+    '{bad json',
+    json.dumps(dict(LISTING, bedrooms='3')),
+    json.dumps(dict(LISTING, bedrooms=True)),
+    json.dumps(dict(LISTING, season=3)),
+    '{"bedrooms": 1e400}',
+    '{"bedrooms": NaN}',
+    '{"bedrooms": -Infinity}',
+])
+def test_bad_listings_are_rejected_before_the_model(body):
+    batcher = _StubBatcher()
+    status, payload = _post(PredictionServer(batcher, 'v1'), body)
+    assert status == 400 and set(payload) == {'error'}
+    assert not batcher.submitted
+
+def test_valid_listing_with_missing_fields_is_scored():
+    batcher = _StubBatcher()
+    status, payload = _post(PredictionServer(batcher, 'v1'),
+                            json.dumps(dict(LISTING, bathrooms=None)))
+    assert status == 200 and payload['predicted_price'] == 100.0
+
+def test_model_errors_are_not_echoed_to_the_client():
+    error = ValueError("Check failed in /usr/lib/python3/site-packages/xgboost/src/data.cc")
+    status, payload = _post(PredictionServer(_StubBatcher(error), 'v1'), json.dumps(LISTING))
+    assert status == 400
+    assert payload == {'error': 'listing could not be scored'}
+
+def test_sqlite_cache_calls_run_off_the_event_loop(tmp_path):
+    cache = PredictionCache(path=str(tmp_path / 'cache.db'))
+    threads = set()
+    for name in ('get', 'put'):
+        method = getattr(cache.backend, name)
+        def recorded(*args, method=method):
+            threads.add(threading.current_thread().name)
+            return method(*args)
+        setattr(cache.backend, name, recorded)
+
+    batcher = _StubBatcher()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='cache') as executor:
+        server = PredictionServer(batcher, 'v1', cache, cache_executor=executor)
+
+        async def requests():
+            first = await server.handle('POST', '/predict', json.dumps(LISTING))
+            second = await server.handle('POST', '/predict', json.dumps(LISTING))
+            health = await server.handle('GET', '/health', '')
+            return first, second, health
+
+        first, second, health = asyncio.run(requests())
+    assert first == second == (200, {'predicted_price': 100.0})
+    assert len(batcher.submitted) == 1
+    assert health[1]['cache']['size'] == 1
+    assert threads and all(name.startswith('cache') for name in threads)